@@ -1,3 +1,10 @@
-from .ui import YellowPagesScraperUI
-
 __all__ = ["YellowPagesScraperUI"]
+
+
+def __getattr__(name):
+    # The GUI pulls in tkinter, only import it when it is actually used
+    if name == "YellowPagesScraperUI":
+        from .ui import YellowPagesScraperUI
+
+        return YellowPagesScraperUI
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,10 +1,15 @@
+import datetime
 import os
+import sys
+import threading
 
 import customtkinter as ctk
 from decouple import config
 from licensing.methods import Helpers, Key
+from licensing.models import LicenseKey
 from loguru import logger as log
 from yellowpages import YellowPagesScraperUI
+from yellowpages.utils import archive
 
 # Remove default loguru logger and configure it
 log.remove()
@@ -14,6 +19,22 @@
 
 auth = config("AUTH_TOKEN", default="")
 key_file = config("KEY_FILE", default="key.txt")
+# Signed license response, verified offline on startup
+license_file = config("LICENSE_FILE", default="license.skm")
+# Days the cached license is trusted without reaching the licensing server
+license_max_age = config("LICENSE_MAX_AGE", default=30, cast=int)
+# Statuses and messages of the licensing server rejecting the key itself, the
+# cached license is kept on any other failure (no network, 429, 5xx...)
+KEY_REJECTIONS = ("403", "404")
+KEY_REJECTION_MESSAGES = ("find the key", "blocked", "expired")
+# Sample every scraping job and save a flamegraph next to the output file
+profile = "--profile" in sys.argv or config("PROFILE", default=False, cast=bool)
+
+# Archive every response to WARC files, or re-run the scrapers from them offline
+if config("REPLAY_DIR", default=""):
+    archive.replay(config("REPLAY_DIR"))
+elif config("RECORD_DIR", default=""):
+    archive.record(config("RECORD_DIR"))
 
 
 def get_saved_key():
@@ -28,6 +49,67 @@ def save_key(key):
         file.write(key)
 
 
+def get_cached_license():
+    """Verify the cached license against RSA_PUB_KEY, without any network call"""
+    if not os.path.exists(license_file):
+        return None
+    with open(license_file, "r") as file:
+        # None if the signature doesn't match or is older than `license_max_age`
+        license_key = LicenseKey.load_from_string(
+            RSAPubKey, file.read(), license_max_age
+        )
+    if license_key is None or not Helpers.IsOnRightMachine(license_key, v=2):
+        return None
+    # The subscription ended, even if the signature is still recent
+    if license_key.expires < datetime.datetime.now():
+        return None
+    return license_key
+
+
+def save_license(license_key):
+    with open(license_file, "w") as file:
+        file.write(license_key.save_as_string())
+
+
+def activate(key):
+    result = Key.activate(
+        token=auth,
+        rsa_pub_key=RSAPubKey,
+        product_id=26728,
+        key=key,
+        machine_code=Helpers.GetMachineCode(v=2),
+    )
+    if result[0] is not None and Helpers.IsOnRightMachine(result[0], v=2):
+        save_license(result[0])  # Refresh the cached license and its signature date
+    return result
+
+
+def is_rejected(message):
+    """Whether the licensing server rejected the key, rather than failing"""
+    message = (message or "").lower()
+    return message in KEY_REJECTIONS or any(
+        rejection in message for rejection in KEY_REJECTION_MESSAGES
+    )
+
+
+def revalidate(key):
+    """Activate the key online again, in the background, to refresh the cache"""
+
+    def _revalidate():
+        try:
+            result = activate(key)
+        except Exception as err:  # e.g. an error page that isn't JSON
+            log.error(f"License revalidation failed: {err}")
+            return
+        if result[0] is None:
+            log.error(f"License revalidation failed: {result[1]}")
+            if is_rejected(result[1]) and os.path.exists(license_file):
+                # Invalid, expired or blocked key, require a new activation
+                os.remove(license_file)
+
+    threading.Thread(target=_revalidate, daemon=True).start()
+
+
 def display_result(message, title="Result"):
     root = ctk.CTk()
     root.title("Yellow Pages Scraper v1.0")
@@ -59,13 +141,7 @@ def display_result(message, title="Result"):
 
 def activate_key():
     key = entry.get()
-    result = Key.activate(
-        token=auth,
-        rsa_pub_key=RSAPubKey,
-        product_id=26728,
-        key=key,
-        machine_code=Helpers.GetMachineCode(v=2),
-    )
+    result = activate(key)
     print(result)
     if result[0] is None:
         custom_message = "An error occurred while activating the license."
@@ -84,21 +160,18 @@ def activate_key():
         display_result("The license is valid!", "Activation Success")
         save_key(key)  # Save the activation key
         root.quit()  # Close the key entry window
-        app = YellowPagesScraperUI()
+        app = YellowPagesScraperUI(profile=profile)
         app.mainloop()
 
 
 saved_key = get_saved_key()
 print(f"Saved key: {saved_key}")
-if saved_key:
-    # Attempt to activate with the saved key
-    result = Key.activate(
-        token=auth,
-        rsa_pub_key=RSAPubKey,
-        product_id=26728,
-        key=saved_key,
-        machine_code=Helpers.GetMachineCode(v=2),
-    )
+if saved_key and get_cached_license() is not None:
+    # The cached license is valid, check it online without delaying the startup
+    revalidate(saved_key)
+elif saved_key:
+    # No usable cached license, attempt to activate with the saved key
+    result = activate(saved_key)
     print(result)
 
     if result[0] is None or not Helpers.IsOnRightMachine(result[0], v=2):
@@ -106,7 +179,7 @@ def activate_key():
 
 if saved_key is not None:
     # License is already activated, start the application
-    app = YellowPagesScraperUI()
+    app = YellowPagesScraperUI(profile=profile)
     app.mainloop()
 else:
     # License is not activated or the saved key is invalid, show the Tkinter window
@@ -0,0 +1,308 @@
+"""
+Record every response of the scrapers to WARC files and replay them offline.
+
+Usage:
+    python -m yellowpages.archive <archive dir> <scraper> <keywords> <location>
+                                  [-o datafile.csv]
+"""
+
+import argparse
+import asyncio
+import csv
+import gzip
+import hashlib
+import json
+import pathlib
+import sys
+import threading
+import time
+import uuid
+import zlib
+
+from yarl import URL
+
+# Response headers that no longer describe the body once aiohttp decoded it
+DROPPED_HEADERS = {"content-encoding", "content-length", "transfer-encoding"}
+
+
+def request_key(method: str, url: str, params: dict = None, body=None) -> str:
+    """
+    Identify a request by its method, final URL and payload.
+
+    Args:
+        method (str): HTTP method.
+        url (str): URL of the request.
+        params (dict): Query parameters appended to the URL.
+        body (Any): JSON payload or form data of the request.
+
+    Returns:
+        str: Hex digest of the request.
+    """
+    url = str(URL(url).update_query(params) if params else URL(url))
+    payload = json.dumps(body, sort_keys=True, default=str) if body is not None else ""
+    return hashlib.sha1(f"{method} {url} {payload}".encode()).hexdigest()
+
+
+class Archive:
+    """
+    Write the request/response pairs made by `make_request` to gzipped
+    WARC files, or answer them from those files. The instance used by
+    the scrapers is `yellowpages.utils.archive`.
+    Every record is its own gzip member so the archive stays readable
+    even if the application stops in the middle of a job.
+    """
+
+    def __init__(self) -> None:
+        self.mode: str | None = None  # "record", "replay" or None
+        self.directory: pathlib.Path | None = None
+        self.max_size = 0
+        self._lock = threading.Lock()
+        self._file = None
+        self._index = None
+        self._path: pathlib.Path | None = None
+        self._replay_index = {}  # Request key -> (path, offset, length)
+
+    @property
+    def recording(self) -> bool:
+        return self.mode == "record"
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == "replay"
+
+    def record(self, directory: str, max_size: int = 1 << 30) -> None:
+        """
+        Start writing the responses to `directory`.
+
+        Args:
+            directory (str): Directory of the WARC files.
+            max_size (int): Size in bytes after which a new file is started.
+
+        Returns:
+            None
+        """
+        self.close()
+        self.directory = pathlib.Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_size = max_size
+        self.mode = "record"
+
+    def replay(self, directory: str) -> int:
+        """
+        Answer the requests from the WARC files in `directory`.
+
+        Args:
+            directory (str): Directory of the WARC files.
+
+        Returns:
+            int: Number of responses available.
+        """
+        self.close()
+        self.directory = pathlib.Path(directory)
+        for index in sorted(self.directory.glob("*.warc.gz.idx")):
+            warc = index.with_suffix("")
+            with open(index, "r", encoding="utf-8") as file:
+                for line in file:
+                    key, offset, length, status = line.split()
+                    # Keep the last successful response of retried requests
+                    if key in self._replay_index and not 200 <= int(status) < 300:
+                        continue
+                    self._replay_index[key] = (warc, int(offset), int(length))
+        self.mode = "replay"
+        return len(self._replay_index)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._index.close()
+            self._file = self._index = None
+        self._replay_index.clear()
+        self.mode = None
+
+    def lookup(self, key: str) -> str | None:
+        """
+        Get the archived body of a request.
+
+        Args:
+            key (str): Key of the request, see `request_key`.
+
+        Returns:
+            str | None: Body of the response if it was archived, None otherwise.
+        """
+        if key not in self._replay_index:
+            return
+        path, offset, length = self._replay_index[key]
+        with open(path, "rb") as file:
+            file.seek(offset)
+            record = zlib.decompress(file.read(length), wbits=31)
+
+        _, http = record.split(b"\r\n\r\n", 1)
+        head, body = http.split(b"\r\n\r\n", 1)
+        body = body[: -len(b"\r\n\r\n")]
+        status = int(head.split(b" ", 2)[1])
+        if not 200 <= status < 300:
+            return ""
+
+        charset = "utf-8"
+        for header in head.split(b"\r\n")[1:]:
+            name, _, value = header.decode("latin-1").partition(":")
+            if name.lower() == "content-type" and "charset=" in value:
+                charset = value.split("charset=", 1)[1].split(";")[0].strip()
+        return body.decode(charset, errors="replace")
+
+    def write(
+        self,
+        key: str,
+        method: str,
+        url: str,
+        request_body: bytes,
+        status: int,
+        reason: str,
+        headers: list,
+        body: bytes,
+    ) -> None:
+        """
+        Append a request and its response to the current WARC file.
+
+        Args:
+            key (str): Key of the request, see `request_key`.
+            method (str): HTTP method of the request.
+            url (str): Final URL of the request.
+            request_body (bytes): Payload of the request.
+            status (int): HTTP status of the response.
+            reason (str): HTTP reason phrase of the response.
+            headers (list): (name, value) headers of the response.
+            body (bytes): Decoded body of the response.
+
+        Returns:
+            None
+        """
+        url = URL(url)
+        request_id = f"<urn:uuid:{uuid.uuid4()}>"
+        request = (
+            f"{method} {url.raw_path_qs} HTTP/1.1\r\nHost: {url.raw_host}\r\n\r\n"
+        ).encode() + request_body
+        response_head = f"HTTP/1.1 {status} {reason}\r\n" + "".join(
+            f"{name}: {value}\r\n"
+            for name, value in headers
+            if name.lower() not in DROPPED_HEADERS
+        )
+        response = f"{response_head}Content-Length: {len(body)}\r\n\r\n".encode() + body
+
+        with self._lock:
+            if not self.recording:
+                return
+            self._rotate()
+            self._write_record("request", url, request, request_id)
+            offset = self._file.tell()
+            self._write_record("response", url, response, concurrent_to=request_id)
+            self._index.write(f"{key} {offset} {self._file.tell() - offset} {status}\n")
+            self._file.flush()
+            self._index.flush()
+
+    def _write_record(
+        self,
+        kind: str,
+        url: URL,
+        payload: bytes,
+        record_id: str = None,
+        concurrent_to: str = None,
+    ) -> None:
+        headers = {
+            "WARC-Type": kind,
+            "WARC-Record-ID": record_id or f"<urn:uuid:{uuid.uuid4()}>",
+            "WARC-Date": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "WARC-Target-URI": str(url),
+            "Content-Type": f"application/http;msgtype={kind}",
+            "Content-Length": len(payload),
+        }
+        if concurrent_to:
+            headers["WARC-Concurrent-To"] = concurrent_to
+        record = (
+            "WARC/1.1\r\n"
+            + "".join(f"{name}: {value}\r\n" for name, value in headers.items())
+            + "\r\n"
+        ).encode()
+        self._file.write(gzip.compress(record + payload + b"\r\n\r\n"))
+
+    def _rotate(self) -> None:
+        if self._file is not None and self._file.tell() < self.max_size:
+            return
+        if self._file is not None:
+            self._file.close()
+            self._index.close()
+
+        self._path = self.directory / time.strftime(
+            f"%Y%m%d-%H%M%S-{uuid.uuid4().hex[:8]}.warc.gz"
+        )
+        self._file = open(self._path, "ab")
+        self._index = open(f"{self._path}.idx", "a", encoding="utf-8")
+
+
+async def replay_search(
+    directory: str, scraper: str, keyword: str, location: str
+) -> list:
+    """
+    Run the `search` of a scraper from an archive, without any network access.
+
+    Args:
+        directory (str): Directory of the WARC files.
+        scraper (str): Name of the scraper module.
+        keyword (str): Search keywords used when recording.
+        location (str): Location used when recording.
+
+    Returns:
+        list: The companies extracted from the archived responses.
+    """
+    # Imported here as `yellowpages.utils` depends on this module
+    import aiohttp
+    from yellowpages.scrapers import Mapper
+    from yellowpages.utils import archive
+
+    archive.replay(directory)
+    progress = threading.Event()
+    progress.set()
+    try:
+        async with aiohttp.ClientSession() as session:
+            return await Mapper().get_search(scraper)(
+                keyword,
+                location=location,
+                session=session,
+                semaphore=asyncio.Semaphore(10),
+                progress=progress,
+            )
+    finally:
+        archive.close()
+
+
+def main(argv: list | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("directory")
+    parser.add_argument("scraper")
+    parser.add_argument("keyword")
+    parser.add_argument("location")
+    parser.add_argument("-o", "--output", default="datafile.csv")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    companies = asyncio.run(
+        replay_search(args.directory, args.scraper, args.keyword, args.location)
+    )
+    companies = [company for company in companies if isinstance(company, dict)]
+    if companies:
+        with open(args.output, "w", encoding="utf-8") as file:
+            writer = csv.DictWriter(
+                file, fieldnames=companies[0].keys(), lineterminator="\n"
+            )
+            writer.writeheader()
+            writer.writerows(companies)
+    print(
+        f"{len(companies)} companies re-extracted to {args.output} "
+        f"in {time.perf_counter() - started:.2f} seconds"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
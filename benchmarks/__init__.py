@@ -0,0 +1,22 @@
+import pathlib
+
+# Recorded responses of every scraper, one directory per module in `scrapers/`
+FIXTURES = pathlib.Path(__file__).parent / "fixtures"
+# Benchmark runs and the baseline they are compared to
+RESULTS = pathlib.Path(__file__).parent / "results"
+
+
+def load_fixture(scraper: str, name: str) -> str | None:
+    """
+    Load a recorded response of a scraper.
+
+    Args:
+        scraper (str): Name of the scraper module, e.g. `germany`.
+        name (str): Fixture name without extension, `search` or `detail`.
+
+    Returns:
+        str | None: Content of the fixture if it exists, None otherwise.
+    """
+    for path in (FIXTURES / scraper).glob(f"{name}.*"):
+        return path.read_text(encoding="utf-8")
+    return
@@ -0,0 +1,167 @@
+"""
+Offline benchmark of the scraper parsers against the recorded fixtures.
+
+Usage:
+    python -m yellowpages.benchmarks.parsers [--min-time 1.0] [--save-baseline]
+                                              [scraper ...]
+"""
+
+import argparse
+import importlib
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+from yellowpages.benchmarks import FIXTURES, RESULTS, load_fixture
+
+
+def get_cases(scraper: str) -> list:
+    """
+    List the parser functions of a scraper with the fixture they consume.
+
+    Args:
+        scraper (str): Name of the scraper module.
+
+    Returns:
+        list: (case name, parser function, fixture content) tuples.
+    """
+    module = importlib.import_module(f"yellowpages.scrapers.{scraper}")
+    cases = []
+    for function, fixture in (
+        ("parse_search", "search"),
+        ("parse_companies", "search"),
+        ("parse_company", "detail"),
+    ):
+        content = load_fixture(scraper, fixture)
+        if content is not None and hasattr(module, function):
+            cases.append((function, getattr(module, function), content))
+    return cases
+
+
+def count_records(result) -> int:
+    if isinstance(result, list):
+        return len(result)
+    return 1 if result and result.get("name") else 0
+
+
+def measure(parser: callable, content: str, min_time: float) -> dict:
+    """
+    Measure the throughput and the memory usage of a parser.
+
+    Args:
+        parser (callable): Parser function taking the response text.
+        content (str): Recorded response.
+        min_time (float): Minimum number of seconds to run the parser for.
+
+    Returns:
+        dict: Records per second, peak and retained memory of one call, and
+              the memory blocks allocated by the call and alive at its end.
+    """
+    records = count_records(parser(content))  # Warm up caches and imports
+
+    iterations, elapsed = 0, 0.0
+    started = time.perf_counter()
+    while elapsed < min_time:
+        parser(content)
+        iterations += 1
+        elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    # Not the snapshots themselves
+    ignored = [tracemalloc.Filter(False, tracemalloc.__file__)]
+    start = tracemalloc.take_snapshot().filter_traces(ignored)
+    before, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    result = parser(content)
+    _, peak = tracemalloc.get_traced_memory()
+    # Only the blocks still alive are traced, the ones freed during the call
+    # are in the peak but not in the count
+    end = tracemalloc.take_snapshot().filter_traces(ignored)
+    allocations = sum(stat.count_diff for stat in end.compare_to(start, "filename"))
+    del result, start, end
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "records": records,
+        "iterations": iterations,
+        "records_per_sec": round(records * iterations / elapsed, 1),
+        "calls_per_sec": round(iterations / elapsed, 1),
+        "peak_kib": round((peak - before) / 1024, 1),
+        "kib_per_record": round((peak - before) / 1024 / max(records, 1), 2),
+        "retained_kib": round((after - before) / 1024, 1),
+        "allocations": allocations,
+    }
+
+
+def compare(value: float, baseline: float | None, higher_is_better: bool) -> str:
+    if not baseline:
+        return ""
+    change = (value - baseline) / baseline
+    better = change > 0 if higher_is_better else change < 0
+    return f" ({change:+.1%}{'' if better or abs(change) < 0.05 else ' !'})"
+
+
+def main(argv: list | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("scrapers", nargs="*", help="Scrapers to run, all by default")
+    parser.add_argument("--min-time", type=float, default=1.0)
+    parser.add_argument(
+        "--save-baseline",
+        action="store_true",
+        help="Store this run as the baseline the next runs are compared to",
+    )
+    args = parser.parse_args(argv)
+
+    scrapers = args.scrapers or sorted(
+        path.name for path in FIXTURES.iterdir() if path.is_dir()
+    )
+    baseline_path = RESULTS / "baseline.json"
+    baseline = (
+        json.loads(baseline_path.read_text())["results"]
+        if baseline_path.exists()
+        else {}
+    )
+
+    results = {}
+    print(
+        f"{'case':<36} {'records/s':>16} {'peak KiB':>16} {'retained KiB':>13}"
+        f" {'allocations':>12}"
+    )
+    for scraper in scrapers:
+        for function, parse, content in get_cases(scraper):
+            case = f"{scraper}.{function}"
+            stats = measure(parse, content, args.min_time)
+            results[case] = stats
+
+            base = baseline.get(case, {})
+            print(
+                f"{case:<36} {stats['records_per_sec']:>9}"
+                f"{compare(stats['records_per_sec'], base.get('records_per_sec'), True):<7}"
+                f" {stats['peak_kib']:>8}"
+                f"{compare(stats['peak_kib'], base.get('peak_kib'), False):<8}"
+                f" {stats['retained_kib']:>12}"
+                f" {stats['allocations']:>12}"
+            )
+
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "min_time": args.min_time,
+        "results": results,
+    }
+    RESULTS.mkdir(exist_ok=True)
+    output = RESULTS / time.strftime("%Y%m%d-%H%M%S.json")
+    output.write_text(json.dumps(report, indent=2))
+    if args.save_baseline:
+        baseline_path.write_text(json.dumps(report, indent=2))
+        output = baseline_path
+    print(f"\nResults saved to {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,305 @@
+"""
+Local mock of the scraped directories serving the recorded fixtures.
+
+Usage:
+    python -m yellowpages.benchmarks.server [--port 8080] [--latency 0.05]
+                                            [--error-rate 0.02] [--throttle-rate 0.01]
+"""
+
+import argparse
+import asyncio
+import random
+import re
+
+from aiohttp import web
+from yarl import URL
+from yellowpages.benchmarks import load_fixture
+
+# (host, method, path pattern, scraper, fixture), first match wins
+ROUTES = [
+    ("www.dastelefonbuch.de", "GET", r"/service/suggestor/location/", None, "suggest"),
+    ("www.dastelefonbuch.de", "GET", r"/Suche/", "germany", "search"),
+    ("www.dastelefonbuch.de", "GET", r"/", "germany", "detail"),
+    ("www.yellowpages.com", "GET", r"/search", "usa", "search"),
+    ("www.yellowpages.com", "GET", r"/", "usa", "detail"),
+    ("www.goldenpages.be", "GET", r"/search/", "belgium", "search"),
+    ("www.goldenpages.be", "GET", r"/", "belgium", "detail"),
+    ("www.goldenpages.ie", "GET", r"/q/", "ireland", "search"),
+    ("www.goldenpages.ie", "GET", r"/", "ireland", "detail"),
+    ("services.411.ca", "POST", r"/search-business/", "canada", "search"),
+    ("services.411.ca", "GET", r"/business/", "canada", "detail"),
+    ("www.herold.at", "GET", r"/api/geo/search/", None, "geo"),
+    ("www.herold.at", "GET", r"/_next/data/", "austria", "search"),
+    ("www.herold.at", "GET", r"/$", None, "home"),
+    ("www.paginegialle.it", "GET", r"/ricerca/", "italy", "search"),
+    ("www.local.ch", "POST", r"/api/graphql", "switzerland", "search"),
+    ("api.yep.co.za", "GET", r"/search", "south_africa", "search"),
+    ("www.goudengids.nl", "GET", r"/nl/zoeken/", "nicaragua", "search"),
+]
+
+
+async def search_page(scraper: str, request: web.Request) -> int:
+    """
+    Get the page number of a search request, as built by the scrapers.
+
+    Args:
+        scraper (str): Name of the scraper.
+        request (web.Request): The search request.
+
+    Returns:
+        int: The page requested, starting at 1.
+    """
+    if scraper in ("germany", "belgium", "ireland", "nicaragua"):
+        return int(request.path.rstrip("/").rsplit("/", 1)[-1])
+    if scraper == "italy":
+        return int(re.search(r"/p-(\d+)", request.path).group(1))
+    if scraper == "usa":
+        return int(request.query.get("page", 1))
+    if scraper == "austria":
+        return int(request.query.get("seite", 1))
+    if scraper == "south_africa":
+        return int(request.query.get("from", 0)) // 10 + 1
+    data = await request.json()
+    if scraper == "canada":
+        results = data["search"][0]["results"][0]
+        return results["from"] // results["count"] + 1
+    pagination = data["variables"]["pagination"]  # switzerland
+    return pagination["start"] // pagination["limit"] + 1
+
+
+class MockDirectoryServer:
+    def __init__(
+        self,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        throttle_rate: float = 0.0,
+        slow_body_rate: float = 0.0,
+        slow_body_time: float = 2.0,
+        build_id: str = "mock-build",
+        pages: int | None = None,
+        seed: int | None = None,
+    ) -> None:
+        """
+        aiohttp server answering the URL patterns of every scraper with the
+        recorded fixtures. Requests are expected on `/<original host><path>`,
+        see `MockSession` to rewrite the URLs of the scrapers.
+
+        Args:
+            latency (float): Seconds to wait before answering.
+            jitter (float): Random extra latency, up to this many seconds.
+            error_rate (float): Share of requests answered with a 503.
+            throttle_rate (float): Share of requests answered with a 429.
+            slow_body_rate (float): Share of bodies trickled in small chunks.
+            slow_body_time (float): Seconds a slow body takes to be sent.
+            build_id (str): Next.js build ID accepted by the herold.at API.
+            pages (int): Distinct search pages per search, the pages after it
+                         repeat the last one. None serves the same listings
+                         on every page.
+            seed (int): Seed of the fault injection.
+
+        Returns:
+            None
+        """
+
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.slow_body_rate = slow_body_rate
+        self.slow_body_time = slow_body_time
+        self.build_id = build_id
+        self.pages = pages
+        self.random = random.Random(seed)
+        self.hits = 0  # Number of requests received
+        self.runner: web.AppRunner | None = None
+        self.url: URL | None = None
+
+        self.app = web.Application(middlewares=[self._inject_faults])
+        self.app.router.add_route("*", "/{host}/{path:.*}", self.handle)
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> URL:
+        """
+        Start serving in the running event loop.
+
+        Args:
+            host (str): Interface to listen on.
+            port (int): Port to listen on, a free one is picked when 0.
+
+        Returns:
+            URL: Base URL of the server.
+        """
+        self.runner = web.AppRunner(self.app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, host, port)
+        await site.start()
+        port = self.runner.addresses[0][1]
+        self.url = URL.build(scheme="http", host=host, port=port)
+        return self.url
+
+    async def stop(self) -> None:
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
+
+    @web.middleware
+    async def _inject_faults(self, request: web.Request, handler) -> web.StreamResponse:
+        self.hits += 1
+        await asyncio.sleep(self.latency + self.random.random() * self.jitter)
+
+        chance = self.random.random()
+        if chance < self.throttle_rate:
+            return web.Response(status=429, headers={"Retry-After": "1"})
+        if chance < self.throttle_rate + self.error_rate:
+            return web.Response(status=503, text="Service Unavailable")
+
+        response = await handler(request)
+        if self.random.random() >= self.slow_body_rate or response.status != 200:
+            return response
+
+        # Send the body in small chunks spread over `slow_body_time`
+        slow = web.StreamResponse(
+            status=200, headers={"Content-Type": response.content_type}
+        )
+        await slow.prepare(request)
+        body = response.body
+        chunks = range(0, len(body), 1024)
+        for start in chunks:
+            await slow.write(body[start : start + 1024])  # noqa: E203
+            await asyncio.sleep(self.slow_body_time / len(chunks))
+        await slow.write_eof()
+        return slow
+
+    async def handle(self, request: web.Request) -> web.Response:
+        host = request.match_info["host"]
+        path = "/" + request.match_info["path"]
+
+        for route_host, method, pattern, scraper, fixture in ROUTES:
+            if (
+                host != route_host
+                or request.method != method
+                or not re.match(pattern, path)
+            ):
+                continue
+
+            if fixture == "suggest":
+                location = path.rsplit("/", 1)[-1]
+                names = [location]
+                if "-" not in location:
+                    # Districts, to split the searches over the result cap
+                    names += [f"{location}-Mitte", f"{location}-Nord"]
+                return web.json_response(
+                    {"suggest": {"suggestions": [{"name": name} for name in names]}}
+                )
+            if fixture == "geo":
+                return web.json_response([{"label": request.query.get("term", "")}])
+            if fixture == "home":
+                return web.Response(
+                    text=f'<script id="__NEXT_DATA__">{{"buildId": "{self.build_id}"}}</script>',
+                    content_type="text/html",
+                )
+            if scraper == "austria" and not path.startswith(
+                f"/_next/data/{self.build_id}/"
+            ):
+                # Stale Next.js token, like after a redeploy of the site
+                raise web.HTTPNotFound()
+
+            content = load_fixture(scraper, fixture)
+            if fixture == "search" and self.pages is not None:
+                page = min(await search_page(scraper, request), self.pages)
+                # Other IDs and phone numbers on every page, page 1 unchanged
+                content = re.sub(
+                    r"\d{3,}",
+                    lambda match: str(
+                        int(match.group()) + (page - 1) * 10 ** len(match.group())
+                    ),
+                    content,
+                )
+            is_json = content.lstrip().startswith(("{", "["))
+            return web.Response(
+                text=content,
+                content_type="application/json" if is_json else "text/html",
+            )
+
+        raise web.HTTPNotFound()
+
+
+class MockSession:
+    def __init__(self, session, url: URL) -> None:
+        """
+        Wrap an aiohttp session to send the requests of the scrapers to the
+        mock server instead of the live directories.
+
+        Args:
+            session (aiohttp.ClientSession): Session doing the requests.
+            url (URL): Base URL of the mock server.
+
+        Returns:
+            None
+        """
+        self.session = session
+        self.url = url
+
+    @property
+    def headers(self):
+        return self.session.headers
+
+    def rewrite(self, url: str) -> URL:
+        url = URL(url)
+        return URL(f"{self.url}/{url.host}{url.raw_path_qs}", encoded=True)
+
+    def get(self, url: str, **kwargs):
+        return self.session.get(self.rewrite(url), **kwargs)
+
+    def post(self, url: str, **kwargs):
+        return self.session.post(self.rewrite(url), **kwargs)
+
+
+def main(argv: list | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    add_fault_arguments(parser)
+    args = parser.parse_args(argv)
+
+    server = MockDirectoryServer(**fault_options(args))
+    print(f"Serving the fixtures on http://{args.host}:{args.port}/<host>/<path>")
+    web.run_app(server.app, host=args.host, port=args.port, print=None)
+
+
+def add_fault_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="Seconds per response"
+    )
+    parser.add_argument(
+        "--jitter", type=float, default=0.0, help="Random extra latency"
+    )
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of 503s")
+    parser.add_argument(
+        "--throttle-rate", type=float, default=0.0, help="Share of 429s"
+    )
+    parser.add_argument(
+        "--slow-body-rate", type=float, default=0.0, help="Share of slow bodies"
+    )
+    parser.add_argument("--slow-body-time", type=float, default=2.0)
+    parser.add_argument(
+        "--pages", type=int, default=None, help="Distinct pages per search"
+    )
+    parser.add_argument("--seed", type=int, default=None)
+
+
+def fault_options(args: argparse.Namespace) -> dict:
+    return {
+        "latency": args.latency,
+        "jitter": args.jitter,
+        "error_rate": args.error_rate,
+        "throttle_rate": args.throttle_rate,
+        "slow_body_rate": args.slow_body_rate,
+        "slow_body_time": args.slow_body_time,
+        "pages": args.pages,
+        "seed": args.seed,
+    }
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""
+End-to-end throughput and soak test of the scrapers against the mock server.
+
+Usage:
+    python -m yellowpages.benchmarks.soak [scraper ...] [--queries 10] [--rounds 1]
+                                          [--concurrency 10] [--latency 0.05] ...
+"""
+
+import argparse
+import asyncio
+import importlib
+import sys
+import threading
+import time
+from collections import Counter
+
+import aiohttp
+from yellowpages.benchmarks import FIXTURES, server as mock
+from yellowpages.connections import ConnectionStats, make_connector
+
+
+def percentile(values: list, q: float) -> float:
+    """
+    Nearest rank percentile.
+
+    Args:
+        values (list): Sampled values.
+        q (float): Percentile between 0 and 100.
+
+    Returns:
+        float: The percentile, 0 when there are no values.
+    """
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))]
+
+
+class RequestStats:
+    def __init__(self) -> None:
+        """
+        Collect the latency and the status of every request of a session
+        through the aiohttp tracing hooks.
+
+        Returns:
+            None
+        """
+        self.latencies = []
+        self.statuses = Counter()
+
+    def trace_config(self) -> aiohttp.TraceConfig:
+        trace = aiohttp.TraceConfig()
+
+        async def on_start(session, context, params):
+            context.started = time.perf_counter()
+
+        async def on_end(session, context, params):
+            self.latencies.append(time.perf_counter() - context.started)
+            self.statuses[params.response.status] += 1
+
+        async def on_exception(session, context, params):
+            self.latencies.append(time.perf_counter() - context.started)
+            self.statuses[type(params.exception).__name__] += 1
+
+        trace.on_request_start.append(on_start)
+        trace.on_request_end.append(on_end)
+        trace.on_request_exception.append(on_exception)
+        return trace
+
+
+async def soak(
+    scrapers: list,
+    queries: int,
+    rounds: int,
+    concurrency: int,
+    server: mock.MockDirectoryServer,
+) -> dict:
+    """
+    Run `queries` searches per scraper `rounds` times against the mock server.
+
+    Args:
+        scrapers (list): Names of the scraper modules.
+        queries (int): Number of concurrent searches per scraper and round.
+        rounds (int): Number of rounds.
+        concurrency (int): Size of the semaphore shared by the searches.
+        server (MockDirectoryServer): Server to run the searches against.
+
+    Returns:
+        dict: Rows, rows per second, the searches that raised and latency
+              percentiles.
+    """
+    url = await server.start()
+    stats = RequestStats()
+    connections = ConnectionStats()
+    progress = threading.Event()
+    progress.set()
+    semaphore = asyncio.Semaphore(concurrency)
+    search_latencies = []
+    rows = 0
+    errors = Counter()  # Searches that raised, by scraper and exception
+
+    async def timed(search, keyword, location, session):
+        started = time.perf_counter()
+        result = await search(
+            keyword,
+            location=location,
+            session=session,
+            proxy=None,
+            progress=progress,
+            semaphore=semaphore,
+        )
+        search_latencies.append(time.perf_counter() - started)
+        return result
+
+    started = time.perf_counter()
+    try:
+        async with aiohttp.ClientSession(
+            connector=make_connector(),
+            trace_configs=[stats.trace_config(), connections.trace_config()],
+        ) as client:
+            session = mock.MockSession(client, url)
+            searches = [scraper for scraper in scrapers for _ in range(queries)]
+            for _ in range(rounds):
+                results = await asyncio.gather(
+                    *[
+                        timed(
+                            importlib.import_module(
+                                f"yellowpages.scrapers.{scraper}"
+                            ).search,
+                            f"keyword {index}",
+                            "Toronto",
+                            session,
+                        )
+                        for scraper in scrapers
+                        for index in range(queries)
+                    ],
+                    return_exceptions=True,
+                )
+                for scraper, result in zip(searches, results):
+                    if isinstance(result, BaseException):
+                        errors[f"{scraper}: {result!r}"] += 1
+                    else:
+                        rows += len(result)
+    finally:
+        await server.stop()
+    elapsed = time.perf_counter() - started
+
+    return {
+        "rows": rows,
+        "seconds": elapsed,
+        "rows_per_sec": rows / elapsed,
+        "requests": len(stats.latencies),
+        "statuses": dict(stats.statuses),
+        "errors": dict(errors),
+        "connections": connections.opened,
+        "reuse_ratio": connections.reuse_ratio,
+        "request_latency": {
+            q: percentile(stats.latencies, q) for q in (50, 95, 99, 100)
+        },
+        "search_latency": {
+            q: percentile(search_latencies, q) for q in (50, 95, 99, 100)
+        },
+    }
+
+
+def main(argv: list | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("scrapers", nargs="*", help="Scrapers to run, all by default")
+    parser.add_argument(
+        "--queries", type=int, default=5, help="Searches per scraper and round"
+    )
+    parser.add_argument("--rounds", type=int, default=1)
+    parser.add_argument("--concurrency", type=int, default=10)
+    mock.add_fault_arguments(parser)
+    args = parser.parse_args(argv)
+
+    scrapers = args.scrapers or sorted(
+        path.name for path in FIXTURES.iterdir() if path.is_dir()
+    )
+    server = mock.MockDirectoryServer(**mock.fault_options(args))
+    report = asyncio.run(
+        soak(scrapers, args.queries, args.rounds, args.concurrency, server)
+    )
+
+    print(
+        f"Rows: {report['rows']} in {report['seconds']:.2f}s ({report['rows_per_sec']:.1f} rows/s)"
+    )
+    print(f"Requests: {report['requests']} {report['statuses']}")
+    print(
+        f"Connections: {report['connections']} opened, "
+        f"{report['reuse_ratio']:.0%} of the requests on a reused one"
+    )
+    for name in ("request_latency", "search_latency"):
+        print(
+            f"{name.replace('_', ' ').capitalize()}: "
+            + ", ".join(
+                f"p{q} {value * 1000:.0f}ms" for q, value in report[name].items()
+            )
+        )
+    # A search raising is a bug of the scraper, not a fault of the server
+    for error, count in report["errors"].items():
+        print(f"Search error ({count}x) {error}", file=sys.stderr)
+    return 1 if report["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
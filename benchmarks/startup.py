@@ -0,0 +1,56 @@
+"""
+Cold start time of the application modules, each measured in a fresh interpreter.
+
+Usage:
+    python -m yellowpages.benchmarks.startup [--repeat 5]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+CASES = {
+    "interpreter": "pass",
+    "scrapers.Mapper": "from yellowpages.scrapers import Mapper; Mapper().get_options()",
+    "scrapers.germany": "from yellowpages.scrapers import Mapper; Mapper().get_search('germany')",
+    "utils": "import yellowpages.utils",
+    "ui": "import yellowpages.ui",
+}
+
+
+def measure(code: str) -> float:
+    """
+    Run `code` in a new interpreter.
+
+    Args:
+        code (str): Python statements to run.
+
+    Returns:
+        float: Wall time of the whole process in seconds.
+    """
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    started = time.perf_counter()
+    subprocess.run([sys.executable, "-c", code], env=env, check=True)
+    return time.perf_counter() - started
+
+
+def main(argv: list | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    print(f"{'case':<20} {'min ms':>8} {'median ms':>10}")
+    for case, code in CASES.items():
+        timings = [measure(code) for _ in range(args.repeat)]
+        print(
+            f"{case:<20} {min(timings) * 1000:>8.0f}"
+            f" {statistics.median(timings) * 1000:>10.0f}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
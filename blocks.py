@@ -0,0 +1,153 @@
+import collections
+import re
+import time
+
+from decouple import config
+from loguru import logger as log
+
+# Seconds a proxy blocked by a host isn't used for that host again
+BLOCK_QUARANTINE = config("BLOCK_QUARANTINE", default=600, cast=float)
+
+# Markers of the challenge pages of the common anti-bot services, served
+# instead of the content, often with a 200
+CHALLENGE_MARKERS = (
+    "window._cf_chl_opt",  # Cloudflare
+    "captcha-delivery.com",  # DataDome
+    "px-captcha",  # PerimeterX
+    "_Incapsula_Resource",  # Imperva
+    "<title>Access Denied</title>",  # Akamai
+)
+
+
+class BlockSignature:
+    def __init__(
+        self,
+        statuses: tuple = (403, 429),
+        markers: tuple = (),
+        min_size: int = 0,
+        sentinels: tuple = (),
+        pages: str | None = None,
+    ) -> None:
+        """
+        What a website serves when it blocks a scraper.
+
+        Args:
+            statuses (tuple): Status codes of a block.
+            markers (tuple): Texts of the block pages, on top of the common
+                             challenge markers.
+            min_size (int): Size under which a successful response is a block.
+            sentinels (tuple): Texts of the real pages, one of them at least
+                               is in every response of the host.
+            pages (str): Pattern of the paths the size and the sentinels are
+                         checked on, every path when None, e.g. to leave out
+                         the short answers of an API on the same host.
+
+        Returns:
+            None
+        """
+        self.statuses = statuses
+        self.markers = CHALLENGE_MARKERS + tuple(markers)
+        self.min_size = min_size
+        self.sentinels = sentinels
+        self.pages = re.compile(pages) if pages is not None else None
+
+    def match(self, status: int, text: str, path: str = "") -> str | None:
+        """
+        Check a response against the signature.
+
+        Args:
+            status (int): Status code of the response.
+            text (str): Body of the response, empty if it wasn't read.
+            path (str): Path of the request.
+
+        Returns:
+            str | None: Why the response is a block, None if it isn't one.
+        """
+        if status in self.statuses:
+            return f"status {status}"
+        if status >= 400:
+            return None  # Other errors are retried as usual
+        for marker in self.markers:
+            if marker in text:
+                return f"marker {marker!r}"
+        if self.pages is not None and not self.pages.match(path):
+            return None
+        if len(text) < self.min_size:
+            return f"{len(text)} bytes"
+        if self.sentinels and not any(sentinel in text for sentinel in self.sentinels):
+            return "no sentinel"
+        return None
+
+
+class BlockDetector:
+    def __init__(self, quarantine: float = BLOCK_QUARANTINE) -> None:
+        """
+        Check the responses against the block signature of their host and
+        keep the proxies blocked by a host away from it for a while.
+
+        Args:
+            quarantine (float): Seconds a blocked proxy isn't used for its host.
+
+        Returns:
+            None
+        """
+        self.quarantine = quarantine
+        self.default = BlockSignature()  # Hosts without a signature
+        self.signatures = {}  # Host -> BlockSignature
+        self.quarantined = {}  # (host, proxy) -> end of the quarantine
+        self.responses = collections.Counter()  # Responses checked by host
+        self.blocks = collections.Counter()  # Blocks by host
+
+    def register(self, host: str, signature: BlockSignature) -> None:
+        self.signatures[host] = signature
+
+    def check(
+        self, host: str, proxy: str | None, status: int, text: str, path: str = ""
+    ) -> bool:
+        """
+        Check a response and quarantine its proxy if it was blocked.
+
+        Args:
+            host (str): Host of the request.
+            proxy (str): Proxy of the request, None without proxies.
+            status (int): Status code of the response.
+            text (str): Body of the response.
+            path (str): Path of the request.
+
+        Returns:
+            bool: True if the response is a block.
+        """
+        self.responses[host] += 1
+        reason = self.signatures.get(host, self.default).match(status, text, path)
+        if reason is None:
+            return False
+
+        self.blocks[host] += 1
+        if proxy is not None:
+            self.quarantined[(host, proxy)] = time.monotonic() + self.quarantine
+        log.warning(f"Blocked by {host} ({reason}), block rate {self.rate(host):.0%}")
+        return True
+
+    def pick(self, proxy, host: str, avoid: str | None = None) -> str | None:
+        """
+        Get the next proxy not quarantined by a host.
+
+        Args:
+            proxy (Proxy): Proxies of the request.
+            host (str): Host of the request.
+            avoid (str): Proxy not to return, e.g. the one already used.
+
+        Returns:
+            str | None: The proxy, a quarantined one if they all are.
+        """
+        candidate = proxy.get()
+        now = time.monotonic()
+        for _ in range(proxy.total):
+            if candidate != avoid and self.quarantined.get((host, candidate), 0) <= now:
+                break
+            candidate = proxy.get()
+        return candidate
+
+    def rate(self, host: str) -> float:
+        """Share of the responses of a host that were blocks"""
+        return self.blocks[host] / max(1, self.responses[host])
@@ -0,0 +1,173 @@
+import collections
+import contextvars
+import json
+import os
+import threading
+
+from decouple import config
+from loguru import logger as log
+from yellowpages.catalog import CATALOG_DIR
+
+# Fill rates of the fields in the previous jobs, by scraper
+FILL_RATES_FILE = CATALOG_DIR / "fill-rates.json"
+
+# Companies the fill rates are computed over, and responses without any
+# company after which a site is stopped
+BREAKER_WINDOW = config("BREAKER_WINDOW", default=100, cast=int)
+
+# Fill rate under which a field usually filled has stopped being parsed
+BREAKER_MIN_FILL = config("BREAKER_MIN_FILL", default=0.05, cast=float)
+
+# Fill rate from which a field is expected to stay filled
+USUALLY_FILLED = 0.5
+
+# Breaker of the site the running task scrapes, the fetch layer and the
+# events report the responses and the companies to it
+observer = contextvars.ContextVar("observer", default=None)
+
+
+def _load_fill_rates() -> dict:
+    if not FILL_RATES_FILE.exists():
+        return {}
+    try:
+        return json.loads(FILL_RATES_FILE.read_text(encoding="utf-8"))
+    except (ValueError, OSError) as err:
+        log.error(f"Error loading the fill rates: {err}")
+        return {}
+
+
+class FillRateBreaker:
+    def __init__(
+        self,
+        name: str,
+        progress: threading.Event,
+        selectors: dict | None = None,
+        fields: list | None = None,
+        window: int = BREAKER_WINDOW,
+        min_fill: float = BREAKER_MIN_FILL,
+    ) -> None:
+        """
+        Stop the scraping of a site when its markup changed: `window`
+        responses in a row without any company, or a field usually filled
+        that isn't anymore. The breaker is passed to the scrapers as their
+        progress, it is only set while the job runs and it hasn't tripped.
+
+        The usual fill rates are the ones of the previous jobs of the site,
+        or of its first `window` companies.
+
+        Args:
+            name (str): Name of the scraper.
+            progress (threading.Event): Progress of the job.
+            selectors (dict): Field -> selector of the scraper, "listings"
+                              for the results of a search page.
+            fields (list): Fields requested by the job, None for all of them.
+            window (int): Number of companies and responses checked.
+            min_fill (float): Fill rate under which a field collapsed.
+
+        Returns:
+            None
+        """
+        self.name = name
+        self.progress = progress
+        self.selectors = selectors or {}
+        self.fields = fields
+        self.min_fill = min_fill
+        self.window = window
+        self.companies = collections.deque(maxlen=window)  # Filled fields
+        self.empty_responses = 0  # Responses since the last company
+        self.baseline = _load_fill_rates().get(name)  # Field -> usual fill rate
+        self.tripped: str | None = None  # Why the site was stopped
+        self._lock = threading.Lock()  # Guards the counts
+
+    def is_set(self) -> bool:
+        return self.tripped is None and self.progress.is_set()
+
+    def __call__(self, event_type: str, *args, **kwargs) -> None:
+        # The responses are counted by the fetches and the companies by the
+        # event dispatcher, from two threads
+        with self._lock:
+            if event_type == "response":
+                self.empty_responses += 1
+                if self.empty_responses >= self.window:
+                    self.trip(
+                        f"no company in the last {self.empty_responses} responses",
+                        ["listings", "name"],
+                    )
+            elif event_type == "companies" and args and args[0]:
+                self.empty_responses = 0
+                for company in args[0]:
+                    self.companies.append(
+                        frozenset(field for field, value in company.items() if value)
+                    )
+                if len(self.companies) == self.window:
+                    self.check()
+
+    def quiet(self, event_type: str, *args, **kwargs) -> None:
+        """
+        Observer of the requests expected to find nothing, e.g. the searches
+        without results: their responses don't count as empty ones.
+
+        Args:
+            event_type (str): Type of the event.
+            *args: Arguments of the event.
+
+        Returns:
+            None
+        """
+        if event_type != "response":
+            self(event_type, *args, **kwargs)
+
+    def fill_rates(self) -> dict:
+        """Share of the last companies having each requested field"""
+        counts = collections.Counter(
+            field for fields in self.companies for field in fields
+        )
+        return {
+            field: counts[field] / len(self.companies)
+            for field in (self.fields or counts)
+        }
+
+    def check(self) -> None:
+        rates = self.fill_rates()
+        if self.baseline is None:
+            self.baseline = rates
+            return
+        collapsed = [
+            field
+            for field, rate in rates.items()
+            if self.baseline.get(field, 0) >= USUALLY_FILLED and rate < self.min_fill
+        ]
+        if collapsed:
+            self.trip(
+                ", ".join(
+                    f"{field} filled in {rates[field]:.0%} of the last "
+                    f"{len(self.companies)} companies instead of "
+                    f"{self.baseline[field]:.0%}"
+                    for field in collapsed
+                ),
+                collapsed,
+            )
+
+    def trip(self, reason: str, fields: list) -> None:
+        if self.tripped is not None:
+            return
+        selectors = ", ".join(
+            f"{field}: {self.selectors[field]}"
+            for field in fields
+            if field in self.selectors
+        )
+        self.tripped = f"Stopped {self.name}, {reason}."
+        if selectors:
+            self.tripped += f" Selectors not matching anymore? {selectors}"
+        log.warning(self.tripped)
+
+    def save(self) -> None:
+        """Keep the fill rates of a job that went well for the next jobs."""
+        if self.tripped is not None or len(self.companies) < self.window:
+            return
+        rates = _load_fill_rates()
+        rates[self.name] = {**rates.get(self.name, {}), **self.fill_rates()}
+        FILL_RATES_FILE.parent.mkdir(parents=True, exist_ok=True)
+        temporary = FILL_RATES_FILE.with_suffix(".tmp")
+        temporary.write_text(json.dumps(rates), encoding="utf-8")
+        os.replace(temporary, FILL_RATES_FILE)
@@ -0,0 +1,219 @@
+import asyncio
+import collections
+import functools
+import json
+import os
+import pathlib
+import threading
+import time
+import typing
+
+from loguru import logger as log
+from yellowpages.index import SearchIndex, normalize
+
+# Directory of the cached catalogs, next to the `.proxies` file
+CATALOG_DIR = pathlib.Path(".catalogs")
+
+
+class Catalog:
+    def __init__(
+        self,
+        name: str,
+        seed: dict = None,
+        directory: pathlib.Path = CATALOG_DIR,
+    ) -> None:
+        """
+        Label -> ID catalog of a website (locations, categories...) cached on
+        disk and resolved through an in-memory index, so that resolving a
+        label never needs a network round trip. The catalog grows with the
+        entries the scraper finds in the responses.
+
+        Args:
+            name (str): Name of the catalog, used as the cache file name.
+            seed (dict): Entries known in advance.
+            directory (Path): Directory of the cache files.
+
+        Returns:
+            None
+        """
+        self.name = name
+        self.path = pathlib.Path(directory) / f"{name}.json"
+        self.entries = dict(seed or {})  # Label -> ID
+        self._lock = threading.Lock()
+        self._dirty = False  # Entries not saved to disk yet
+        self._index: SearchIndex | None = None
+        self._resolved = {}  # Memoized resolutions, query -> ID
+
+        if self.path.exists():
+            try:
+                cached = json.loads(self.path.read_text(encoding="utf-8"))
+                self.entries.update(cached["entries"])
+            except (ValueError, KeyError, OSError) as err:
+                log.error(f"Error loading the {name} catalog: {err}")
+
+    def labels(self) -> list:
+        return list(self.entries)
+
+    def add(self, entries: dict) -> None:
+        """
+        Add entries to the catalog, e.g. the ones found in a response.
+
+        Args:
+            entries (dict): Label -> ID entries.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            new = {
+                label: value
+                for label, value in entries.items()
+                if label and value and self.entries.get(label) != value
+            }
+            if new:
+                self.entries.update(new)
+                self._dirty = True
+                self._index = None
+                self._resolved = {}
+
+    def save(self) -> None:
+        """Write the catalog to disk if it changed."""
+        with self._lock:
+            if not self._dirty:
+                return
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            temporary = self.path.with_suffix(".tmp")
+            temporary.write_text(
+                json.dumps({"entries": self.entries}),
+                encoding="utf-8",
+            )
+            os.replace(temporary, self.path)
+            self._dirty = False
+
+    def resolve(self, query: str, fuzzy: bool = True) -> str | None:
+        """
+        Resolve a label typed by the user to its ID.
+
+        Args:
+            query (str): Label to resolve, matched without case and accents
+                         and with misspellings when `fuzzy` is set.
+            fuzzy (bool): Allow misspelled and partial labels.
+
+        Returns:
+            str | None: ID of the best matching label, None if nothing matches.
+        """
+        if query in self._resolved:
+            return self._resolved[query]
+
+        value = self.entries.get(query)
+        if value is None:
+            if self._index is None:
+                self._index = SearchIndex(self.entries)
+            label = self._index.lookup(normalize(query), fuzzy=fuzzy)
+            value = self.entries.get(label) if label is not None else None
+            if label is not None and normalize(label) != normalize(query):
+                # A near miss may not be the place or category the user meant
+                log.warning(f"{self.name}: resolved {query!r} to {label!r}")
+
+        self._resolved[query] = value
+        return value
+
+
+class Resolver:
+    def __init__(
+        self,
+        name: str,
+        fetch: typing.Callable[..., typing.Awaitable[str | None]],
+        maxsize: int = 1024,
+        ttl: float = 30 * 24 * 3600,
+        directory: pathlib.Path = CATALOG_DIR,
+    ) -> None:
+        """
+        Memoize the answers of a suggestion API (e.g. the canonical name of a
+        location typed by the user) in an LRU and on disk. Concurrent lookups
+        of the same value share a single call to `fetch`.
+
+        Args:
+            name (str): Name of the website, used as the cache file name.
+            fetch (Callable): Coroutine function called with the raw value and
+                              returning its suggestion, None on failure.
+            maxsize (int): Number of answers kept in memory.
+            ttl (float): Seconds after which a stored answer is fetched again.
+            directory (Path): Directory of the cache files.
+
+        Returns:
+            None
+        """
+        self.name = name
+        self.fetch = fetch
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.path = pathlib.Path(directory) / f"{name}-suggestions.json"
+        self.calls = 0  # Number of calls made to `fetch`
+        self._lock = threading.Lock()
+        self._memory = collections.OrderedDict()  # Raw value -> answer
+        self._stored = {}  # Raw value -> (answer, fetched at)
+        self._pending = {}  # Raw value -> task of the running lookup
+
+        if self.path.exists():
+            try:
+                self._stored = json.loads(self.path.read_text(encoding="utf-8"))
+            except (ValueError, OSError) as err:
+                log.error(f"Error loading the {name} suggestions: {err}")
+
+    def _remember(self, value: str, answer: str) -> None:
+        self._memory[value] = answer
+        self._memory.move_to_end(value)
+        if len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)
+
+    def _store(self, value: str, answer: str) -> None:
+        with self._lock:
+            self._stored[value] = (answer, time.time())
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            temporary = self.path.with_suffix(".tmp")
+            temporary.write_text(json.dumps(self._stored), encoding="utf-8")
+            os.replace(temporary, self.path)
+
+    def _done(self, value: str, task: asyncio.Future) -> None:
+        if self._pending.get(value) is task:
+            del self._pending[value]
+
+    async def _lookup(self, value: str, *args: typing.Any, **kwargs: typing.Any):
+        self.calls += 1
+        try:
+            answer = await self.fetch(value, *args, **kwargs)
+        except Exception as err:
+            log.error(f"Error fetching the {self.name} suggestion of {value}: {err}")
+            answer = None
+        if answer is not None:
+            self._remember(value, answer)
+            self._store(value, answer)
+        return answer
+
+    async def resolve(self, value: str, *args: typing.Any, **kwargs: typing.Any) -> str:
+        """
+        Get the suggestion for a value. The arguments are passed to `fetch`.
+
+        Args:
+            value (str): Raw value typed by the user.
+
+        Returns:
+            str: The suggestion, or `value` itself if the lookup failed.
+        """
+        if value in self._memory:
+            self._memory.move_to_end(value)
+            return self._memory[value]
+
+        stored = self._stored.get(value)
+        if stored is not None and time.time() - stored[1] < self.ttl:
+            self._remember(value, stored[0])
+            return stored[0]
+
+        task = self._pending.get(value)
+        if task is None or task.get_loop() is not asyncio.get_running_loop():
+            task = asyncio.ensure_future(self._lookup(value, *args, **kwargs))
+            self._pending[value] = task
+            task.add_done_callback(functools.partial(self._done, value))
+        answer = await asyncio.shield(task)
+        return value if answer is None else answer
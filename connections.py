@@ -0,0 +1,151 @@
+import asyncio
+import typing
+
+from decouple import config
+from loguru import logger as log
+
+if typing.TYPE_CHECKING:
+    import aiohttp
+
+# Connections of a session, and of a host through the same proxy. 0 for the
+# connections per host derives them from the concurrency of the site.
+CONNECTION_LIMIT = config("CONNECTION_LIMIT", default=100, cast=int)
+CONNECTIONS_PER_HOST = config("CONNECTIONS_PER_HOST", default=0, cast=int)
+
+# Seconds an idle connection is kept open for the next request
+KEEPALIVE_TIMEOUT = config("KEEPALIVE_TIMEOUT", default=30.0, cast=float)
+
+# Seconds the addresses of a host are cached, and whether they are resolved
+# with aiodns instead of a thread (needs `pip install aiodns`)
+DNS_CACHE_TTL = config("DNS_CACHE_TTL", default=300, cast=int)
+ASYNC_DNS = config("ASYNC_DNS", default=False, cast=bool)
+
+# Connections opened to a host before the first requests of a job
+PREWARM_CONNECTIONS = config("PREWARM_CONNECTIONS", default=4, cast=int)
+
+
+class ConnectionStats:
+    def __init__(self) -> None:
+        """
+        Count the connections opened and reused by the sessions through the
+        aiohttp tracing hooks, a low reuse ratio means a handshake for most
+        requests.
+
+        Returns:
+            None
+        """
+        self.opened = 0  # New connections
+        self.reused = 0  # Requests sent on a kept-alive connection
+
+    def trace_config(self) -> "aiohttp.TraceConfig":
+        import aiohttp
+
+        trace = aiohttp.TraceConfig()
+
+        async def on_create(session, context, params):
+            self.opened += 1
+
+        async def on_reuse(session, context, params):
+            self.reused += 1
+
+        trace.on_connection_create_end.append(on_create)
+        trace.on_connection_reuseconn.append(on_reuse)
+        return trace
+
+    @property
+    def reuse_ratio(self) -> float:
+        """Share of the requests sent on a reused connection"""
+        return self.reused / max(1, self.opened + self.reused)
+
+
+def resolver() -> "aiohttp.abc.AbstractResolver | None":
+    """The aiodns resolver if `ASYNC_DNS` is set and aiodns is installed."""
+    if not ASYNC_DNS:
+        return None
+    import aiohttp
+
+    try:
+        return aiohttp.AsyncResolver()
+    except (ImportError, RuntimeError) as err:
+        log.warning(f"Resolving with a thread, aiodns isn't available: {err}")
+        return None
+
+
+def host_limit(concurrency: int) -> int:
+    """
+    Connections of a host for a site sending `concurrency` requests at once.
+
+    Args:
+        concurrency (int): Concurrent requests of the site.
+
+    Returns:
+        int: `CONNECTIONS_PER_HOST` if set, else room for the hedged requests
+             on top of the concurrent ones.
+    """
+    return CONNECTIONS_PER_HOST or 2 * concurrency
+
+
+def make_connector(
+    limit_per_host: int = CONNECTIONS_PER_HOST,
+    limit: int = CONNECTION_LIMIT,
+    keepalive_timeout: float = KEEPALIVE_TIMEOUT,
+    ttl_dns_cache: int = DNS_CACHE_TTL,
+) -> "aiohttp.TCPConnector":
+    """
+    Connector of the sessions of the scrapers, keeping the connections and
+    the addresses of the hosts between requests.
+
+    Args:
+        limit_per_host (int): Connections of a host, 0 for no limit.
+        limit (int): Connections of the session, 0 for no limit.
+        keepalive_timeout (float): Seconds an idle connection is kept.
+        ttl_dns_cache (int): Seconds the addresses of a host are cached.
+
+    Returns:
+        TCPConnector: The connector, to pass to `aiohttp.ClientSession`.
+    """
+    import aiohttp
+
+    return aiohttp.TCPConnector(
+        ssl=False,
+        limit=limit,
+        limit_per_host=limit_per_host,
+        keepalive_timeout=keepalive_timeout,
+        use_dns_cache=True,
+        ttl_dns_cache=ttl_dns_cache,
+        resolver=resolver(),
+    )
+
+
+async def prewarm(
+    session: "aiohttp.ClientSession", host: str, concurrency: int | None = None
+) -> int:
+    """
+    Open connections to a host before the first burst of requests, so that
+    they don't all wait for a DNS lookup and a TLS handshake at once. The
+    connections are opened by fetching the small robots.txt of the host, as
+    aiohttp closes the connections of HEAD requests, and stay in the pool of
+    the session. Requests through proxies connect to the proxies instead,
+    they aren't prewarmed.
+
+    Args:
+        session (aiohttp.ClientSession): Session of the requests.
+        host (str): Host of the website.
+        concurrency (int): Concurrent requests of the site, no more than
+                           `PREWARM_CONNECTIONS` connections are opened.
+
+    Returns:
+        int: Number of connections opened.
+    """
+
+    async def connect() -> bool:
+        try:
+            async with session.get(f"https://{host}/robots.txt") as response:
+                await response.read()  # Releases the connection to the pool
+                return response.status < 500
+        except Exception as err:
+            log.debug(f"Error prewarming {host}: {err}")
+            return False
+
+    count = min(PREWARM_CONNECTIONS, concurrency or PREWARM_CONNECTIONS)
+    return sum(await asyncio.gather(*[connect() for _ in range(count)]))
@@ -0,0 +1,408 @@
+"""
+Retry the requests that failed for good during the previous jobs.
+
+Usage:
+    python -m yellowpages.deadletter [--scraper usa] [--concurrency 2]
+                                     [--proxies .proxies] [-o datafile.csv]
+"""
+
+import argparse
+import asyncio
+import contextvars
+import csv
+import json
+import os
+import sys
+import threading
+import time
+import types
+import uuid
+
+from decouple import config
+from loguru import logger as log
+from typing_extensions import TypedDict
+from yellowpages.catalog import CATALOG_DIR
+from yellowpages.connections import host_limit, make_connector
+from yellowpages.jobs import Site, Throttle
+from yellowpages.proxy import Proxy
+
+# Requests that failed after every attempt, one JSON object per line
+DEAD_LETTER_FILE = CATALOG_DIR / "dead-letters.jsonl"
+
+# Retry the failed requests once the searches of a job are done
+RETRY_PASS = config("RETRY_PASS", default=True, cast=bool)
+
+# Concurrent requests of a site during a retry pass
+RETRY_CONCURRENCY = config("RETRY_CONCURRENCY", default=2, cast=int)
+
+# Retry passes after which a request is only kept for inspection
+RETRY_MAX_PASSES = config("RETRY_MAX_PASSES", default=3, cast=int)
+
+# Characters of the last response kept with a failed request
+BODY_EXCERPT = 2000
+
+# Search the running task belongs to, the requests failing without one (e.g.
+# the estimates or the benchmarks) aren't recorded
+search_context = contextvars.ContextVar("search_context", default=None)
+
+
+class DeadLetter(TypedDict):
+    id: str
+    job: str  # When the job started
+    scraper: str
+    query: str
+    location: str
+    fields: list | None  # Fields requested by the job
+    method: str
+    url: str
+    params: dict | None
+    json: dict | None
+    data: dict | None
+    headers: dict | None  # Headers of the scraper, on top of the session's
+    error: str  # Status or exception of the last attempt
+    body: str  # Start of the last response
+    proxy: str | None  # Proxy of the last attempt, None without proxies
+    passes: int  # Retry passes already made
+    failed_at: float
+
+
+class DeadLetterQueue:
+    def __init__(self, path=DEAD_LETTER_FILE) -> None:
+        """
+        On-disk queue of the requests `make_request` gave up on, with the
+        search they belong to, so that they can be sent again at the end of
+        the job or later with `python -m yellowpages.deadletter`.
+
+        Args:
+            path (Path): JSON lines file of the failed requests.
+
+        Returns:
+            None
+        """
+        self.path = path
+        self._lock = threading.Lock()
+
+    def record(
+        self,
+        method: str,
+        url: str,
+        options: dict,
+        headers: dict | None,
+        error: str,
+        body: str,
+        proxy: str | None = None,
+    ) -> None:
+        """
+        Add a failed request of the running search, if any.
+
+        Args:
+            method (str): HTTP method of the request.
+            url (str): URL of the request.
+            options (dict): Keyword arguments of the request, the query
+                            parameters and payload are kept.
+            headers (dict): Headers passed by the scraper.
+            error (str): Why the last attempt failed.
+            body (str): Body of the last response, empty if there was none.
+            proxy (str): Proxy of the last attempt, None without proxies.
+
+        Returns:
+            None
+        """
+        search = search_context.get()
+        if search is None:
+            return
+        letter = DeadLetter(
+            id=uuid.uuid4().hex,
+            **search,
+            method=method,
+            url=url,
+            params=options.get("params"),
+            json=options.get("json"),
+            data=options.get("data"),
+            headers=headers,
+            error=error,
+            body=body[:BODY_EXCERPT],
+            proxy=proxy,
+            failed_at=time.time(),
+        )
+        line = json.dumps(letter, default=str)
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as file:
+                file.write(line + "\n")
+        log.warning(f"Gave up on {url} ({error}) for {search['scraper']}")
+
+    def load(self) -> list:
+        """Get the failed requests, oldest first."""
+        with self._lock:
+            if not self.path.exists():
+                return []
+            letters = []
+            with open(self.path, "r", encoding="utf-8") as file:
+                for line in file:
+                    try:
+                        letters.append(json.loads(line))
+                    except ValueError:
+                        continue  # Line cut short by a crash
+            return letters
+
+    def discard(self, ids: set) -> None:
+        """Remove the requests sent again, their new failures were appended."""
+        if not ids:
+            return
+        letters = [letter for letter in self.load() if letter["id"] not in ids]
+        with self._lock:
+            temporary = self.path.with_suffix(".tmp")
+            with open(temporary, "w", encoding="utf-8") as file:
+                file.writelines(json.dumps(letter) + "\n" for letter in letters)
+            os.replace(temporary, self.path)
+
+
+def search_of(
+    job: str, scraper: str, query: str, location: str, fields=None, passes: int = 0
+) -> dict:
+    """Context of a search, set in `search_context` while it runs."""
+    return {
+        "job": job,
+        "scraper": scraper,
+        "query": query,
+        "location": location,
+        "fields": fields,
+        "passes": passes,
+    }
+
+
+async def resend(module: types.ModuleType, letter: DeadLetter, **kwargs) -> list | None:
+    """
+    Send a failed request again and extract its companies, like the search
+    would have: the companies of a results page, the company pages of its
+    listings for the scrapers with detail pages, or the company of a page.
+    A request failing again is recorded with one more pass.
+
+    Args:
+        module (ModuleType): The scraper module.
+        letter (DeadLetter): The failed request.
+        **kwargs: The session, semaphore, proxy and progress of the pass.
+
+    Returns:
+        list | None: The companies, None if the pass was stopped.
+    """
+    # Imported here as `yellowpages.utils` depends on this module
+    from yellowpages.utils import has_fields, make_request
+
+    search_context.set(
+        search_of(
+            letter["job"],
+            letter["scraper"],
+            letter["query"],
+            letter["location"],
+            letter["fields"],
+            letter["passes"] + 1,
+        )
+    )
+    options = {
+        name: letter[name]
+        for name in ("params", "json", "data")
+        if letter[name] is not None
+    }
+    url = letter["url"]
+    if hasattr(module, "refresh_url"):
+        # URLs embedding a token that may have expired since, e.g. austria
+        url = await module.refresh_url(url, kwargs["session"], kwargs["progress"])
+    page = await make_request(
+        kwargs["session"],
+        url,
+        semaphore=kwargs["semaphore"],
+        proxy=kwargs["proxy"],
+        progress=kwargs["progress"],
+        headers=letter["headers"],
+        is_post=letter["method"] == "POST",
+        # Not the proxy it failed through, the ones blocked by the host are
+        # left out by make_request as well
+        avoid=letter.get("proxy"),
+        **options,
+    )
+    if not kwargs["progress"].is_set():
+        return None
+    if not page:
+        return []
+
+    if hasattr(module, "parse_companies"):
+        companies = [
+            company for company in module.parse_companies(page) if company["name"]
+        ]
+        if companies:
+            module.event.add("update_total", len(companies))
+            module.event.emit("companies", companies)
+        return companies
+
+    previews = module.parse_search(page)
+    if not previews:
+        company = module.parse_company(page)
+        if not company["name"]:
+            return []
+        module.event.add("update_total", 1)
+        module.event.emit("companies", [company])
+        return [company]
+
+    # The listings having the requested fields, then the company pages
+    companies = [
+        preview["company"]
+        for preview in previews
+        if has_fields(preview["company"], letter["fields"])
+    ]
+    if companies:
+        module.event.add("update_total", len(companies))
+        module.event.emit("companies", companies)
+    for company in await asyncio.gather(
+        *[
+            module.scrape_company(preview["url"], **kwargs)
+            for preview in previews
+            if not has_fields(preview["company"], letter["fields"])
+        ]
+    ):
+        if isinstance(company, dict):
+            companies.append(company)
+    return companies
+
+
+async def retry(
+    queue: DeadLetterQueue,
+    module: types.ModuleType,
+    session,
+    proxy: Proxy,
+    progress: threading.Event,
+    job: str | None = None,
+    concurrency: int = RETRY_CONCURRENCY,
+) -> list:
+    """
+    Send the failed requests of a scraper again, at a lower concurrency.
+
+    Args:
+        queue (DeadLetterQueue): The failed requests.
+        module (ModuleType): The scraper module.
+        session (aiohttp.ClientSession): Session of the requests.
+        proxy (Proxy): Proxies of the pass, preferably not the job's.
+        progress (threading.Event): Cleared to stop the pass.
+        job (str): Only retry the requests of this job, None for all of them.
+        concurrency (int): Concurrent requests.
+
+    Returns:
+        list: The companies recovered.
+    """
+    name = module.__name__.rsplit(".", 1)[-1]
+    letters = [
+        letter
+        for letter in queue.load()
+        if letter["scraper"] == name
+        and letter["passes"] < RETRY_MAX_PASSES
+        and (job is None or letter["job"] == job)
+    ]
+    if not letters:
+        return []
+
+    semaphore = Throttle(concurrency, Site(module).rate)
+    results = await asyncio.gather(
+        *[
+            resend(
+                module,
+                letter,
+                session=session,
+                semaphore=semaphore,
+                proxy=proxy,
+                progress=progress,
+            )
+            for letter in letters
+        ],
+        return_exceptions=True,
+    )
+    companies, done = [], set()
+    for letter, result in zip(letters, results):
+        if isinstance(result, Exception):
+            log.error(f"Error retrying {letter['url']}: {result}")
+        elif result is not None:
+            companies.extend(result)
+            done.add(letter["id"])
+    queue.discard(done)
+    log.info(
+        f"{name}: {len(companies)} companies recovered from "
+        f"{len(letters)} failed requests"
+    )
+    return companies
+
+
+async def retry_all(
+    scrapers: list | None, proxy_file: str, concurrency: int = RETRY_CONCURRENCY
+) -> list:
+    """
+    Retry the failed requests of every scraper, or of the given ones.
+
+    Args:
+        scrapers (list): Names of the scrapers, None for all of them.
+        proxy_file (str): File of the proxies.
+        concurrency (int): Concurrent requests of each scraper.
+
+    Returns:
+        list: The companies recovered.
+    """
+    import aiohttp
+    from yellowpages.scrapers import Mapper
+    from yellowpages.utils import dead_letters
+
+    names = scrapers or sorted({letter["scraper"] for letter in dead_letters.load()})
+    modules = [Mapper().get_module(name) for name in names]
+    for name, module in zip(names, modules):
+        if module is None:
+            log.error(f"Unknown scraper {name}")
+    modules = [module for module in modules if module is not None]
+    progress = threading.Event()
+    progress.set()
+    proxy = Proxy(proxy_file)
+    async with aiohttp.ClientSession(
+        connector=make_connector(host_limit(concurrency))
+    ) as session:
+        results = await asyncio.gather(
+            *[
+                retry(
+                    dead_letters,
+                    module,
+                    session,
+                    proxy,
+                    progress,
+                    concurrency=concurrency,
+                )
+                for module in modules
+            ]
+        )
+    return [company for companies in results for company in companies]
+
+
+def main(argv: list | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scraper", action="append", dest="scrapers")
+    parser.add_argument("--concurrency", type=int, default=RETRY_CONCURRENCY)
+    parser.add_argument("--proxies", default=".proxies")
+    parser.add_argument("-o", "--output", default="datafile.csv")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    companies = asyncio.run(retry_all(args.scrapers, args.proxies, args.concurrency))
+    if companies:
+        with open(args.output, "w", encoding="utf-8") as file:
+            writer = csv.DictWriter(
+                file,
+                # The scrapers don't all have the same fields
+                fieldnames=list(dict.fromkeys(key for row in companies for key in row)),
+                lineterminator="\n",
+            )
+            writer.writeheader()
+            writer.writerows(companies)
+    print(
+        f"{len(companies)} companies recovered to {args.output} "
+        f"in {time.perf_counter() - started:.2f} seconds"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
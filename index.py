@@ -0,0 +1,115 @@
+import bisect
+import difflib
+import re
+import unicodedata
+
+
+def normalize(text: str) -> str:
+    """
+    Normalize a text for lookups: accents removed, case folded and
+    punctuation replaced with spaces.
+
+    Args:
+        text (str): Text to normalize.
+
+    Returns:
+        str: The normalized text, e.g. "Zürich, ZH" -> "zurich zh".
+    """
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return " ".join(re.findall(r"\w+", text.casefold()))
+
+
+class SearchIndex:
+    def __init__(self, items: list = ()) -> None:
+        """
+        Prefix and fuzzy search over a list of labels. Every word of every
+        label is kept in a sorted list, a prefix lookup is a binary search
+        followed by a scan of the matching words only.
+
+        Args:
+            items (list): Labels to index.
+
+        Returns:
+            None
+        """
+        self.items = list(items)
+        self.exact = {}  # Normalized label -> position of the first such label
+        postings = {}  # Word -> positions of the labels containing it
+        for position, item in enumerate(self.items):
+            key = normalize(item)
+            self.exact.setdefault(key, position)
+            for word in set(key.split()):
+                postings.setdefault(word, []).append(position)
+        self.words = sorted(postings)
+        self.postings = postings
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def _prefixed(self, prefix: str) -> set:
+        positions = set()
+        start = bisect.bisect_left(self.words, prefix)
+        for word in self.words[start:]:
+            if not word.startswith(prefix):
+                break
+            positions.update(self.postings[word])
+        return positions
+
+    def _close(self, word: str, cutoff: float) -> set:
+        # Only compare with the words sharing the first letter to keep it fast
+        start = bisect.bisect_left(self.words, word[0])
+        end = bisect.bisect_left(self.words, chr(ord(word[0]) + 1))
+        positions = set()
+        for close in difflib.get_close_matches(
+            word, self.words[start:end], n=5, cutoff=cutoff
+        ):
+            positions.update(self.postings[close])
+        return positions
+
+    def search(self, query: str, fuzzy: bool = True, cutoff: float = 0.75) -> list:
+        """
+        Find the labels matching every word of a query by prefix, falling
+        back to close spellings for words without any prefix match.
+
+        Args:
+            query (str): Words to look for.
+            fuzzy (bool): Allow misspelled words.
+            cutoff (float): Minimum similarity of a misspelled word.
+
+        Returns:
+            list: Positions of the matching labels, exact matches first
+                  and then in the order of the items.
+        """
+        key = normalize(query)
+        if not key:
+            return list(range(len(self.items)))
+
+        matches = None
+        for word in key.split():
+            positions = self._prefixed(word)
+            if not positions and fuzzy:
+                positions = self._close(word, cutoff)
+            matches = positions if matches is None else matches & positions
+            if not matches:
+                return []
+
+        exact = self.exact.get(key)
+        return sorted(matches, key=lambda position: (position != exact, position))
+
+    def lookup(self, query: str, fuzzy: bool = True) -> str | None:
+        """
+        Resolve a query to the best matching label.
+
+        Args:
+            query (str): Label to resolve.
+            fuzzy (bool): Allow misspelled words.
+
+        Returns:
+            str | None: The best matching label if any, None otherwise.
+        """
+        position = self.exact.get(normalize(query))
+        if position is None:
+            matches = self.search(query, fuzzy=fuzzy)
+            position = matches[0] if matches else None
+        return None if position is None else self.items[position]
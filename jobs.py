@@ -0,0 +1,231 @@
+import asyncio
+import itertools
+import statistics
+import time
+import types
+
+from decouple import config
+from typing_extensions import TypedDict
+from yellowpages.proxy import Proxy
+from yellowpages.sharding import total_results
+
+# Largest estimated number of requests of a keyword/location pair, 0 for no cap
+MAX_PAIR_REQUESTS = config("MAX_PAIR_REQUESTS", default=0, cast=int)
+
+# Concurrent requests of a site, unless `<SITE>_CONCURRENCY` is set
+CONCURRENCY = 10
+
+# Seconds a job runs once confirmed before it is stopped, 0 for no deadline
+JOB_DEADLINE = config("JOB_DEADLINE", default=0, cast=float)
+
+
+class Throttle(asyncio.Semaphore):
+    def __init__(self, concurrency: int = CONCURRENCY, rate: float = 0.0) -> None:
+        """
+        Semaphore also spacing out the requests to `rate` per second. It is
+        passed to the scrapers as their semaphore.
+
+        Args:
+            concurrency (int): Number of concurrent requests.
+            rate (float): Requests started per second, 0 for no limit.
+
+        Returns:
+            None
+        """
+        super().__init__(concurrency)
+        self.interval = 1 / rate if rate else 0.0
+        self._next = 0.0  # Loop time of the next request allowed
+
+    async def acquire(self) -> bool:
+        await super().acquire()
+        if self.interval:
+            now = asyncio.get_running_loop().time()
+            wait = self._next - now
+            self._next = max(now, self._next) + self.interval
+            if wait > 0:
+                try:
+                    await asyncio.sleep(wait)
+                except asyncio.CancelledError:
+                    self.release()
+                    raise
+        return True
+
+
+class Site:
+    def __init__(
+        self,
+        module: types.ModuleType,
+        proxy: Proxy | None = None,
+        index: int = 0,
+        count: int = 1,
+    ) -> None:
+        """
+        Resources of a website during a job, so that a slow site can't starve
+        the others. The `<SITE>_CONCURRENCY`, `<SITE>_RATE` (requests per
+        second) and `<SITE>_PROXIES` (number of proxies) settings override
+        the defaults, e.g. `GERMANY_RATE=5`.
+
+        Args:
+            module (ModuleType): The scraper module.
+            proxy (Proxy): Proxies of the job, shared between its sites.
+            index (int): Position of the site in the job.
+            count (int): Number of sites of the job.
+
+        Returns:
+            None
+        """
+        self.module = module
+        self.name = module.__name__.rsplit(".", 1)[-1]
+        key = self.name.upper()
+        self.concurrency = config(f"{key}_CONCURRENCY", default=CONCURRENCY, cast=int)
+        self.rate = config(f"{key}_RATE", default=0.0, cast=float)
+        budget = config(f"{key}_PROXIES", default=0, cast=int)
+        self.proxy = proxy.share(index, count, budget) if proxy else None
+        self.throttle = Throttle(self.concurrency, self.rate)
+        self.breaker = None  # Breaker of the searches of the job, once started
+
+    def runtime(self, requests: int, latency: float) -> float:
+        """Seconds taken by `requests` requests of `latency` seconds"""
+        runtime = requests * latency / max(1, self.concurrency)
+        return max(runtime, requests / self.rate) if self.rate else runtime
+
+
+class Estimate(TypedDict):
+    site: str
+    keyword: str
+    location: str
+    total: int  # Results of the search
+    pages: int  # Search pages to fetch
+    requests: int  # Search and company pages to fetch
+    bytes: int  # Size of the responses
+    latency: float  # Seconds taken by the first page
+    skipped: bool  # Over the request cap
+    page: str  # First page, handed to the search instead of fetching it again
+
+
+def expand(keywords: list, locations: list) -> list:
+    """
+    Every keyword in every location, without blanks and duplicates.
+
+    Args:
+        keywords (list): Keywords typed by the user.
+        locations (list): Locations typed or selected by the user.
+
+    Returns:
+        list: The (keyword, location) pairs.
+    """
+    keywords = list(dict.fromkeys(k.strip() for k in keywords if k.strip()))
+    locations = list(dict.fromkeys(loc.strip() for loc in locations if loc.strip()))
+    return list(itertools.product(keywords, locations))
+
+
+async def estimate(
+    module: types.ModuleType, keyword: str, location: str, **kwargs
+) -> Estimate:
+    """
+    Estimate the cost of a search from its first page.
+
+    Args:
+        module (ModuleType): The scraper module.
+        keyword (str): The search query.
+        location (str): The location to search in.
+        **kwargs: Passed to `fetch_first_page`, e.g. the session.
+
+    Returns:
+        Estimate: The size of the search.
+    """
+    start = time.perf_counter()
+    page = await module.fetch_first_page(keyword, location, **kwargs)
+    latency = time.perf_counter() - start
+
+    total = total_results(module, page)
+
+    cap = getattr(module, "RESULT_CAP", None)
+    listings = min(total, cap) if cap else total
+    pages = module.page_size.pages(listings)
+    requests = pages
+    if hasattr(module, "parse_search"):
+        requests += listings  # One company page per listing at most
+    return Estimate(
+        site=module.__name__.rsplit(".", 1)[-1],
+        keyword=keyword,
+        location=location,
+        total=total,
+        pages=pages,
+        requests=requests,
+        bytes=len(page.encode()) * requests,
+        latency=latency,
+        skipped=False,
+        page=page,
+    )
+
+
+async def plan_jobs(
+    module: types.ModuleType,
+    pairs: list,
+    max_requests: int = MAX_PAIR_REQUESTS,
+    **kwargs,
+) -> list:
+    """
+    Probe the first page of every pair concurrently and order the pairs.
+
+    The most expensive pairs come first, so that they don't end up running
+    alone at the end of the job. Pairs estimated over `max_requests` are
+    marked as skipped.
+
+    Args:
+        module (ModuleType): The scraper module.
+        pairs (list): The (keyword, location) pairs.
+        max_requests (int): Largest number of requests of a pair, 0 for no cap.
+        **kwargs: Passed to `fetch_first_page`, e.g. the session.
+
+    Returns:
+        list: The estimates, most expensive first.
+    """
+    estimates = await asyncio.gather(
+        *[estimate(module, keyword, location, **kwargs) for keyword, location in pairs]
+    )
+    for item in estimates:
+        item["skipped"] = bool(max_requests) and item["requests"] > max_requests
+    return sorted(estimates, key=lambda item: item["requests"], reverse=True)
+
+
+def summary(estimates: list, sites: list) -> str:
+    """
+    Describe the cost of a job to the user before it starts. The sites run
+    side by side, the runtime is the one of the slowest site.
+
+    Args:
+        estimates (list): Estimates returned by `plan_jobs` for every site.
+        sites (list): The sites of the job.
+
+    Returns:
+        str: The number of searches, results, requests, runtime and bandwidth.
+    """
+    kept = [item for item in estimates if not item["skipped"]]
+    skipped = len(estimates) - len(kept)
+    requests = sum(item["requests"] for item in kept)
+    runtime = 0.0
+    for site in sites:
+        latencies = [item["latency"] for item in estimates if item["site"] == site.name]
+        runtime = max(
+            runtime,
+            site.runtime(
+                sum(item["requests"] for item in kept if item["site"] == site.name),
+                statistics.median(latencies or [0]),
+            ),
+        )
+    lines = [
+        f"{len(kept)} searches, about {sum(item['total'] for item in kept)} results",
+        f"{requests} requests, {sum(item['bytes'] for item in kept) / 1e6:.1f} MB",
+        f"Estimated runtime: {time.strftime('%H:%M:%S', time.gmtime(runtime))}",
+    ]
+    if skipped:
+        lines.append(f"{skipped} searches over the request cap skipped")
+    if kept:
+        top = max(kept, key=lambda item: item["requests"])
+        lines.append(
+            f"Largest: {top['keyword']} in {top['location']} on {top['site']} "
+            f"({top['requests']} requests)"
+        )
+    return "\n".join(lines)
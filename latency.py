@@ -0,0 +1,167 @@
+import collections
+
+from decouple import config
+
+# Share of the requests that may be sent twice to cut the tail latency, 0 to
+# never hedge. Hedging also needs at least two proxies.
+HEDGE_RATIO = config("HEDGE_RATIO", default=0.1, cast=float)
+
+# Timeouts of a host are its p99 response time times the factor, in bounds
+TIMEOUT_FACTOR = config("TIMEOUT_FACTOR", default=3.0, cast=float)
+TIMEOUT_FLOOR = config("TIMEOUT_FLOOR", default=5.0, cast=float)
+TIMEOUT_CEILING = config("TIMEOUT_CEILING", default=60.0, cast=float)
+
+
+class HostLatency:
+    def __init__(self, window: int = 200, min_samples: int = 20) -> None:
+        """
+        Rolling distribution of the response times of each host.
+
+        Args:
+            window (int): Number of response times kept per host.
+            min_samples (int): Response times needed before giving quantiles.
+
+        Returns:
+            None
+        """
+        self.window = window
+        self.min_samples = min_samples
+        self._samples = collections.defaultdict(
+            lambda: collections.deque(maxlen=self.window)
+        )
+
+    def add(self, host: str, seconds: float) -> None:
+        self._samples[host].append(seconds)
+
+    def add_censored(self, host: str, seconds: float) -> None:
+        """
+        Add the time a request ran before it was cancelled or timed out, a
+        lower bound of its response time. Without them the slowest requests
+        would never be sampled. Requests cut before the median response time
+        tell nothing about the tail, they aren't kept.
+
+        Args:
+            host (str): Host of the request.
+            seconds (float): Seconds the request ran.
+
+        Returns:
+            None
+        """
+        median = self.quantile(host, 0.5)
+        if median is None or seconds >= median:
+            self._samples[host].append(seconds)
+
+    def quantile(self, host: str, q: float) -> float | None:
+        """
+        Get a quantile of the response times of a host.
+
+        Args:
+            host (str): Host of the requests.
+            q (float): Quantile between 0 and 1, e.g. 0.95.
+
+        Returns:
+            float | None: Seconds, None until enough responses were seen.
+        """
+        samples = sorted(self._samples[host])
+        if len(samples) < self.min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+class Hedging:
+    def __init__(
+        self, latency: HostLatency, ratio: float = HEDGE_RATIO, quantile: float = 0.95
+    ) -> None:
+        """
+        Budget of the hedged requests: a request still running after the
+        `quantile` response time of its host is sent again through another
+        proxy, as long as at most `ratio` of the requests were hedged.
+
+        Args:
+            latency (HostLatency): Response times of the hosts.
+            ratio (float): Largest share of hedged requests.
+            quantile (float): Response time after which a request is hedged.
+
+        Returns:
+            None
+        """
+        self.latency = latency
+        self.ratio = ratio
+        self.quantile = quantile
+        self.requests = 0  # Requests that could have been hedged
+        self.hedges = 0  # Duplicate requests sent
+        self.wins = 0  # Duplicate requests answering first
+
+    def delay(self, host: str) -> float | None:
+        """
+        Count a request and get when to hedge it.
+
+        Args:
+            host (str): Host of the request.
+
+        Returns:
+            float | None: Seconds after which the request is hedged, None if
+                          it must not be.
+        """
+        self.requests += 1
+        if self.hedges >= self.ratio * self.requests:
+            return None
+        return self.latency.quantile(host, self.quantile)
+
+
+class AdaptiveTimeout:
+    def __init__(
+        self,
+        first_byte: HostLatency,
+        total: HostLatency,
+        factor: float = TIMEOUT_FACTOR,
+        floor: float = TIMEOUT_FLOOR,
+        ceiling: float = TIMEOUT_CEILING,
+        quantile: float = 0.99,
+    ) -> None:
+        """
+        Timeouts of the requests of each host derived from its response
+        times, so that a hung connection fails fast and frees its slot. The
+        hosts without enough responses yet get the ceiling.
+
+        Args:
+            first_byte (HostLatency): Times until the response headers.
+            total (HostLatency): Times until the end of the responses.
+            factor (float): Multiplier of the `quantile` response time.
+            floor (float): Shortest timeout in seconds.
+            ceiling (float): Longest timeout in seconds.
+            quantile (float): Response time the timeouts are based on.
+
+        Returns:
+            None
+        """
+        self.first_byte = first_byte
+        self.total = total
+        self.factor = factor
+        self.floor = floor
+        self.ceiling = ceiling
+        self.quantile = quantile
+
+    def _bound(self, latency: HostLatency, host: str) -> float:
+        seconds = latency.quantile(host, self.quantile)
+        if seconds is None:
+            return self.ceiling
+        return min(self.ceiling, max(self.floor, seconds * self.factor))
+
+    def get(self, host: str) -> dict:
+        """
+        Get the timeouts of a host.
+
+        Args:
+            host (str): Host of the request.
+
+        Returns:
+            dict: Seconds to connect, to get the first byte and in total, as
+                  keyword arguments of `aiohttp.ClientTimeout`.
+        """
+        first_byte = self._bound(self.first_byte, host)
+        return {
+            "total": max(first_byte, self._bound(self.total, host)),
+            "sock_connect": first_byte,
+            "sock_read": first_byte,
+        }
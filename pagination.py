@@ -0,0 +1,259 @@
+"""
+Pagination of the searches. The APIs accepting a page size can be probed
+for the largest one they honour, the result is cached for the next runs.
+
+Usage:
+    python -m yellowpages.pagination <scraper> <keywords> <location>
+"""
+
+import argparse
+import asyncio
+import collections
+import json
+import math
+import sys
+import threading
+import typing
+
+from decouple import config
+from loguru import logger as log
+from yellowpages.catalog import CATALOG_DIR
+
+# Page sizes found by `PageSize.probe`, by scraper
+PAGE_SIZES_FILE = CATALOG_DIR / "page-sizes.json"
+
+# Page sizes tried by `PageSize.probe`, in increasing order
+CANDIDATES = (10, 20, 25, 50, 100, 200, 500, 1000)
+
+
+def _load_page_sizes() -> dict:
+    if not PAGE_SIZES_FILE.exists():
+        return {}
+    try:
+        return json.loads(PAGE_SIZES_FILE.read_text(encoding="utf-8"))
+    except (ValueError, OSError) as err:
+        log.error(f"Error loading the page sizes: {err}")
+        return {}
+
+
+class PageSize:
+    def __init__(
+        self,
+        name: str,
+        default: int,
+        probe: typing.Callable[..., typing.Awaitable[tuple]] | None = None,
+    ) -> None:
+        """
+        Number of listings per search page of a scraper.
+
+        Websites with fixed pages only declare their size. The APIs taking
+        a page size also pass a `probe` coroutine function, called with a
+        page size followed by the arguments of `PageSize.probe` and returning
+        the number of listings of the first page and the total count. Their
+        size is, in order, the `<NAME>_PAGE_SIZE` setting, the probed size
+        or `default`.
+
+        Args:
+            name (str): Name of the scraper.
+            default (int): Page size used when nothing else is known.
+            probe (Callable): Coroutine function fetching a first page.
+
+        Returns:
+            None
+        """
+        self.name = name
+        self.default = default
+        self.probe_page = probe
+        self._value = None
+
+    @property
+    def value(self) -> int:
+        if self._value is None:
+            self._value = self.default
+            if self.probe_page is not None:
+                self._value = config(
+                    f"{self.name.upper()}_PAGE_SIZE", default=0, cast=int
+                ) or _load_page_sizes().get(self.name, self.default)
+        return self._value
+
+    def offset(self, page: int) -> int:
+        """Index of the first listing of a page, starting at page 1"""
+        return (page - 1) * self.value
+
+    def pages(self, total: int) -> int:
+        """Number of pages needed for `total` listings"""
+        return max(1, math.ceil(int(total) / self.value))
+
+    async def probe(self, *args: typing.Any, **kwargs: typing.Any) -> int:
+        """
+        Find the largest page size honoured by the API and cache it. Use a
+        search with many results, the arguments are passed to `probe_page`.
+
+        Returns:
+            int: The page size found.
+        """
+        if self.probe_page is None:
+            return self.value
+
+        best = self.default
+        for size in CANDIDATES:
+            try:
+                listings, total = await self.probe_page(size, *args, **kwargs)
+            except Exception as err:
+                log.error(f"Error probing a page size of {size}: {err}")
+                break
+            if listings >= size:
+                best = size
+                continue
+            if listings and listings < int(total or 0):
+                # The API caps the page below the requested size
+                best = max(best, listings)
+            break
+
+        sizes = _load_page_sizes()
+        sizes[self.name] = best
+        PAGE_SIZES_FILE.parent.mkdir(parents=True, exist_ok=True)
+        PAGE_SIZES_FILE.write_text(json.dumps(sizes), encoding="utf-8")
+        self._value = best
+        return best
+
+
+class Paginator:
+    def __init__(
+        self,
+        key: typing.Callable[[typing.Any], typing.Hashable] | None = None,
+        window: int = 8,
+        max_pages: int = 1000,
+    ) -> None:
+        """
+        Fetch the pages of a search in order, a few pages ahead, until a page
+        is empty or only repeats listings already seen. The total count of the
+        website is only used as an upper bound, as it is often missing or wrong.
+
+        Args:
+            key (Callable): Identity of a listing, the listing itself by default.
+            window (int): Pages fetched ahead of the one being processed.
+            max_pages (int): Last page fetched when there's no total count.
+
+        Returns:
+            None
+        """
+        self.key = key or (lambda item: json.dumps(item, sort_keys=True, default=str))
+        self.window = window
+        self.max_pages = max_pages
+        self.seen = set()  # Keys of the listings already returned
+        self.fetched = 0  # Number of pages requested, for the statistics
+
+    def unseen(self, items: list) -> list:
+        """
+        Remember listings and keep the ones not seen before.
+
+        Args:
+            items (list): Listings of a page.
+
+        Returns:
+            list: The new listings.
+        """
+        new = []
+        for item in items:
+            key = self.key(item)
+            if key not in self.seen:
+                self.seen.add(key)
+                new.append(item)
+        return new
+
+    async def pages(
+        self,
+        fetch: typing.Callable[[int], typing.Awaitable[list | None]],
+        last_page: int | None = None,
+        first_page: int = 2,
+        progress: threading.Event | None = None,
+    ) -> typing.AsyncIterator[list]:
+        """
+        Fetch the pages from `first_page` on.
+
+        Args:
+            fetch (Callable): Coroutine function returning the listings of a
+                              page, None if the request failed.
+            last_page (int): Last page according to the total count, if any.
+            first_page (int): First page to fetch.
+            progress (threading.Event): Progress of the search.
+
+        Yields:
+            list: The new listings of each page, in the order of the pages.
+        """
+        last_page = min(last_page or self.max_pages, self.max_pages)
+        running = collections.deque()  # (page, task) in the order of the pages
+        next_page = first_page
+        failures = 0
+        try:
+            while progress is None or progress.is_set():
+                while next_page <= last_page and len(running) < self.window:
+                    running.append((next_page, asyncio.ensure_future(fetch(next_page))))
+                    self.fetched += 1
+                    next_page += 1
+                if not running:
+                    break
+
+                _, task = running.popleft()
+                items = await task
+                if items is None:
+                    # Failed request, give up if the whole window failed
+                    failures += 1
+                    if failures >= self.window:
+                        break
+                    continue
+                failures = 0
+
+                items = self.unseen(items)
+                if not items:
+                    break  # Empty page or the last page served again
+                yield items
+        finally:
+            # Speculative pages past the end of the results
+            for _, task in running:
+                task.cancel()
+
+
+async def probe(scraper: str, keyword: str, location: str) -> int:
+    """
+    Probe the page size of a scraper with a search.
+
+    Args:
+        scraper (str): Name of the scraper module.
+        keyword (str): Search keywords, better with many results.
+        location (str): Location of the search.
+
+    Returns:
+        int: The page size found.
+    """
+    import aiohttp
+    from yellowpages.scrapers import Mapper
+
+    module = Mapper().get_module(scraper)
+    progress = threading.Event()
+    progress.set()
+    async with aiohttp.ClientSession() as session:
+        return await module.page_size.probe(
+            keyword,
+            location,
+            session=session,
+            semaphore=asyncio.Semaphore(10),
+            progress=progress,
+        )
+
+
+def main(argv: list | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("scraper")
+    parser.add_argument("keyword")
+    parser.add_argument("location")
+    args = parser.parse_args(argv)
+
+    size = asyncio.run(probe(args.scraper, args.keyword, args.location))
+    print(f"{args.scraper} page size: {size}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,181 @@
+import os
+import pathlib
+import sys
+import threading
+import time
+from collections import Counter
+
+
+class SamplingProfiler:
+    def __init__(self, interval: float = 0.01, max_depth: int = 64) -> None:
+        """
+        Low overhead statistical profiler. A daemon thread wakes up every
+        `interval` seconds, grabs the current stack of every other thread
+        and counts it. Nothing is hooked into the profiled code, so the
+        cost is bounded by the sampling rate rather than by how much work
+        the scrapers do.
+
+        Args:
+            interval (float): Seconds between two samples.
+            max_depth (int): Maximum number of frames kept per stack.
+
+        Returns:
+            None
+        """
+
+        self.interval = interval
+        self.max_depth = max_depth
+        self.stacks: Counter = Counter()  # Collapsed stack -> number of samples
+        self.samples = 0  # Number of sampling rounds taken
+        self.sampling_time = 0.0  # CPU time spent by the sampler itself
+        self.started_at = 0.0
+        self.stopped_at = 0.0
+        self._running = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def __enter__(self) -> "SamplingProfiler":
+        self.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    @property
+    def duration(self) -> float:
+        """Wall time covered by the profile in seconds."""
+        return (self.stopped_at or time.perf_counter()) - self.started_at
+
+    @property
+    def overhead(self) -> float:
+        """Fraction of the wall time the sampler spent collecting stacks."""
+        return self.sampling_time / self.duration if self.duration else 0.0
+
+    def start(self) -> None:
+        """
+        Start sampling in a background thread.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        if self._running.is_set():
+            return
+
+        self._running.set()
+        self.started_at = time.perf_counter()
+        self.stopped_at = 0.0
+        self._thread = threading.Thread(
+            target=self._sample_forever, name="SamplingProfiler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stop sampling and wait for the sampler thread to exit.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        if not self._running.is_set():
+            return
+
+        self._running.clear()
+        if self._thread is not None:
+            self._thread.join()
+        self.stopped_at = time.perf_counter()
+
+    def _sample_forever(self) -> None:
+        own_id = threading.get_ident()
+        while self._running.is_set():
+            started = time.thread_time()
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = self._collapse(frame)
+                if stack:
+                    self.stacks[f"{names.get(thread_id, thread_id)};{stack}"] += 1
+            self.samples += 1
+            self.sampling_time += time.thread_time() - started
+            time.sleep(self.interval)
+
+    def _collapse(self, frame) -> str:
+        """
+        Collapse a frame into a root first `module:function` chain.
+
+        Args:
+            frame (FrameType): Innermost frame of the thread.
+
+        Returns:
+            str: Frames joined by `;` as expected by flamegraph tools.
+        """
+        frames = []
+        while frame is not None and len(frames) < self.max_depth:
+            code = frame.f_code
+            module = os.path.splitext(os.path.basename(code.co_filename))[0]
+            frames.append(f"{module}:{code.co_name}:{code.co_firstlineno}")
+            frame = frame.f_back
+        return ";".join(reversed(frames))
+
+    def top_functions(self, limit: int = 25) -> list:
+        """
+        Aggregate the samples per function.
+
+        Args:
+            limit (int): Number of functions to return.
+
+        Returns:
+            list: (function, self samples, total samples) sorted by self samples.
+        """
+        own, total = Counter(), Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(";")[1:]  # Drop the thread name
+            if not frames:
+                continue
+            own[frames[-1]] += count
+            for function in set(frames):
+                total[function] += count
+
+        return [
+            (function, count, total[function])
+            for function, count in own.most_common(limit)
+        ]
+
+    def write(self, path: str | pathlib.Path, limit: int = 25) -> tuple:
+        """
+        Write the collapsed stacks and the top functions summary.
+
+        Args:
+            path (str | Path): Output path without extension, `.folded` and
+                               `.top.txt` are appended to it.
+            limit (int): Number of functions in the summary.
+
+        Returns:
+            tuple: Paths of the collapsed stack file and of the summary.
+        """
+        path = pathlib.Path(path)
+        folded = path.with_name(path.name + ".folded")
+        summary = path.with_name(path.name + ".top.txt")
+
+        with open(folded, "w", encoding="utf-8") as file:
+            for stack, count in self.stacks.most_common():
+                file.write(f"{stack} {count}\n")
+
+        sampled = sum(self.stacks.values()) or 1
+        with open(summary, "w", encoding="utf-8") as file:
+            file.write(
+                f"Duration: {self.duration:.2f}s, samples: {self.samples}, "
+                f"overhead: {self.overhead:.2%}\n\n"
+            )
+            file.write(f"{'self %':>8} {'total %':>8}  function\n")
+            for function, own, total in self.top_functions(limit):
+                file.write(
+                    f"{own / sampled:>8.2%} {total / sampled:>8.2%}  {function}\n"
+                )
+
+        return folded, summary
@@ -85,3 +85,27 @@ def get(self) -> str | None:
             return proxy
 
         return
+
+    def share(self, index: int, count: int, budget: int = 0) -> "Proxy":
+        """
+        Proxies of one of `count` sites scraped at the same time, so that a
+        site doesn't wear out the proxies of the others.
+
+        Args:
+            index (int): Position of the site.
+            count (int): Number of sites sharing the proxies.
+            budget (int): Number of proxies of the site, 0 for an even share.
+
+        Returns:
+            Proxy: The proxies of the site. The shares are disjoint unless
+                   there are fewer proxies than sites or the budgets overlap.
+        """
+        share = Proxy()
+        if self._proxy_list:
+            count = max(1, count)
+            start = index * self.total // count
+            end = (index + 1) * self.total // count
+            proxies = self._proxy_list[start:] + self._proxy_list[:start]
+            share._proxy_list = proxies[: budget or max(1, end - start)]
+            share.total = len(share._proxy_list)
+        return share
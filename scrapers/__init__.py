@@ -1,33 +1,32 @@
-from . import austria  # noqa: F401
-from . import belgium  # noqa: F401
-from . import canada  # noqa: F401
-from . import germany  # noqa: F401
-from . import ireland  # noqa: F401
-from . import italy  # noqa: F401
-from . import nicaragua  # noqa: F401
-from . import south_africa  # noqa: F401
-from . import switzerland  # noqa: F401
-from . import usa  # noqa: F401
+import importlib
 
 
 class Mapper:
     def __init__(self) -> None:
+        # Website -> (scraper module, whether it has a dropdown of locations).
+        # The modules are only imported once their website is selected.
         self.mapping = {
-            "austria": (austria, False),
-            "belgium": (belgium, False),
-            "canada": (canada, True),
-            "germany": (germany, False),
-            "ireland": (ireland, False),
-            "italy": (italy, False),
-            "nicaragua": (nicaragua, False),
-            "switzerland": (switzerland, False),
-            "south_africa": (south_africa, False),
-            "USA": (usa, False),
+            "austria": ("austria", False),
+            "belgium": ("belgium", False),
+            "canada": ("canada", True),
+            "germany": ("germany", False),
+            "ireland": ("ireland", False),
+            "italy": ("italy", False),
+            "nicaragua": ("nicaragua", False),
+            "switzerland": ("switzerland", False),
+            "south_africa": ("south_africa", False),
+            "usa": ("usa", False),
         }
 
-    def get_search(self, country):
+    def get_module(self, country):
         country = country.lower().replace(" ", "_")
-        module, _ = self.mapping.get(country)
+        module, _ = self.mapping.get(country, (None, False))
+        if module is None:
+            return None
+        return importlib.import_module(f"{__name__}.{module}")
+
+    def get_search(self, country):
+        module = self.get_module(country)
         if "search" in dir(module):
             return module.search
         return None
@@ -41,5 +40,5 @@ def get_dropdown(self, country):
         country = country.lower().replace(" ", "_")
         _, dropdown = self.mapping.get(country, (None, False))
         if dropdown:
-            return self.mapping[country][0].DROPDOWN_OPTIONS
+            return self.get_module(country).DROPDOWN_OPTIONS
         return dropdown
@@ -1,5 +1,5 @@
 import asyncio
-import math
+import json
 import re
 import threading
 from typing import List, Optional
@@ -9,11 +9,27 @@
 from loguru import logger as log
 from parsel import Selector
 from typing_extensions import TypedDict
+from yellowpages.blocks import BlockSignature
+from yellowpages.catalog import CATALOG_DIR, Resolver
+from yellowpages.pagination import PageSize, Paginator
 from yellowpages.proxy import Proxy
-from yellowpages.utils import EventManager, make_request
+from yellowpages.utils import NOT_FOUND, EventManager, blocks, make_request
 
 event = EventManager()
 
+# Host of the website
+HOST = "www.herold.at"
+
+# Block pages, the Next.js data of the searches always has page props, the
+# home page and the locations API are left out
+blocks.register(HOST, BlockSignature(sentinels=('"pageProps"',), pages=r"/_next/data/"))
+
+# Fixed by the website
+page_size = PageSize("austria", 30)
+
+# Next.js build ID of herold.at, kept between runs
+BUILD_ID_FILE = CATALOG_DIR / "austria-build-id.txt"
+
 
 class Company(TypedDict):
     """type hint container for company data found"""
@@ -28,6 +44,19 @@ class Company(TypedDict):
     zip_code: str
 
 
+# Selectors of the fields in the search results, reported when they stop matching
+SELECTORS = {
+    "listings": "pageProps.results.nodes",
+    "name": "name",
+    "categories": "industry",
+    "phone": "tel",
+    "location": "address",
+    "city": "city",
+    "state": "state",
+    "zip_code": "zip",
+}
+
+
 def parse_companies(company_info) -> Company:
     """
     Parse the company information from the HTML response.
@@ -58,10 +87,10 @@ def parse_companies(company_info) -> Company:
                 "state": first("state"),
             }
             companies.append(info)
-            event.emit("update_total", 1)
         except Exception as e:
             log.error(f"Error parsing search results: {e}")
             continue
+
     return companies
 
 
@@ -88,7 +117,7 @@ async def scrape_company(
         session, url, semaphore=semaphore, proxy=proxy, progress=progress
     )
 
-    if not (progress.is_set() or page):
+    if not (progress.is_set() and page):
         return
 
     try:
@@ -98,14 +127,198 @@ async def scrape_company(
         log.error(f"Error scraping company: {e}")
 
 
-async def get_suggested_location(session: aiohttp.ClientSession, location: str) -> str:
+async def fetch_suggested_location(
+    location: str,
+    session: aiohttp.ClientSession,
+    semaphore: asyncio.Semaphore = asyncio.Semaphore(10),
+    proxy: Proxy = None,
+    progress: threading.Event = None,
+) -> Optional[str]:
     url = "https://www.herold.at/api/geo/search/?term=" + location
-    async with session.get(url) as response:
-        if response.ok:
-            data = await response.json()
-            if data:
-                return data[0]["label"]
-    return location
+    response = await make_request(
+        session, url, semaphore=semaphore, proxy=proxy, progress=progress
+    )
+    try:
+        return json.loads(response)[0]["label"]
+    except (ValueError, KeyError, IndexError, TypeError):
+        return None
+
+
+# Suggested locations, by raw location typed by the user
+suggestions = Resolver("austria", fetch_suggested_location)
+
+
+async def get_suggested_location(
+    session: aiohttp.ClientSession,
+    location: str,
+    semaphore: asyncio.Semaphore = asyncio.Semaphore(10),
+    proxy: Proxy = None,
+    progress: threading.Event = None,
+) -> str:
+    """
+    Get the location suggested by the website for `location`, looked up
+    once per location and then answered from the cache.
+
+    Args:
+        session (aiohttp.ClientSession): The aiohttp session object.
+        location (str): The location typed by the user.
+
+    Returns:
+        str: The suggested location, `location` itself if there is none.
+    """
+    return await suggestions.resolve(
+        location, session, semaphore=semaphore, proxy=proxy, progress=progress
+    )
+
+
+class BuildId:
+    def __init__(self, path=BUILD_ID_FILE) -> None:
+        """
+        Next.js build ID needed by the herold.at API, cached in memory and
+        on disk, and fetched from the home page only when it is unknown or
+        went stale.
+
+        Args:
+            path (Path): File the build ID is saved to.
+
+        Returns:
+            None
+        """
+        self.path = path
+        self.value = path.read_text().strip() if path.exists() else None
+        self.fetches = 0  # Number of home page downloads
+        self._task = None
+
+    async def _fetch(self, session: aiohttp.ClientSession, progress: threading.Event):
+        self.fetches += 1
+        home_page = await make_request(
+            session, "https://www.herold.at/", progress=progress
+        )
+        match = re.search(r'"buildId":\s*"([a-zA-Z0-9-]+)"', home_page)
+        if match is None:
+            return None
+        self.value = match.group(1)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.write_text(self.value)
+        return self.value
+
+    async def get(
+        self,
+        session: aiohttp.ClientSession,
+        progress: threading.Event,
+        stale: Optional[str] = None,
+    ) -> Optional[str]:
+        """
+        Get the build ID. Concurrent searches share a single download.
+
+        Args:
+            session (aiohttp.ClientSession): The aiohttp session object.
+            progress (threading.Event): Progress of the search.
+            stale (str): Build ID rejected by the API, to replace.
+
+        Returns:
+            Optional[str]: The build ID, None if the home page has none.
+        """
+        if self.value and self.value != stale:
+            return self.value
+        if (
+            self._task is None
+            or self._task.done()
+            or self._task.get_loop() is not asyncio.get_running_loop()
+        ):
+            self._task = asyncio.ensure_future(self._fetch(session, progress))
+        return await asyncio.shield(self._task)
+
+
+build_id = BuildId()
+
+
+async def refresh_url(
+    url: str, session: aiohttp.ClientSession, progress: threading.Event
+) -> str:
+    """
+    Rebuild the URL of a failed request with the current build ID, the one
+    it was made with may have gone stale since.
+
+    Args:
+        url (str): URL of the request.
+        session (aiohttp.ClientSession): The aiohttp session object.
+        progress (threading.Event): Progress of the retry.
+
+    Returns:
+        str: The URL with the current build ID, `url` if it has none.
+    """
+    token = await build_id.get(session, progress)
+    if token is None:
+        return url
+    return re.sub(r"/_next/data/[^/]+/", f"/_next/data/{token}/", url, count=1)
+
+
+def search_url(token: str, query: str, location: str, page: int) -> str:
+    """Create the URL of a search page."""
+    base_url = f"https://www.herold.at/_next/data/{token}/gelbe-seiten/suche.json?"
+    parameters = {
+        "userTerm": query,
+        "geoLabel": location,
+        "seite": page,
+    }
+    return base_url + urlencode(parameters)
+
+
+def parse_total(response) -> int:
+    """
+    Parse the total number of results of a search page.
+
+    Args:
+        response (str): The response of the search page.
+
+    Returns:
+        int: The number of results, 0 if it is missing.
+    """
+    sel = Selector(text=response)
+    return int(sel.jmespath("pageProps.results.totalCount").get(0))
+
+
+async def fetch_first_page(
+    query: str,
+    location: str,
+    session: aiohttp.ClientSession,
+    semaphore: asyncio.Semaphore = asyncio.Semaphore(10),
+    proxy: Proxy = None,
+    progress: threading.Event = None,
+) -> str:
+    """Get the first page of a search, also used to estimate its size."""
+    # Locate close matches to the location
+    location = await get_suggested_location(
+        session, location, semaphore=semaphore, proxy=proxy, progress=progress
+    )
+
+    # The website API uses a token which changes every time the website
+    # is built (Next.js), shared by all the searches until it goes stale
+    token = await build_id.get(session, progress)
+    if token is None:
+        return ""
+
+    page = await make_request(
+        session,
+        search_url(token, query, location, 1),
+        semaphore=semaphore,
+        proxy=proxy,
+        progress=progress,
+    )
+    if page is NOT_FOUND and progress is not None and progress.is_set():
+        # The website was rebuilt, the token is stale
+        token = await build_id.get(session, progress, stale=token)
+        if token is None:
+            return ""
+        page = await make_request(
+            session,
+            search_url(token, query, location, 1),
+            semaphore=semaphore,
+            proxy=proxy,
+            progress=progress,
+        )
+    return page
 
 
 async def search(
@@ -115,6 +328,8 @@ async def search(
     location: Optional[str] = None,
     proxy: Proxy = None,
     progress: threading.Event = threading.Event(),
+    fields: Optional[List[str]] = None,
+    first_page: Optional[str] = None,
 ) -> List[Company]:
     """
     Search yellowpages.com for business preview information scraping all of the pages.
@@ -124,64 +339,83 @@ async def search(
         session (aiohttp.ClientSession): The aiohttp session object.
         location (str): The location to search in.
         proxy (str): The proxy to use.
+        fields (List[str]): Unused, the search results have every field.
+        first_page (str): First page of the search if already fetched,
+                          e.g. by the estimate of the job.
 
     Returns:
         List[Preview]: The list of preview data.
     """
 
-    # Locate close matches to the location
-    location = await get_suggested_location(session, location)
-
-    # The website API uses a token to make requests which changes
-    # every time the website is built (Next.js) so we need to get
-    # the build ID from the home page
-    home_page = await make_request(session, "https://www.herold.at/", progress=progress)
-    pattern = re.compile(r'"buildId":\s*"([a-zA-Z0-9-]+)"')
-    if not home_page or re.search(pattern, home_page) is None:
-        return []
-    token = re.search(pattern, home_page).group(1)
+    companies = []
 
-    def make_search_url(page):
-        """Create the search URL."""
-        # token = awaget_session_token()
-        base_url = f"https://www.herold.at/_next/data/{token}/gelbe-seiten/suche.json?"
-        parameters = {
-            "userTerm": query,
-            "geoLabel": location,
-            "seite": page,
-        }
-        return base_url + urlencode(parameters)
+    def add_companies(infos):
+        """Publish the new companies of a page."""
+        event.add("update_total", len(infos))
+        event.emit("companies", infos)
+        companies.extend(infos)
 
-    companies = []
-    # print("Search URL", make_search_url(1), file=open("search_url.txt", "w"))
     # Get the first page of the search results
-    first_page_content = await make_request(
-        session, make_search_url(1), proxy=proxy, progress=progress, semaphore=semaphore
+    first_page_content = first_page or await fetch_first_page(
+        query, location, session, semaphore=semaphore, proxy=proxy, progress=progress
+    )
+    if not first_page_content:
+        return companies
+
+    # The other pages use the location and the token of the first one, cached,
+    # until the token goes stale
+    location = await get_suggested_location(
+        session, location, semaphore=semaphore, proxy=proxy, progress=progress
     )
-    # from pprint import pprint
+    token = build_id.value
 
-    companies.extend(parse_companies(first_page_content))
+    def make_search_url(page):
+        """Create the search URL."""
+        return search_url(token, query, location, page)
+
+    paginator = Paginator()
+    add_companies(paginator.unseen(parse_companies(first_page_content)))
 
     if not progress.is_set():
         return companies
 
     # Get the total number of pages
-    sel = Selector(text=first_page_content)
-    total_count = int(sel.jmespath("pageProps.results.totalCount").get(0))
-    total_pages = math.ceil(total_count // 30)
-    try:
-        for infos in await asyncio.gather(
-            *[
-                scrape_company(
-                    make_search_url(page), session, proxy, progress, semaphore
+    total_count = parse_total(first_page_content)
+    last_page = page_size.pages(total_count) if total_count else None
+
+    async def fetch_page(page):
+        """Get the companies of a page, None if the request failed."""
+        nonlocal token
+        content = await make_request(
+            session,
+            make_search_url(page),
+            semaphore=semaphore,
+            proxy=proxy,
+            progress=progress,
+        )
+        if content is NOT_FOUND and progress.is_set():
+            # The website was rebuilt since the first page, the token is stale
+            current = await build_id.get(session, progress, stale=token)
+            if current is not None and current != token:
+                token = current
+                content = await make_request(
+                    session,
+                    make_search_url(page),
+                    semaphore=semaphore,
+                    proxy=proxy,
+                    progress=progress,
                 )
-                for page in range(2, total_pages + 1)
-                if progress.is_set()
-            ]
-        ):
-            if not infos:
-                continue
-            companies.extend(infos)
+        if not (content and progress.is_set()):
+            return None
+        try:
+            return parse_companies(content)
+        except Exception as e:
+            log.error(f"Error parsing search results: {e}")
+
+    # Scrape the rest of the pages, until they run out
+    try:
+        async for infos in paginator.pages(fetch_page, last_page, progress=progress):
+            add_companies(infos)
     except Exception as err:
         log.error(f"Error scraping search results: {err}")
 
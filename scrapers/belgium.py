@@ -1,5 +1,4 @@
 import asyncio
-import math
 import threading
 from typing import List, Optional
 from urllib.parse import urljoin
@@ -8,17 +7,29 @@
 from loguru import logger as log
 from parsel import Selector
 from typing_extensions import TypedDict
+from yellowpages.blocks import BlockSignature
+from yellowpages.pagination import PageSize, Paginator
 from yellowpages.proxy import Proxy
-from yellowpages.utils import EventManager, make_request
+from yellowpages.utils import EventManager, blocks, has_fields, make_request
 
 event = EventManager()
 
+# Host of the website
+HOST = "www.goldenpages.be"
+
+# Block pages, the real ones are HTML documents of a few kB at least
+blocks.register(HOST, BlockSignature(min_size=512))
+
+# Fixed by the website
+page_size = PageSize("belgium", 20)
+
 
 class Preview(TypedDict):
     """Type hint container for preview data. This object just helps us to keep track what results we'll be getting"""
 
     name: str
     url: str
+    company: "Company"  # The fields found in the search results
 
 
 class Company(TypedDict):
@@ -37,6 +48,20 @@ class Company(TypedDict):
     zip_code: str
 
 
+# Selectors of the fields in the company pages, reported when they stop matching
+SELECTORS = {
+    "listings": "[itemprop='itemListElement']",
+    "name": "h1[itemprop='name'] > span::text",
+    "categories": "a.category >::text",
+    "phone": "a[href*=tel]::attr(href)",
+    "email": "a[href*=mailto]::attr(href)",
+    "location": "span[data-yext='street']::text",
+    "city": "span[data-yext='city-district']::text",
+    "state": "span[data-yext='city']::text",
+    "zip_code": "span[data-yext='postal-code']::text",
+}
+
+
 def parse_company(company_info) -> Company:
     """
     Parse the company information from the HTML response.
@@ -97,6 +122,16 @@ def parse_search(response) -> Preview:
                         "https://www.goldenpages.be/",
                         first("a[data-ta='MoreInfoClick']::attr(href)"),
                     ),
+                    "company": {
+                        "name": name,
+                        "categories": "",
+                        "phone": first("a[href*=tel]::attr(href)").replace("tel:", ""),
+                        "email": "",
+                        "location": first("span[data-yext='street']::text"),
+                        "zip_code": first("span[data-yext='postal-code']::text"),
+                        "city": first("span[data-yext='city-district']::text"),
+                        "state": first("span[data-yext='city']::text"),
+                    },
                 }
             )
         except Exception as e:
@@ -134,12 +169,53 @@ async def scrape_company(
     try:
         company_info = parse_company(page)
         if company_info["name"] != "":
-            event.emit("update_total", 1)
+            event.add("update_total")
+            event.emit("companies", [company_info])
             return company_info
     except Exception as e:
         log.error(f"Error scraping company: {e}")
 
 
+def search_url(query: str, location: str, page: int) -> str:
+    """Create the URL of a search page."""
+    base_url = "https://www.goldenpages.be/search/"
+    parameters = [query, location, str(page)]
+    return base_url + "/".join(parameters)
+
+
+def parse_total(response) -> int:
+    """
+    Parse the total number of results of a search page.
+
+    Args:
+        response (str): The response of the search page.
+
+    Returns:
+        int: The number of results, 0 if it is missing.
+    """
+    sel = Selector(text=response)
+    total_results = sel.css("span.count::text").get("").strip().replace(" ", "")
+    return int(total_results) if total_results.isdigit() else 0
+
+
+async def fetch_first_page(
+    query: str,
+    location: str,
+    session: aiohttp.ClientSession,
+    semaphore: asyncio.Semaphore = asyncio.Semaphore(10),
+    proxy: Proxy = None,
+    progress: threading.Event = None,
+) -> str:
+    """Get the first page of a search, also used to estimate its size."""
+    return await make_request(
+        session,
+        search_url(query, location, 1),
+        semaphore=semaphore,
+        proxy=proxy,
+        progress=progress,
+    )
+
+
 async def search(
     query: str,
     session: aiohttp.ClientSession,
@@ -147,6 +223,8 @@ async def search(
     location: Optional[str] = None,
     proxy: Proxy = None,
     progress: threading.Event = threading.Event(),
+    fields: Optional[List[str]] = None,
+    first_page: Optional[str] = None,
 ) -> List[Preview]:
     """
     Search for business preview information scraping all of the pages.
@@ -156,6 +234,11 @@ async def search(
         session (aiohttp.ClientSession): The aiohttp session object.
         location (str): The location to search in.
         proxy (str): The proxy to use.
+        fields (List[str]): The fields needed, company pages are only
+                            fetched for the listings missing one of them.
+                            None to fetch every company page.
+        first_page (str): First page of the search if already fetched,
+                          e.g. by the estimate of the job.
 
     Returns:
         List[Preview]: The list of preview data.
@@ -163,14 +246,23 @@ async def search(
 
     def make_search_url(page):
         """Create the search URL."""
-        base_url = "https://www.goldenpages.be/search/"
-        parameters = [query, location, str(page)]
-        return base_url + "/".join(parameters)
+        return search_url(query, location, page)
 
     async def gather_companies(previews: List[Preview]) -> List[Company]:
         """Gather the previews."""
         _companies = []
 
+        # Companies whose search listing already has every requested field
+        listed = [
+            result["company"]
+            for result in previews
+            if has_fields(result["company"], fields)
+        ]
+        if listed:
+            event.add("update_total", len(listed))
+            event.emit("companies", listed)
+            _companies.extend(listed)
+
         for result in await asyncio.gather(
             *[
                 scrape_company(
@@ -181,21 +273,22 @@ async def gather_companies(previews: List[Preview]) -> List[Company]:
                     semaphore=semaphore,
                 )
                 for result in previews
-                if progress.is_set()
+                if progress.is_set() and not has_fields(result["company"], fields)
             ]
         ):
             if result and isinstance(result, (dict, Company)):
-                companies.append(result)
+                _companies.append(result)
 
         return _companies
 
     companies = []
     # Get the first page of the search results
-    first_page_content = await make_request(
-        session, make_search_url(1), proxy=proxy, progress=progress, semaphore=semaphore
+    first_page_content = first_page or await fetch_first_page(
+        query, location, session, semaphore=semaphore, proxy=proxy, progress=progress
     )
 
-    previews = parse_search(first_page_content)
+    paginator = Paginator(key=lambda preview: preview["url"])
+    previews = paginator.unseen(parse_search(first_page_content))
 
     if not previews or not progress.is_set():
         return companies
@@ -207,36 +300,25 @@ async def gather_companies(previews: List[Preview]) -> List[Company]:
         return companies
 
     # Get the total number of pages
-    sel = Selector(text=first_page_content)
-    total_results = sel.css("span.count::text").get("").strip().replace(" ", "")
-    total_pages = int(math.ceil(int(total_results) / 20)) if total_results else 1
-
-    # Scrape the rest of the pages
+    total_results = parse_total(first_page_content)
+    last_page = page_size.pages(total_results) if total_results else None
+
+    async def fetch_page(page):
+        """Get the previews of a page, None if the request failed."""
+        content = await make_request(
+            session,
+            make_search_url(page),
+            semaphore=semaphore,
+            proxy=proxy,
+            progress=progress,
+        )
+        return parse_search(content) if content else None
+
+    # Scrape the rest of the pages, until they run out
     try:
-        for page in await asyncio.gather(
-            *[
-                make_request(
-                    session,
-                    make_search_url(page),
-                    semaphore=semaphore,
-                    proxy=proxy,
-                    progress=progress,
-                )
-                for page in range(2, total_pages + 1)
-                if progress.is_set()
-            ]
+        async for page_previews in paginator.pages(
+            fetch_page, last_page, progress=progress
         ):
-            if not progress.is_set():
-                break
-
-            if not page:
-                continue
-
-            page_previews = parse_search(page)
-
-            if not page_previews:
-                continue
-
             companies.extend(await gather_companies(page_previews))
     except Exception as err:
         log.error(f"Error scraping search results: {err}")
@@ -1,5 +1,4 @@
 import asyncio
-import math
 import threading
 from typing import List, Optional
 
@@ -7,12 +6,21 @@
 from loguru import logger as log
 from parsel import Selector
 from typing_extensions import TypedDict
+from yellowpages.blocks import BlockSignature
+from yellowpages.catalog import Catalog
+from yellowpages.pagination import PageSize, Paginator
 from yellowpages.proxy import Proxy
-from yellowpages.utils import EventManager, make_request
+from yellowpages.utils import EventManager, blocks, has_fields, make_request
 
 event = EventManager()
 
-locations = {
+# Host of the website
+HOST = "services.411.ca"
+
+# Block pages, the searches have a result and the businesses data
+blocks.register(HOST, BlockSignature(sentinels=('"searchResult"', '"data"')))
+
+LOCATIONS = {
     "Toronto": "23603",
     "Mississauga": "15074",
     "North York": "16385",
@@ -58,32 +66,12 @@
     "Edmonton, AB": "6493",
     "Golden, BC": "8319",
     "Haliburton": "8995",
-    "Coffee Shops": "2512",
-    "Restaurants": "827",
-    "Unknown": "20014",
-    "Bakeries": "2536",
-    "Bars": "2468",
-    "Catering": "2520",
-    "Coffee Roasting": "1677",
-    "Delicatessens": "2544",
-    "Internet Cafes": "696",
-    "Café": "12632",
-    "Grocery Stores": "2510",
-    "Coffee": "2603",
-    "Italian Restaurants": "2630",
-    "Ice Cream": "2704",
-    "Beverage Supplies": "1753",
-    "Bistro": "2574",
-    "Pizza": "6324",
-    "Franchising": "1121",
-    "Tea": "3302",
-    "Donuts": "2572",
-    "Sandwiches": "2678",
-    "Bagels": "2712",
-    "Pastries": "2581",
 }
 
-DROPDOWN_OPTIONS = list(locations.keys())
+# City IDs, grown with the ones found on the company pages
+locations = Catalog("canada-locations", seed=LOCATIONS)
+
+DROPDOWN_OPTIONS = locations.labels()
 
 
 class Preview(TypedDict):
@@ -91,6 +79,7 @@ class Preview(TypedDict):
 
     name: str
     url: str
+    company: "Company"  # The fields found in the search results
 
 
 class Company(TypedDict):
@@ -109,6 +98,20 @@ class Company(TypedDict):
     zip_code: str
 
 
+# Selectors of the fields in the company pages, reported when they stop matching
+SELECTORS = {
+    "listings": "searchResult[0].merchants",
+    "name": "data.name",
+    "categories": "data.categories[*].name",
+    "phone": "data.phone[*].value",
+    "email": "data.email.address",
+    "location": "data.address.addressLine1",
+    "city": "data.address.city.name",
+    "state": "data.address.city.province.name",
+    "zip_code": "data.address.postalcode",
+}
+
+
 def parse_company(company_info) -> Company:
     """
     Parse the company information from the HTML response.
@@ -139,6 +142,23 @@ def parse_company(company_info) -> Company:
     return info
 
 
+def parse_cities(company_info) -> dict:
+    """
+    Parse the city ID of a company page.
+
+    Args:
+        company_info (str): The JSON response containing the company information.
+
+    Returns:
+        dict: The city label -> ID, empty if the page has none.
+    """
+    selector = Selector(text=company_info, type="json")
+    city = selector.jmespath("data.address.city")
+    if not city.jmespath("id").get():
+        return {}
+    return {city.jmespath("name").get("").strip(): str(city.jmespath("id").get())}
+
+
 def parse_search(response) -> Preview:
     """
     Parse search page for business preview data.
@@ -162,6 +182,16 @@ def parse_search(response) -> Preview:
                 {
                     "name": merchantId,
                     "url": f"https://services.411.ca/business/{merchantId}?lang=EN",
+                    "company": {
+                        "name": result.jmespath("name").get("").strip(),
+                        "categories": "",
+                        "phone": "",
+                        "email": "",
+                        "location": "",
+                        "city": "",
+                        "state": "",
+                        "zip_code": "",
+                    },
                 }
             )
         except Exception as e:
@@ -198,13 +228,115 @@ async def scrape_company(
 
     try:
         company_info = parse_company(page)
+        locations.add(parse_cities(page))
         if company_info["name"] != "":
-            event.emit("update_total", 1)
+            event.add("update_total")
+            event.emit("companies", [company_info])
             return company_info
     except Exception as e:
         log.error(f"Error scraping company: {e}")
 
 
+def make_json_data(query: str, city: str, page: int, size: int = None) -> dict:
+    """Create the json_data of a search page."""
+    size = size or page_size.value
+    return {
+        "search": [
+            {
+                "collection": "MERCHANT",
+                "language": "EN",
+                "query": query,
+                "randomSeed": 4178732771847,
+                "userLocation": {
+                    "approximateLocation": "43.755091,-79.347743",
+                },
+                "results": [
+                    {
+                        "type": "ROOT",
+                        "from": size * (page - 1),
+                        "count": size,
+                        "sort": "411_advertiser",
+                    },
+                ],
+                "dimension": f"(city = {city})",
+            },
+        ],
+    }
+
+
+async def probe_page(
+    size: int,
+    query: str,
+    location: str,
+    session: aiohttp.ClientSession,
+    semaphore: asyncio.Semaphore,
+    progress: threading.Event,
+) -> tuple:
+    """
+    Fetch a first search page of `size` listings.
+
+    Returns:
+        tuple: The number of listings of the page and the total count.
+    """
+    page = await make_request(
+        session,
+        "https://services.411.ca/search-business/",
+        semaphore=semaphore,
+        progress=progress,
+        json=make_json_data(query, locations.resolve(location), 1, size),
+        is_post=True,
+        headers={"Content-Type": "application/json"},
+    )
+    sel = Selector(text=page or "{}", type="json")
+    total = sel.jmespath("searchResult[0].summary.pagination.numFound").get(0)
+    return len(parse_search(page or "{}")), total
+
+
+# The API takes the number of listings per page
+page_size = PageSize("canada", 25, probe=probe_page)
+
+
+def parse_total(response) -> int:
+    """
+    Parse the total number of results of a search page.
+
+    Args:
+        response (str): The response of the search page.
+
+    Returns:
+        int: The number of results, 0 if it is missing.
+    """
+    sel = Selector(text=response, type="json")
+    return int(sel.jmespath("searchResult[0].summary.pagination.numFound").get(0))
+
+
+async def fetch_first_page(
+    query: str,
+    location: str,
+    session: aiohttp.ClientSession,
+    semaphore: asyncio.Semaphore = asyncio.Semaphore(10),
+    proxy: Proxy = None,
+    progress: threading.Event = None,
+) -> str:
+    """Get the first page of a search, also used to estimate its size."""
+    city = locations.resolve(location) if location else LOCATIONS["Toronto"]
+    if city is None:
+        return ""
+    return await make_request(
+        session,
+        "https://services.411.ca/search-business/",
+        semaphore=semaphore,
+        proxy=proxy,
+        progress=progress,
+        json=make_json_data(query, city, 1),
+        is_post=True,
+        headers={
+            "Content-Type": "application/json",
+            "Accept": "application/json, text/plain, */*",
+        },
+    )
+
+
 async def search(
     query: str,
     session: aiohttp.ClientSession,
@@ -212,6 +344,8 @@ async def search(
     location: Optional[str] = None,
     proxy: Proxy = None,
     progress: threading.Event = threading.Event(),
+    fields: Optional[List[str]] = None,
+    first_page: Optional[str] = None,
 ) -> List[Preview]:
     """
     Search for business preview information scraping all of the pages.
@@ -221,40 +355,31 @@ async def search(
         session (aiohttp.ClientSession): The aiohttp session object.
         location (str): The location to search in.
         proxy (str): The proxy to use.
+        fields (List[str]): The fields needed, company pages are only
+                            fetched for the listings missing one of them.
+                            None to fetch every company page.
+        first_page (str): First page of the search if already fetched,
+                          e.g. by the estimate of the job.
 
     Returns:
         List[Preview]: The list of preview data.
     """
 
-    def make_json_data(page):
-        """Create the json_data."""
-        return {
-            "search": [
-                {
-                    "collection": "MERCHANT",
-                    "language": "EN",
-                    "query": query,
-                    "randomSeed": 4178732771847,
-                    "userLocation": {
-                        "approximateLocation": "43.755091,-79.347743",
-                    },
-                    "results": [
-                        {
-                            "type": "ROOT",
-                            "from": 25 * (page - 1),
-                            "count": 25,
-                            "sort": "411_advertiser",
-                        },
-                    ],
-                    "dimension": f"(city = {locations.get(location, 23603)})",
-                },
-            ],
-        }
-
     async def gather_companies(previews: List[Preview]) -> List[Company]:
         """Gather the previews."""
         _companies = []
 
+        # Companies whose search listing already has every requested field
+        listed = [
+            result["company"]
+            for result in previews
+            if has_fields(result["company"], fields)
+        ]
+        if listed:
+            event.add("update_total", len(listed))
+            event.emit("companies", listed)
+            _companies.extend(listed)
+
         for result in await asyncio.gather(
             *[
                 scrape_company(
@@ -265,33 +390,29 @@ async def gather_companies(previews: List[Preview]) -> List[Company]:
                     semaphore=semaphore,
                 )
                 for result in previews
-                if progress.is_set()
+                if progress.is_set() and not has_fields(result["company"], fields)
             ]
         ):
             if result and isinstance(result, (dict, Company)):
-                companies.append(result)
+                _companies.append(result)
 
+        locations.save()
         return _companies
 
     BASE_URL = "https://services.411.ca/search-business/"
 
     companies = []
-    headers = {
-        "Content-Type": "application/json",
-        "Accept": "application/json, text/plain, */*",
-    }
+    city = locations.resolve(location) if location else LOCATIONS["Toronto"]
+    if city is None:
+        log.error(f"Unknown location: {location}")
+        return companies
+
     # Get the first page of the search results
-    first_page_content = await make_request(
-        session,
-        BASE_URL,
-        proxy=proxy,
-        progress=progress,
-        semaphore=semaphore,
-        json=make_json_data(1),
-        is_post=True,
-        headers=headers,
+    first_page_content = first_page or await fetch_first_page(
+        query, location, session, semaphore=semaphore, proxy=proxy, progress=progress
     )
-    previews = parse_search(first_page_content)
+    paginator = Paginator(key=lambda preview: preview["url"])
+    previews = paginator.unseen(parse_search(first_page_content))
 
     if not previews or not progress.is_set():
         return companies
@@ -301,37 +422,28 @@ async def gather_companies(previews: List[Preview]) -> List[Company]:
     if not progress.is_set():
         return companies
 
-    sel = Selector(text=first_page_content, type="json")
-    total_results = sel.jmespath("searchResult[0].summary.pagination.numFound").get(0)
+    total_results = parse_total(first_page_content)
 
-    total_pages = int(math.ceil(int(total_results) / 25)) if total_results else 1
-    try:
-        for page in await asyncio.gather(
-            *[
-                make_request(
-                    session,
-                    BASE_URL,
-                    semaphore=semaphore,
-                    proxy=proxy,
-                    progress=progress,
-                    json=make_json_data(page),
-                    is_post=True,
-                )
-                for page in range(2, total_pages + 1)
-                if progress.is_set()
-            ]
-        ):
-            if not progress.is_set():
-                break
-
-            if not page:
-                continue
-
-            page_previews = parse_search(page)
+    last_page = page_size.pages(total_results) if total_results else None
 
-            if not page_previews:
-                continue
+    async def fetch_page(page):
+        """Get the previews of a page, None if the request failed."""
+        content = await make_request(
+            session,
+            BASE_URL,
+            semaphore=semaphore,
+            proxy=proxy,
+            progress=progress,
+            json=make_json_data(query, city, page),
+            is_post=True,
+        )
+        return parse_search(content) if content else None
 
+    # Scrape the rest of the pages, until they run out
+    try:
+        async for page_previews in paginator.pages(
+            fetch_page, last_page, progress=progress
+        ):
             companies.extend(await gather_companies(page_previews))
     except Exception as err:
         log.error(f"Error scraping search results: {err}")
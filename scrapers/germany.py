@@ -1,5 +1,5 @@
 import asyncio
-import math
+import json
 import re
 import threading
 from typing import List, Optional
@@ -8,17 +8,31 @@
 from loguru import logger as log
 from parsel import Selector
 from typing_extensions import TypedDict
+from yellowpages.blocks import BlockSignature
+from yellowpages.catalog import Resolver
+from yellowpages.pagination import PageSize, Paginator
 from yellowpages.proxy import Proxy
-from yellowpages.utils import EventManager, make_request
+from yellowpages.utils import EventManager, blocks, has_fields, make_request
 
 event = EventManager()
 
+# Host of the website
+HOST = "www.dastelefonbuch.de"
+
+# Block pages, the real ones are HTML documents of a few kB at least, unlike
+# the answers of the location suggestions
+blocks.register(HOST, BlockSignature(min_size=512, pages=r"/(?!service/)"))
+
+# Fixed by the website
+page_size = PageSize("germany", 10)
+
 
 class Preview(TypedDict):
     """Type hint container for preview data. This object just helps us to keep track what results we'll be getting"""
 
     name: str
     url: str
+    company: "Company"  # The fields found in the search results
 
 
 class Company(TypedDict):
@@ -37,6 +51,33 @@ class Company(TypedDict):
     zip_code: str
 
 
+# Selectors of the fields in the company pages, reported when they stop matching
+SELECTORS = {
+    "listings": "div.entry",
+    "name": "h1[itemprop='name']::text",
+    "categories": "div.category a::text",
+    "phone": "div#mainPhone a::attr(href)",
+    "email": "span.__cf_email__::attr(data-cfemail)",
+    "location": "address::text",
+    "city": "span[itemprop='addressLocality']::text",
+    "state": "span[itemprop='streetAddress']::text",
+    "zip_code": "span[itemprop='postalCode']::text",
+}
+
+
+def normalize_phone(phone: str) -> str:
+    """
+    Phone number of the search results in the international form of the
+    company pages' links, e.g. 030 2000000 -> +49302000000.
+    """
+    phone = re.sub(r"[^\d+]", "", phone)
+    if phone.startswith("00"):
+        return "+" + phone[2:]
+    if phone.startswith("0"):
+        return "+49" + phone[1:]
+    return phone
+
+
 def parse_company(company_info) -> Company:
     """
     Parse the company information from the HTML response.
@@ -116,10 +157,25 @@ def parse_search(response) -> Preview:
             name = first("span[itemprop='name']::text")
             if not name:
                 continue
+            street, _, locality = first("address::text").rpartition(",")
+            locality = re.search(r"(\d{5}) (.+)$", locality.strip())
+            zip_code, city = locality.groups() if locality else ("", "")
             parsed.append(
                 {
                     "name": name,
                     "url": first("a.todetails::attr(href)"),
+                    "company": {
+                        "name": name,
+                        "categories": "",
+                        "phone": normalize_phone(first("div.phoneblock span::text")),
+                        "email": "",
+                        # Like the company pages, the street is in `state` and
+                        # `location` only has the rest of the address
+                        "location": "",
+                        "city": city,
+                        "state": street.strip(),
+                        "zip_code": zip_code,
+                    },
                 }
             )
         except Exception as e:
@@ -157,26 +213,154 @@ async def scrape_company(
     try:
         company_info = parse_company(page)
         if company_info["name"] != "":
-            event.emit("update_total", 1)
+            event.add("update_total")
+            event.emit("companies", [company_info])
             return company_info
     except Exception as e:
         log.error(f"Error scraping company: {e}")
 
 
-async def get_suggested_location(
-    session: aiohttp.ClientSession, location: str, qeury: str = ""
-) -> str:
+async def fetch_suggested_location(
+    location: str,
+    session: aiohttp.ClientSession,
+    qeury: str = "",
+    semaphore: asyncio.Semaphore = asyncio.Semaphore(10),
+    proxy: Proxy = None,
+    progress: threading.Event = None,
+) -> Optional[str]:
     url = "https://www.dastelefonbuch.de/service/suggestor/location/" + location
     params = {
         "kw": qeury,
     }
 
-    async with session.get(url=url, params=params) as response:
-        if response.ok:
-            data = await response.json()
-            if data:
-                return data["suggest"]["suggestions"][0]["name"]
-    return location
+    response = await make_request(
+        session,
+        url,
+        semaphore=semaphore,
+        proxy=proxy,
+        progress=progress,
+        params=params,
+    )
+    try:
+        return json.loads(response)["suggest"]["suggestions"][0]["name"]
+    except (ValueError, KeyError, IndexError, TypeError):
+        return None
+
+
+# Suggested locations, by raw location typed by the user
+suggestions = Resolver("germany", fetch_suggested_location)
+
+# The website doesn't serve the pages after the 50th
+RESULT_CAP = 50 * page_size.value
+
+
+def search_url(query: str, location: str, page: int) -> str:
+    """Create the URL of a search page."""
+    base_url = "https://www.dastelefonbuch.de/Suche/%(query)s/%(location)s/%(page)d"
+    parameters = {
+        "query": query,
+        "location": location,
+        "page": page,
+    }
+    return base_url % parameters
+
+
+def parse_total(response) -> int:
+    """
+    Parse the total number of results of a search page.
+
+    Args:
+        response (str): The HTML response of the search page.
+
+    Returns:
+        int: The number of results, 0 if it is missing.
+    """
+    pattern = r"\D*(?P<numOfpages>(\d+))\D*"
+
+    sel = Selector(text=response)
+    total_results = sel.css("p.hits::text").get("").strip()
+    re_match = re.match(pattern, total_results)
+    return int(re_match.groupdict().get("numOfpages", 0)) if re_match else 0
+
+
+async def fetch_first_page(
+    query: str,
+    location: str,
+    session: aiohttp.ClientSession,
+    semaphore: asyncio.Semaphore = asyncio.Semaphore(10),
+    proxy: Proxy = None,
+    progress: threading.Event = None,
+) -> str:
+    """Get the first page of a search, also used to estimate its size."""
+    location = await get_suggested_location(
+        session, location, semaphore=semaphore, proxy=proxy, progress=progress
+    )
+    return await make_request(
+        session,
+        search_url(query, location, 1),
+        semaphore=semaphore,
+        proxy=proxy,
+        progress=progress,
+    )
+
+
+async def split_location(
+    query: str,
+    location: str,
+    session: aiohttp.ClientSession,
+    semaphore: asyncio.Semaphore = asyncio.Semaphore(10),
+    proxy: Proxy = None,
+    progress: threading.Event = None,
+) -> List[str]:
+    """
+    Get the districts of a location, as suggested by the website.
+
+    Returns:
+        List[str]: The districts, empty if there are none.
+    """
+    location = await get_suggested_location(
+        session, location, semaphore=semaphore, proxy=proxy, progress=progress
+    )
+    response = await make_request(
+        session,
+        "https://www.dastelefonbuch.de/service/suggestor/location/" + location,
+        semaphore=semaphore,
+        proxy=proxy,
+        progress=progress,
+        params={"kw": query},
+    )
+    try:
+        names = [
+            suggestion["name"]
+            for suggestion in json.loads(response)["suggest"]["suggestions"]
+        ]
+    except (ValueError, KeyError, TypeError):
+        return []
+    # "Berlin" -> "Berlin-Mitte", "Berlin-Pankow"...
+    return [name for name in names if name.startswith(f"{location}-")]
+
+
+async def get_suggested_location(
+    session: aiohttp.ClientSession,
+    location: str,
+    semaphore: asyncio.Semaphore = asyncio.Semaphore(10),
+    proxy: Proxy = None,
+    progress: threading.Event = None,
+) -> str:
+    """
+    Get the location suggested by the website for `location`, looked up
+    once per location and then answered from the cache.
+
+    Args:
+        session (aiohttp.ClientSession): The aiohttp session object.
+        location (str): The location typed by the user.
+
+    Returns:
+        str: The suggested location, `location` itself if there is none.
+    """
+    return await suggestions.resolve(
+        location, session, semaphore=semaphore, proxy=proxy, progress=progress
+    )
 
 
 async def search(
@@ -186,6 +370,8 @@ async def search(
     location: Optional[str] = None,
     proxy: Proxy = None,
     progress: threading.Event = threading.Event(),
+    fields: Optional[List[str]] = None,
+    first_page: Optional[str] = None,
 ) -> List[Preview]:
     """
     Search for business preview information scraping all of the pages.
@@ -195,28 +381,40 @@ async def search(
         session (aiohttp.ClientSession): The aiohttp session object.
         location (str): The location to search in.
         proxy (str): The proxy to use.
+        fields (List[str]): The fields needed, company pages are only
+                            fetched for the listings missing one of them.
+                            None to fetch every company page.
+        first_page (str): First page of the search if already fetched,
+                          e.g. by the estimate of the job.
 
     Returns:
         List[Preview]: The list of preview data.
     """
-    # Locate close matches to the location
-    location = await get_suggested_location(session, location)
-    print("Close matches to the location: ", location, file=open("location.txt", "w"))
+    # Locate close matches to the location, `fetch_first_page` finds the
+    # same one in the cache
+    suggested = await get_suggested_location(
+        session, location, semaphore=semaphore, proxy=proxy, progress=progress
+    )
 
     def make_search_url(page):
         """Create the search URL."""
-        base_url = "https://www.dastelefonbuch.de/Suche/%(query)s/%(location)s/%(page)d"
-        parameters = {
-            "query": query,
-            "location": location,
-            "page": page,
-        }
-        return base_url % parameters
+        return search_url(query, suggested, page)
 
     async def gather_companies(previews: List[Preview]) -> List[Company]:
         """Gather the previews."""
         _companies = []
 
+        # Companies whose search listing already has every requested field
+        listed = [
+            result["company"]
+            for result in previews
+            if has_fields(result["company"], fields)
+        ]
+        if listed:
+            event.add("update_total", len(listed))
+            event.emit("companies", listed)
+            _companies.extend(listed)
+
         for result in await asyncio.gather(
             *[
                 scrape_company(
@@ -227,21 +425,22 @@ async def gather_companies(previews: List[Preview]) -> List[Company]:
                     semaphore=semaphore,
                 )
                 for result in previews
-                if progress.is_set()
+                if progress.is_set() and not has_fields(result["company"], fields)
             ]
         ):
             if result and isinstance(result, (dict, Company)):
-                companies.append(result)
+                _companies.append(result)
 
         return _companies
 
     companies = []
     # Get the first page of the search results
-    first_page_content = await make_request(
-        session, make_search_url(1), proxy=proxy, progress=progress, semaphore=semaphore
+    first_page_content = first_page or await fetch_first_page(
+        query, location, session, semaphore=semaphore, proxy=proxy, progress=progress
     )
 
-    previews = parse_search(first_page_content)
+    paginator = Paginator(key=lambda preview: preview["url"], max_pages=50)
+    previews = paginator.unseen(parse_search(first_page_content))
     if not previews or not progress.is_set():
         return companies
 
@@ -251,41 +450,25 @@ async def gather_companies(previews: List[Preview]) -> List[Company]:
         return companies
 
     # Get the total number of pages
-    pattern = r"\D*(?P<numOfpages>(\d+))\D*"
-
-    sel = Selector(text=first_page_content)
-    total_results = sel.css("p.hits::text").get("").strip()
-    re_match = re.match(pattern, total_results)
-    total_results = re_match.groupdict().get("numOfpages", 0) if re_match else 0
-    total_pages = min(
-        50, int(math.ceil(int(total_results) / 10)) if total_results else 1
-    )
-    # Scrape the rest of the pages
+    total_results = parse_total(first_page_content)
+    last_page = page_size.pages(total_results) if total_results else None
+
+    async def fetch_page(page):
+        """Get the previews of a page, None if the request failed."""
+        content = await make_request(
+            session,
+            make_search_url(page),
+            semaphore=semaphore,
+            proxy=proxy,
+            progress=progress,
+        )
+        return parse_search(content) if content else None
+
+    # Scrape the rest of the pages, until they run out
     try:
-        for page in await asyncio.gather(
-            *[
-                make_request(
-                    session,
-                    make_search_url(page),
-                    semaphore=semaphore,
-                    proxy=proxy,
-                    progress=progress,
-                )
-                for page in range(2, total_pages + 1)
-                if progress.is_set()
-            ]
+        async for page_previews in paginator.pages(
+            fetch_page, last_page, progress=progress
         ):
-            if not progress.is_set():
-                break
-
-            if not page:
-                continue
-
-            page_previews = parse_search(page)
-
-            if not page_previews:
-                continue
-
             companies.extend(await gather_companies(page_previews))
     except Exception as err:
         log.error(f"Error scraping search results: {err}")
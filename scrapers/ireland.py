@@ -1,5 +1,4 @@
 import asyncio
-import math
 import threading
 from typing import List, Optional
 from urllib.parse import urljoin
@@ -8,17 +7,29 @@
 from loguru import logger as log
 from parsel import Selector
 from typing_extensions import TypedDict
+from yellowpages.blocks import BlockSignature
+from yellowpages.pagination import PageSize, Paginator
 from yellowpages.proxy import Proxy
-from yellowpages.utils import EventManager, make_request
+from yellowpages.utils import EventManager, blocks, has_fields, make_request
 
 event = EventManager()
 
+# Host of the website
+HOST = "www.goldenpages.ie"
+
+# Block pages, the real ones are HTML documents of a few kB at least
+blocks.register(HOST, BlockSignature(min_size=512))
+
+# Fixed by the website
+page_size = PageSize("ireland", 20)
+
 
 class Preview(TypedDict):
     """Type hint container for preview data. This object just helps us to keep track what results we'll be getting"""
 
     name: str
     url: str
+    company: "Company"  # The fields found in the search results
 
 
 class Company(TypedDict):
@@ -34,6 +45,53 @@ class Company(TypedDict):
     zip_code: str
 
 
+def parse_address(address: str) -> tuple:
+    """Split an address into its street, city, county and postal code."""
+    parts = address.split(" Co. ")
+    state = parts[1] if len(parts) > 1 else ""
+    street_address, city, postal_code = "", "", ""
+    if state:
+        front_parts = parts[0].rsplit(" ", 3)
+
+        street_address = " ".join(front_parts[:-2])
+        city = front_parts[-2] if len(front_parts) > 1 else ""
+        postal_code = " ".join(front_parts[-2:])
+
+    return street_address, city, state, postal_code
+
+
+def parse_listed_address(address: str) -> tuple:
+    """
+    Split an address of the search results, which only ends with the routing
+    key of the Eircode (e.g. D01), the way `parse_address` splits the ones of
+    the company pages.
+    """
+    parts = address.split(" Co. ")
+    state = parts[1] if len(parts) > 1 else ""
+    street_address, city = "", ""
+    if state:
+        front_parts = parts[0].rsplit(" ", 1)
+
+        street_address = front_parts[0] if len(front_parts) > 1 else ""
+        city = front_parts[-1]
+
+    return street_address, city, state, city
+
+
+# Selectors of the fields in the company pages, reported when they stop matching
+SELECTORS = {
+    "listings": "div.listing_container",
+    "name": "h1.company_name > span:first-child::text",
+    "categories": "div.tag_cloud a::text",
+    "phone": "a[href^='tel:']::text",
+    "email": "a[href^='mailto:']::text",
+    "location": "p.company_address::text",
+    "city": "p.company_address::text",
+    "state": "p.company_address::text",
+    "zip_code": "p.company_address::text",
+}
+
+
 def parse_company(company_info) -> Company:
     """
     Parse the company information from the HTML response.
@@ -52,20 +110,7 @@ def parse_company(company_info) -> Company:
         set([value.strip() for value in selector.css(css).getall()])
     )
 
-    def _parse_address(address: str):
-        parts = address.split(" Co. ")
-        state = parts[1] if len(parts) > 1 else ""
-        street_address, city, postal_code = "", "", ""
-        if state:
-            front_parts = parts[0].rsplit(" ", 3)
-
-            street_address = " ".join(front_parts[:-2])
-            city = front_parts[-2] if len(front_parts) > 1 else ""
-            postal_code = " ".join(front_parts[-2:])
-
-        return street_address, city, state, postal_code
-
-    address = _parse_address(first("p.company_address::text"))
+    address = parse_address(first("p.company_address::text"))
     result = {
         "name": first("h1.company_name > span:first-child::text"),
         "categories": many("div.tag_cloud a::text"),
@@ -96,12 +141,23 @@ def parse_search(response) -> Preview:
     for result in sel.css("div.listing_container"):
         try:
             first = lambda css: result.css(css).get("").strip()  # noqa: E731
+            address = parse_listed_address(first("p.listing_address::text"))
             parsed.append(  # noqa: E731
                 {
                     "url": urljoin(
                         "https://www.goldenpages.ie/",
                         first("a.listing_title_link::attr(href)"),
                     ),
+                    "company": {
+                        "name": first("a.listing_title_link span::text"),
+                        "categories": "",
+                        "phone": first("a[href^='tel:']::text"),
+                        "email": "",
+                        "location": address[0],
+                        "city": address[1],
+                        "state": address[2],
+                        "zip_code": address[3],
+                    },
                 }
             )
         except Exception as e:
@@ -139,12 +195,57 @@ async def scrape_company(
     try:
         company_info = parse_company(page)
         if company_info["name"] != "":
-            event.emit("update_total", 1)
+            event.add("update_total")
+            event.emit("companies", [company_info])
             return company_info
     except Exception as e:
         log.error(f"Error scraping company: {e}")
 
 
+def search_url(query: str, location: str, page: int) -> str:
+    """Create the URL of a search page."""
+    base_url = "https://www.goldenpages.ie/q/business/advanced/where/%(location)s/what/%(keyword)s/%(page)d"
+    parameters = {
+        "keyword": query,
+        "location": location,
+        "page": page,
+    }
+    return base_url % parameters
+
+
+def parse_total(response) -> int:
+    """
+    Parse the total number of results of a search page.
+
+    Args:
+        response (str): The response of the search page.
+
+    Returns:
+        int: The number of results, 0 if it is missing.
+    """
+    sel = Selector(text=response)
+    total_results = sel.css("div#page_helper > div::text").re(r"of (\d+)")
+    return int(total_results[0]) if total_results else 0
+
+
+async def fetch_first_page(
+    query: str,
+    location: str,
+    session: aiohttp.ClientSession,
+    semaphore: asyncio.Semaphore = asyncio.Semaphore(10),
+    proxy: Proxy = None,
+    progress: threading.Event = None,
+) -> str:
+    """Get the first page of a search, also used to estimate its size."""
+    return await make_request(
+        session,
+        search_url(query, location, 1),
+        semaphore=semaphore,
+        proxy=proxy,
+        progress=progress,
+    )
+
+
 async def search(
     query: str,
     session: aiohttp.ClientSession,
@@ -152,6 +253,8 @@ async def search(
     location: Optional[str] = None,
     proxy: Proxy = None,
     progress: threading.Event = threading.Event(),
+    fields: Optional[List[str]] = None,
+    first_page: Optional[str] = None,
 ) -> List[Preview]:
     """
     Search yellowpages.com for business preview information scraping all of the pages.
@@ -161,6 +264,11 @@ async def search(
         session (aiohttp.ClientSession): The aiohttp session object.
         location (str): The location to search in.
         proxy (str): The proxy to use.
+        fields (List[str]): The fields needed, company pages are only
+                            fetched for the listings missing one of them.
+                            None to fetch every company page.
+        first_page (str): First page of the search if already fetched,
+                          e.g. by the estimate of the job.
 
     Returns:
         List[Preview]: The list of preview data.
@@ -168,18 +276,23 @@ async def search(
 
     def make_search_url(page):
         """Create the search URL."""
-        base_url = "https://www.goldenpages.ie/q/business/advanced/where/%(location)s/what/%(keyword)s/%(page)d"
-        parameters = {
-            "keyword": query,
-            "location": location,
-            "page": page,
-        }
-        return base_url % parameters
+        return search_url(query, location, page)
 
     async def gather_companies(previews: List[Preview]) -> List[Company]:
         """Gather the previews."""
         _companies = []
 
+        # Companies whose search listing already has every requested field
+        listed = [
+            result["company"]
+            for result in previews
+            if has_fields(result["company"], fields)
+        ]
+        if listed:
+            event.add("update_total", len(listed))
+            event.emit("companies", listed)
+            _companies.extend(listed)
+
         for result in await asyncio.gather(
             *[
                 scrape_company(
@@ -190,22 +303,23 @@ async def gather_companies(previews: List[Preview]) -> List[Company]:
                     semaphore=semaphore,
                 )
                 for result in previews
-                if progress.is_set()
+                if progress.is_set() and not has_fields(result["company"], fields)
             ]
         ):
             if result and isinstance(result, (dict, Company)):
-                companies.append(result)
+                _companies.append(result)
 
         return _companies
 
     companies = []
 
     # Get the first page of the search results
-    first_page_content = await make_request(
-        session, make_search_url(1), proxy=proxy, progress=progress, semaphore=semaphore
+    first_page_content = first_page or await fetch_first_page(
+        query, location, session, semaphore=semaphore, proxy=proxy, progress=progress
     )
 
-    previews = parse_search(first_page_content)
+    paginator = Paginator(key=lambda preview: preview["url"])
+    previews = paginator.unseen(parse_search(first_page_content))
 
     if not previews or not progress.is_set():
         return companies
@@ -217,36 +331,25 @@ async def gather_companies(previews: List[Preview]) -> List[Company]:
         return companies
 
     # Get the total number of pages
-    sel = Selector(text=first_page_content)
-    total_results = sel.css("div#page_helper > div::text").re(r"of (\d+)")
-    total_pages = int(math.ceil(int(total_results[0]) / 20)) if total_results else 1
-
-    # Scrape the rest of the pages
+    total_results = parse_total(first_page_content)
+    last_page = page_size.pages(total_results) if total_results else None
+
+    async def fetch_page(page):
+        """Get the previews of a page, None if the request failed."""
+        content = await make_request(
+            session,
+            make_search_url(page),
+            semaphore=semaphore,
+            proxy=proxy,
+            progress=progress,
+        )
+        return parse_search(content) if content else None
+
+    # Scrape the rest of the pages, until they run out
     try:
-        for page in await asyncio.gather(
-            *[
-                make_request(
-                    session,
-                    make_search_url(page),
-                    semaphore=semaphore,
-                    proxy=proxy,
-                    progress=progress,
-                )
-                for page in range(2, total_pages + 1)
-                if progress.is_set()
-            ]
+        async for page_previews in paginator.pages(
+            fetch_page, last_page, progress=progress
         ):
-            if not progress.is_set():
-                break
-
-            if not page:
-                continue
-
-            page_previews = parse_search(page)
-
-            if not page_previews:
-                continue
-
             companies.extend(await gather_companies(page_previews))
     except Exception as err:
         log.error(f"Error scraping search results: {err}")
@@ -6,11 +6,22 @@
 from loguru import logger as log
 from parsel import Selector
 from typing_extensions import TypedDict
+from yellowpages.blocks import BlockSignature
+from yellowpages.pagination import PageSize, Paginator
 from yellowpages.proxy import Proxy
-from yellowpages.utils import EventManager, make_request
+from yellowpages.utils import EventManager, blocks, make_request
 
 event = EventManager()
 
+# Host of the website
+HOST = "www.paginegialle.it"
+
+# Block pages, every answer of the API has a list
+blocks.register(HOST, BlockSignature(sentinels=('"list"',)))
+
+# Fixed by the website
+page_size = PageSize("italy", 20)
+
 
 class Company(TypedDict):
     """type hint container for company data found"""
@@ -25,6 +36,20 @@ class Company(TypedDict):
     zip_code: str
 
 
+# Selectors of the fields in the search results, reported when they stop matching
+SELECTORS = {
+    "listings": "list.out.base.results",
+    "name": "ds_ragsoc",
+    "categories": "ds_cat",
+    "phone": "ds_ls_telefoni",
+    "email": "ds_ls_email",
+    "location": "addr",
+    "city": "loc",
+    "state": "reg",
+    "zip_code": "ds_cap",
+}
+
+
 def parse_companies(company_info) -> Company:
     """
     Parse the company information from the HTML response.
@@ -56,10 +81,10 @@ def parse_companies(company_info) -> Company:
                 "state": first("reg"),
             }
             companies.append(info)
-            event.emit("update_total", 1)
         except Exception as e:
             log.error(f"Error parsing search results: {e}")
             continue
+
     return companies
 
 
@@ -86,7 +111,7 @@ async def scrape_company(
         session, url, semaphore=semaphore, proxy=proxy, progress=progress
     )
 
-    if not (progress.is_set() or page):
+    if not (progress.is_set() and page):
         return
 
     try:
@@ -96,6 +121,54 @@ async def scrape_company(
         log.error(f"Error scraping company: {e}")
 
 
+def search_url(query: str, location: str, page: int) -> str:
+    """Create the URL of a search page."""
+    base_url = "https://www.paginegialle.it/ricerca/%(what)s/%(where)s/p-%(page_num)s?output=json"
+    parameters = {
+        "what": query,
+        "where": location,
+        "page_num": page,
+    }
+    return base_url % parameters
+
+
+def parse_total(response) -> int:
+    """
+    Parse the total number of results of a search page.
+
+    Args:
+        response (str): The response of the search page.
+
+    Returns:
+        int: The number of results, 0 if it is missing.
+    """
+    sel = Selector(text=response)
+    total = sel.jmespath("list.pagination.numResults").get()
+    if total is not None:
+        return int(total)
+    # Only the number of pages is given, estimated from the first one
+    pages = int(sel.jmespath("list.pagination.numPages").get(0))
+    return pages * len(sel.jmespath("list.out.base.results"))
+
+
+async def fetch_first_page(
+    query: str,
+    location: str,
+    session: aiohttp.ClientSession,
+    semaphore: asyncio.Semaphore = asyncio.Semaphore(10),
+    proxy: Proxy = None,
+    progress: threading.Event = None,
+) -> str:
+    """Get the first page of a search, also used to estimate its size."""
+    return await make_request(
+        session,
+        search_url(query, location, 1),
+        semaphore=semaphore,
+        proxy=proxy,
+        progress=progress,
+    )
+
+
 async def search(
     query: str,
     session: aiohttp.ClientSession,
@@ -103,6 +176,8 @@ async def search(
     location: Optional[str] = None,
     proxy: Proxy = None,
     progress: threading.Event = threading.Event(),
+    fields: Optional[List[str]] = None,
+    first_page: Optional[str] = None,
 ) -> List[Company]:
     """
     Search yellowpages.com for business preview information scraping all of the pages.
@@ -112,6 +187,9 @@ async def search(
         session (aiohttp.ClientSession): The aiohttp session object.
         location (str): The location to search in.
         proxy (str): The proxy to use.
+        fields (List[str]): Unused, the search results have every field.
+        first_page (str): First page of the search if already fetched,
+                          e.g. by the estimate of the job.
 
     Returns:
         List[Preview]: The list of preview data.
@@ -119,44 +197,42 @@ async def search(
 
     def make_search_url(page):
         """Create the search URL."""
-        base_url = "https://www.paginegialle.it/ricerca/%(what)s/%(where)s/p-%(page_num)s?output=json"
-        parameters = {
-            "what": query,
-            "where": location,
-            "page_num": page,
-        }
-        return base_url % parameters
+        return search_url(query, location, page)
 
     companies = []
 
+    def add_companies(infos):
+        """Publish the new companies of a page."""
+        event.add("update_total", len(infos))
+        event.emit("companies", infos)
+        companies.extend(infos)
+
     # Get the first page of the search results
-    first_page_content = await make_request(
-        session, make_search_url(1), proxy=proxy, progress=progress, semaphore=semaphore
+    first_page_content = first_page or await fetch_first_page(
+        query, location, session, semaphore=semaphore, proxy=proxy, progress=progress
     )
     # from pprint import pprint
 
-    companies.extend(parse_companies(first_page_content))
+    paginator = Paginator()
+    add_companies(paginator.unseen(parse_companies(first_page_content)))
 
     if not progress.is_set():
         return companies
 
     # Get the total number of pages
     sel = Selector(text=first_page_content)
-    total_pages = int(sel.jmespath("list.pagination.numPages").get(0))
+    last_page = int(sel.jmespath("list.pagination.numPages").get(0)) or None
+
+    async def fetch_page(page):
+        """Get the companies of a page, None if the request failed."""
+        return await scrape_company(
+            make_search_url(page), session, proxy, progress, semaphore
+        )
 
+    # Scrape the rest of the pages, until they run out
     try:
-        for infos in await asyncio.gather(
-            *[
-                scrape_company(
-                    make_search_url(page), session, proxy, progress, semaphore
-                )
-                for page in range(2, total_pages + 1)
-                if progress.is_set()
-            ]
-        ):
-            if not infos:
-                continue
-            companies.extend(infos)
+        async for infos in paginator.pages(fetch_page, last_page, progress=progress):
+            add_companies(infos)
     except Exception as err:
         log.error(f"Error scraping search results: {err}")
 
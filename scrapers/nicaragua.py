@@ -1,5 +1,4 @@
 import asyncio
-import math
 import threading
 from typing import List, Optional
 
@@ -7,11 +6,22 @@
 from loguru import logger as log
 from parsel import Selector
 from typing_extensions import TypedDict
+from yellowpages.blocks import BlockSignature
+from yellowpages.pagination import PageSize, Paginator
 from yellowpages.proxy import Proxy
-from yellowpages.utils import EventManager, make_request
+from yellowpages.utils import EventManager, blocks, make_request
 
 event = EventManager()
 
+# Host of the website
+HOST = "www.goudengids.nl"
+
+# Block pages, the real ones are HTML documents of a few kB at least
+blocks.register(HOST, BlockSignature(min_size=512))
+
+# Fixed by the website
+page_size = PageSize("nicaragua", 20)
+
 
 class Company(TypedDict):
     """type hint container for company data found on yellowpages.com"""
@@ -26,6 +36,18 @@ class Company(TypedDict):
     zip_code: str
 
 
+# Selectors of the fields in the search results, reported when they stop matching
+SELECTORS = {
+    "listings": "ol.result-items > li.result-item",
+    "name": "h2[itemprop='name']::text",
+    "phone": "div[data-js-event='call']::attr(data-js-value)",
+    "email": "div[data-js-event='email']::attr(data-js-value)",
+    "location": "span[data-yext='street']::text",
+    "city": "span[data-yext='city']::text",
+    "zip_code": "span[data-yext='postal-code']::text",
+}
+
+
 def parse_companies(company_info) -> Company:
     """
     Parse the company information from the HTML response.
@@ -66,10 +88,10 @@ def parse_companies(company_info) -> Company:
                 "state": ", ".join(address),
             }
             companies.append(info)
-            event.emit("update_total", 1)
         except Exception as e:
             log.error(f"Error parsing search results: {e}")
             continue
+
     return companies
 
 
@@ -96,7 +118,7 @@ async def scrape_company(
         session, url, semaphore=semaphore, proxy=proxy, progress=progress
     )
 
-    if not (progress.is_set() or page):
+    if not (progress.is_set() and page):
         return
 
     try:
@@ -106,6 +128,46 @@ async def scrape_company(
         log.error(f"Error scraping company: {e}")
 
 
+def search_url(query: str, location: str, page: int) -> str:
+    """Create the URL of a search page."""
+    base_url = "https://www.goudengids.nl/nl/zoeken/"
+    parameters = [query, location, str(page)]
+    return base_url + "/".join(parameters)
+
+
+def parse_total(response) -> int:
+    """
+    Parse the total number of results of a search page.
+
+    Args:
+        response (str): The response of the search page.
+
+    Returns:
+        int: The number of results, 0 if it is missing.
+    """
+    sel = Selector(text=response)
+    total_results = sel.css("span.count::text").get("").strip().replace(" ", "")
+    return int(total_results) if total_results.isdigit() else 0
+
+
+async def fetch_first_page(
+    query: str,
+    location: str,
+    session: aiohttp.ClientSession,
+    semaphore: asyncio.Semaphore = asyncio.Semaphore(10),
+    proxy: Proxy = None,
+    progress: threading.Event = None,
+) -> str:
+    """Get the first page of a search, also used to estimate its size."""
+    return await make_request(
+        session,
+        search_url(query, location, 1),
+        semaphore=semaphore,
+        proxy=proxy,
+        progress=progress,
+    )
+
+
 async def search(
     query: str,
     session: aiohttp.ClientSession,
@@ -113,6 +175,8 @@ async def search(
     location: Optional[str] = None,
     proxy: Proxy = None,
     progress: threading.Event = threading.Event(),
+    fields: Optional[List[str]] = None,
+    first_page: Optional[str] = None,
 ) -> List[Company]:
     """
     Search yellowpages.com for business preview information scraping all of the pages.
@@ -122,6 +186,9 @@ async def search(
         session (aiohttp.ClientSession): The aiohttp session object.
         location (str): The location to search in.
         proxy (str): The proxy to use.
+        fields (List[str]): Unused, the search results have every field.
+        first_page (str): First page of the search if already fetched,
+                          e.g. by the estimate of the job.
 
     Returns:
         List[Preview]: The list of preview data.
@@ -129,39 +196,41 @@ async def search(
 
     def make_search_url(page):
         """Create the search URL."""
-        base_url = "https://www.goudengids.nl/nl/zoeken/"
-        parameters = [query, location, str(page)]
-        return base_url + "/".join(parameters)
+        return search_url(query, location, page)
 
     companies = []
 
+    def add_companies(infos):
+        """Publish the new companies of a page."""
+        event.add("update_total", len(infos))
+        event.emit("companies", infos)
+        companies.extend(infos)
+
     # Get the first page of the search results
-    first_page_content = await make_request(
-        session, make_search_url(1), proxy=proxy, progress=progress, semaphore=semaphore
+    first_page_content = first_page or await fetch_first_page(
+        query, location, session, semaphore=semaphore, proxy=proxy, progress=progress
     )
 
-    companies.extend(parse_companies(first_page_content))
+    paginator = Paginator()
+    add_companies(paginator.unseen(parse_companies(first_page_content)))
 
     if not progress.is_set():
         return companies
 
     # Get the total number of pages
-    sel = Selector(text=first_page_content)
-    total_results = sel.css("span.count::text").get("").strip().replace(" ", "")
-    total_pages = int(math.ceil(int(total_results) / 20)) if total_results else 1
+    total_results = parse_total(first_page_content)
+    last_page = page_size.pages(total_results) if total_results else None
+
+    async def fetch_page(page):
+        """Get the companies of a page, None if the request failed."""
+        return await scrape_company(
+            make_search_url(page), session, proxy, progress, semaphore
+        )
+
+    # Scrape the rest of the pages, until they run out
     try:
-        for infos in await asyncio.gather(
-            *[
-                scrape_company(
-                    make_search_url(page), session, proxy, progress, semaphore
-                )
-                for page in range(2, total_pages + 1)
-                if progress.is_set()
-            ]
-        ):
-            if not infos:
-                continue
-            companies.extend(infos)
+        async for infos in paginator.pages(fetch_page, last_page, progress=progress):
+            add_companies(infos)
     except Exception as err:
         log.error(f"Error scraping search results: {err}")
 
@@ -1,5 +1,4 @@
 import asyncio
-import math
 import threading
 from typing import List, Optional
 
@@ -7,11 +6,19 @@
 from loguru import logger as log
 from parsel import Selector
 from typing_extensions import TypedDict
+from yellowpages.blocks import BlockSignature
+from yellowpages.pagination import PageSize, Paginator
 from yellowpages.proxy import Proxy
-from yellowpages.utils import EventManager, make_request
+from yellowpages.utils import EventManager, blocks, make_request
 
 event = EventManager()
 
+# Host of the website
+HOST = "www.local.ch"
+
+# Block pages, every GraphQL answer has data or errors
+blocks.register(HOST, BlockSignature(sentinels=('"data"', '"errors"')))
+
 
 class Company(TypedDict):
     """type hint container for company data found on yellowpages.com"""
@@ -26,6 +33,20 @@ class Company(TypedDict):
     zip_code: str
 
 
+# Selectors of the fields in the search results, reported when they stop matching
+SELECTORS = {
+    "listings": "data.search.entries[?entry.entryType=='BUSINESS'].entry",
+    "name": "title",
+    "categories": "categories.all[*].name.en",
+    "phone": "contacts[?__typename=='PhoneContact'].value",
+    "email": "contacts[?__typename=='EmailContact'].value",
+    "location": "address.streetLine",
+    "city": "address.city",
+    "state": "address.cantonCode",
+    "zip_code": "address.zipCode",
+}
+
+
 def parse_companies(company_info) -> Company:
     """
     Parse the company information from the HTML response.
@@ -60,10 +81,10 @@ def parse_companies(company_info) -> Company:
                 "state": first("address.cantonCode"),
             }
             companies.append(info)
-            event.emit("update_total", 1)
         except Exception as e:
             log.error(f"Error parsing search results: {e}")
             continue
+
     return companies
 
 
@@ -97,7 +118,7 @@ async def scrape_company(
         **kwargs,
     )
 
-    if not (progress.is_set() or page):
+    if not (progress.is_set() and page):
         return
 
     try:
@@ -107,6 +128,95 @@ async def scrape_company(
         log.error(f"Error scraping company: {e}")
 
 
+def make_json_data(query: str, location: str, page: int, size: int = None) -> dict:
+    """Create the json_data of a search page."""
+    size = size or page_size.value
+    return {
+        "operationName": "search",
+        "variables": {
+            "debugMode": True,
+            "what": query,
+            "where": location,
+            "pagination": {
+                "start": (page - 1) * size,
+                "limit": size,
+            },
+            "q": "",
+        },
+        "query": "query search($what:String$where:String$q:String$paginati"
+        "on:PaginationInformation!$debugMode:Boolean=true){search(options:"
+        "{what:$what,where:$where,q:$q,debugMode:$debugMode}pagination:$pa"
+        "gination){total totalBusinesses entries{entry{entryType title add"
+        "ress{streetLine zipCode city cantonCode}contacts{value __typename"
+        "}categories{all{name{en}}}}}}}",
+    }
+
+
+async def probe_page(
+    size: int,
+    query: str,
+    location: str,
+    session: aiohttp.ClientSession,
+    semaphore: asyncio.Semaphore,
+    progress: threading.Event,
+) -> tuple:
+    """
+    Fetch a first search page of `size` listings.
+
+    Returns:
+        tuple: The number of listings of the page and the total count.
+    """
+    page = await make_request(
+        session,
+        "https://www.local.ch/api/graphql",
+        semaphore=semaphore,
+        progress=progress,
+        json=make_json_data(query, location, 1, size),
+        is_post=True,
+    )
+    sel = Selector(text=page or "{}", type="json")
+    total = sel.jmespath("data.search.total").get(0)
+    return len(sel.jmespath("data.search.entries[*]")), total
+
+
+# The API takes the number of listings per page
+page_size = PageSize("switzerland", 25, probe=probe_page)
+
+
+def parse_total(response) -> int:
+    """
+    Parse the total number of results of a search page.
+
+    Args:
+        response (str): The response of the search page.
+
+    Returns:
+        int: The number of results, 0 if it is missing.
+    """
+    sel = Selector(text=response, type="json")
+    return int(sel.jmespath("data.search.total").get(0))
+
+
+async def fetch_first_page(
+    query: str,
+    location: str,
+    session: aiohttp.ClientSession,
+    semaphore: asyncio.Semaphore = asyncio.Semaphore(10),
+    proxy: Proxy = None,
+    progress: threading.Event = None,
+) -> str:
+    """Get the first page of a search, also used to estimate its size."""
+    return await make_request(
+        session,
+        "https://www.local.ch/api/graphql",
+        semaphore=semaphore,
+        proxy=proxy,
+        progress=progress,
+        json=make_json_data(query, location, 1),
+        is_post=True,
+    )
+
+
 async def search(
     query: str,
     session: aiohttp.ClientSession,
@@ -114,6 +224,8 @@ async def search(
     location: Optional[str] = None,
     proxy: Proxy = None,
     progress: threading.Event = threading.Event(),
+    fields: Optional[List[str]] = None,
+    first_page: Optional[str] = None,
 ) -> List[Company]:
     """
     Search yellowpages.com for business preview information scraping all of the pages.
@@ -123,75 +235,55 @@ async def search(
         session (aiohttp.ClientSession): The aiohttp session object.
         location (str): The location to search in.
         proxy (str): The proxy to use.
+        fields (List[str]): Unused, the search results have every field.
+        first_page (str): First page of the search if already fetched,
+                          e.g. by the estimate of the job.
 
     Returns:
         List[Preview]: The list of preview data.
     """
 
-    def make_json_data(page):
-        """Create the json_data."""
-        return {
-            "operationName": "search",
-            "variables": {
-                "debugMode": True,
-                "what": query,
-                "where": location,
-                "pagination": {
-                    "start": (page - 1) * 25,
-                    "limit": 25,
-                },
-                "q": "",
-            },
-            "query": "query search($what:String$where:String$q:String$paginati"
-            "on:PaginationInformation!$debugMode:Boolean=true){search(options:"
-            "{what:$what,where:$where,q:$q,debugMode:$debugMode}pagination:$pa"
-            "gination){total totalBusinesses entries{entry{entryType title add"
-            "ress{streetLine zipCode city cantonCode}contacts{value __typename"
-            "}categories{all{name{en}}}}}}}",
-        }
-
     BASE_URL = "https://www.local.ch/api/graphql"
 
     companies = []
+
+    def add_companies(infos):
+        """Publish the new companies of a page."""
+        event.add("update_total", len(infos))
+        event.emit("companies", infos)
+        companies.extend(infos)
+
     # Get the first page of the search results
 
-    first_page_content = await make_request(
-        session,
-        BASE_URL,
-        proxy=proxy,
-        progress=progress,
-        semaphore=semaphore,
-        json=make_json_data(1),
-        is_post=True,
+    first_page_content = first_page or await fetch_first_page(
+        query, location, session, semaphore=semaphore, proxy=proxy, progress=progress
     )
 
-    companies.extend(parse_companies(first_page_content))
+    paginator = Paginator()
+    add_companies(paginator.unseen(parse_companies(first_page_content)))
 
     if not progress.is_set():
         return companies
 
     # Get the total number of pages
-    sel = Selector(text=first_page_content, type="json")
-    total_results = sel.jmespath("data.search.total").get(0)
-    total_pages = int(math.ceil(int(total_results) / 25)) if total_results else 1
+    total_results = parse_total(first_page_content)
+    last_page = page_size.pages(total_results) if total_results else None
+
+    async def fetch_page(page):
+        """Get the companies of a page, None if the request failed."""
+        return await scrape_company(
+            BASE_URL,
+            session,
+            proxy,
+            progress,
+            semaphore,
+            json=make_json_data(query, location, page),
+        )
+
+    # Scrape the rest of the pages, until they run out
     try:
-        for infos in await asyncio.gather(
-            *[
-                scrape_company(
-                    BASE_URL,
-                    session,
-                    proxy,
-                    progress,
-                    semaphore,
-                    json=make_json_data(page),
-                )
-                for page in range(2, total_pages + 1)
-                if progress.is_set()
-            ]
-        ):
-            if not infos:
-                continue
-            companies.extend(infos)
+        async for infos in paginator.pages(fetch_page, last_page, progress=progress):
+            add_companies(infos)
     except Exception as err:
         log.error(f"Error scraping search results: {err}")
 
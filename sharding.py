@@ -0,0 +1,156 @@
+import asyncio
+import types
+
+from yellowpages.index import normalize
+
+# Times a shard can be split again
+MAX_DEPTH = 3
+
+
+def company_key(company: dict) -> tuple:
+    """
+    Identify a company across searches, e.g. the same listing found in two
+    overlapping districts.
+
+    Args:
+        company (dict): The company information.
+
+    Returns:
+        tuple: The normalized name, phone and street of the company.
+    """
+    return (
+        normalize(company.get("name") or ""),
+        "".join(char for char in company.get("phone") or "" if char.isdigit()),
+        normalize(company.get("location") or ""),
+    )
+
+
+class Deduplicator:
+    def __init__(self) -> None:
+        """Filter out the companies already seen during a job."""
+        self.seen = set()
+
+    def __call__(self, companies: list) -> list:
+        """
+        Keep the companies not seen before.
+
+        Args:
+            companies (list): Companies found by a search.
+
+        Returns:
+            list: The new companies.
+        """
+        new = []
+        for company in companies:
+            key = company_key(company)
+            if key not in self.seen:
+                self.seen.add(key)
+                new.append(company)
+        return new
+
+    def clear(self) -> None:
+        self.seen.clear()
+
+
+def total_results(module: types.ModuleType, page: str) -> int:
+    """
+    Parse the total number of results from the first page of a search.
+
+    Args:
+        module (ModuleType): The scraper module.
+        page (str): The first page, empty if the request failed.
+
+    Returns:
+        int: The number of results, 0 if unknown.
+    """
+    try:
+        return module.parse_total(page) if page else 0
+    except (ValueError, TypeError):
+        return 0
+
+
+async def count_results(
+    module: types.ModuleType, query: str, location: str, **kwargs
+) -> int:
+    """
+    Get the total number of results of a search from its first page.
+
+    Args:
+        module (ModuleType): The scraper module.
+        query (str): The search query.
+        location (str): The location to search in.
+        **kwargs: Passed to `fetch_first_page`, e.g. the session.
+
+    Returns:
+        int: The number of results, 0 if unknown.
+    """
+    page = await module.fetch_first_page(query, location, **kwargs)
+    return total_results(module, page)
+
+
+async def plan(
+    module: types.ModuleType,
+    query: str,
+    location: str,
+    depth: int = 0,
+    total: int | None = None,
+    **kwargs,
+) -> list:
+    """
+    Split a search the website would truncate into searches under its cap.
+
+    Scrapers of websites with a result cap declare `RESULT_CAP` and may
+    declare `split_location(query, location, **kwargs)`, returning the
+    districts, ZIP codes... covering a location. Without `split_location`
+    the truncated searches are only reported. A location whose shards have
+    fewer results in total is searched as well as its shards.
+
+    Args:
+        module (ModuleType): The scraper module.
+        query (str): The search query.
+        location (str): The location to search in.
+        depth (int): Number of splits already made.
+        total (int): Total count of the search, if already known.
+        **kwargs: Passed to the scraper, e.g. the session.
+
+    Returns:
+        list: The locations to search in, each under the cap when possible.
+    """
+    cap = getattr(module, "RESULT_CAP", None)
+    if cap is None or depth >= MAX_DEPTH:
+        return [location]
+
+    if total is None:
+        total = await count_results(module, query, location, **kwargs)
+    if not total or total <= cap:
+        return [location]
+
+    split_location = getattr(module, "split_location", None)
+    shards = [
+        shard
+        for shard in (
+            await split_location(query, location, **kwargs) if split_location else []
+        )
+        if shard != location
+    ]
+    if not shards:
+        print(f"{query} in {location} is truncated to {cap} of {total} results")
+        return [location]
+
+    totals = await asyncio.gather(
+        *[count_results(module, query, shard, **kwargs) for shard in shards]
+    )
+    print(f"Splitting {query} in {location} ({total} results) into {len(shards)}")
+    nested = await asyncio.gather(
+        *[
+            plan(module, query, shard, depth + 1, total=shard_total, **kwargs)
+            for shard, shard_total in zip(shards, totals)
+        ]
+    )
+    locations = [shard for locations in nested for shard in locations]
+    if sum(totals) < total:
+        # Results outside of the shards, e.g. without a district, are only
+        # found by the search itself, the companies of both are deduplicated
+        print(f"The shards of {location} only cover {sum(totals)} of {total} results")
+        locations.insert(0, location)
+    return locations
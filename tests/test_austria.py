@@ -0,0 +1,92 @@
+import asyncio
+import threading
+
+import aiohttp
+import pytest
+from yellowpages import deadletter, utils
+from yellowpages.benchmarks import load_fixture
+from yellowpages.benchmarks.server import MockDirectoryServer, MockSession
+from yellowpages.scrapers import austria
+
+
+@pytest.fixture
+def build_id(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(
+        utils, "dead_letters", deadletter.DeadLetterQueue(tmp_path / "dead.jsonl")
+    )
+    build_id = austria.BuildId(tmp_path / "build-id.txt")
+    monkeypatch.setattr(austria, "build_id", build_id)
+    return build_id
+
+
+def run(server: MockDirectoryServer, search) -> list:
+    """Run `search(session, progress)` against the mock server."""
+
+    async def main():
+        url = await server.start()
+        progress = threading.Event()
+        progress.set()
+        try:
+            async with aiohttp.ClientSession() as client:
+                return await search(MockSession(client, url), progress)
+        finally:
+            await server.stop()
+
+    return asyncio.run(main())
+
+
+def test_stale_build_id_is_replaced_during_a_search(build_id):
+    server = MockDirectoryServer(build_id="rebuilt", pages=3)
+    build_id.value = "before"  # Valid when the first page was fetched
+    token = deadletter.search_context.set(
+        deadletter.search_of("job", "austria", "Bäckerei", "Wien")
+    )
+    try:
+        companies = run(
+            server,
+            lambda session, progress: austria.search(
+                "Bäckerei",
+                location="Wien",
+                session=session,
+                semaphore=asyncio.Semaphore(4),
+                progress=progress,
+                first_page=load_fixture("austria", "search"),
+            ),
+        )
+    finally:
+        deadletter.search_context.reset(token)
+    listings = austria.parse_companies(load_fixture("austria", "search"))
+    assert len(companies) > len(listings)
+    assert build_id.value == "rebuilt"
+    assert build_id.fetches == 1
+    assert utils.dead_letters.load() == []
+
+
+def test_failed_requests_are_sent_with_the_current_build_id(build_id):
+    server = MockDirectoryServer(build_id="rebuilt")
+    url = austria.search_url("before", "Bäckerei", "Wien", 2)
+
+    refreshed = run(
+        server, lambda session, progress: austria.refresh_url(url, session, progress)
+    )
+    assert refreshed == austria.search_url("rebuilt", "Bäckerei", "Wien", 2)
+
+
+def test_failed_pages_keep_a_valid_build_id(build_id):
+    server = MockDirectoryServer(build_id="current", error_rate=1.0)
+    build_id.value = "current"
+
+    run(
+        server,
+        lambda session, progress: austria.search(
+            "Bäckerei",
+            location="Wien",
+            session=session,
+            semaphore=asyncio.Semaphore(4),
+            progress=progress,
+            first_page=load_fixture("austria", "search"),
+        ),
+    )
+    assert build_id.value == "current"
+    assert build_id.fetches == 0  # A 503 isn't a stale build ID
@@ -0,0 +1,37 @@
+from yellowpages.blocks import BlockDetector, BlockSignature
+from yellowpages.proxy import Proxy
+
+
+def test_signature_matches_the_block_pages():
+    signature = BlockSignature(min_size=10, sentinels=("results",))
+    assert signature.match(429, "") == "status 429"
+    assert signature.match(200, "<script>window._cf_chl_opt = {}</script>")
+    assert signature.match(200, "tiny") == "4 bytes"
+    assert signature.match(200, "a page without listings") == "no sentinel"
+    assert signature.match(200, "a page of search results") is None
+    assert signature.match(503, "") is None  # Retried as usual
+
+
+def test_signature_only_checks_the_content_of_its_pages():
+    signature = BlockSignature(sentinels=('"pageProps"',), pages=r"/_next/data/")
+    assert signature.match(200, "[]", "/api/geo/search/") is None
+    assert signature.match(200, "{}", "/_next/data/build/search.json") == "no sentinel"
+    assert signature.match(403, "", "/api/geo/search/") == "status 403"
+
+
+def test_blocked_proxies_are_avoided(tmp_path):
+    path = tmp_path / ".proxies"
+    path.write_text("http://proxy-1\nhttp://proxy-2\n")
+    proxy = Proxy(str(path))
+    blocks = BlockDetector(quarantine=60)
+
+    assert blocks.check("example.com", "http://proxy-1", 403, "")
+    assert not blocks.check("example.com", "http://proxy-2", 200, "results")
+    assert blocks.rate("example.com") == 0.5
+    for _ in range(4):
+        assert blocks.pick(proxy, "example.com") == "http://proxy-2"
+    # The proxy is only quarantined for the host that blocked it
+    assert {blocks.pick(proxy, "other.com") for _ in range(4)} == {
+        "http://proxy-1",
+        "http://proxy-2",
+    }
@@ -0,0 +1,61 @@
+import threading
+
+import pytest
+from yellowpages import breaker
+
+
+@pytest.fixture
+def progress(tmp_path, monkeypatch):
+    monkeypatch.setattr(breaker, "FILL_RATES_FILE", tmp_path / "fill-rates.json")
+    progress = threading.Event()
+    progress.set()
+    return progress
+
+
+def test_trips_after_a_window_of_empty_responses(progress):
+    watch = breaker.FillRateBreaker("usa", progress, {"listings": ".result"}, window=5)
+    for _ in range(4):
+        watch("response", "www.yellowpages.com")
+    assert watch.is_set()
+    watch("response", "www.yellowpages.com")
+    assert not watch.is_set()
+    assert "listings: .result" in watch.tripped
+    assert progress.is_set()  # The other sites go on
+
+
+def test_companies_reset_the_empty_responses(progress):
+    watch = breaker.FillRateBreaker("usa", progress, window=5)
+    for _ in range(10):
+        watch("response", "www.yellowpages.com")
+        watch("companies", [{"name": "Bakery"}])
+    assert watch.is_set()
+
+
+def test_searches_without_results_dont_trip(progress):
+    watch = breaker.FillRateBreaker("usa", progress, window=5)
+    for _ in range(10):
+        watch.quiet("response", "www.yellowpages.com")
+    assert watch.is_set()
+    watch.quiet("companies", [{"name": "Bakery"}] * 5)
+    assert len(watch.companies) == 5
+
+
+def test_trips_when_a_usual_field_collapses(progress):
+    fields = ["name", "phone"]
+    watch = breaker.FillRateBreaker("usa", progress, fields=fields, window=10)
+    watch("companies", [{"name": "Bakery", "phone": "7185551000"}] * 10)
+    watch.save()
+
+    watch = breaker.FillRateBreaker("usa", progress, fields=fields, window=10)
+    assert watch.baseline == {"name": 1.0, "phone": 1.0}
+    watch("companies", [{"name": "Bakery", "phone": ""}] * 10)
+    assert not watch.is_set()
+    assert "phone filled in 0%" in watch.tripped
+
+
+def test_saves_nothing_once_tripped(progress):
+    watch = breaker.FillRateBreaker("usa", progress, window=2)
+    watch("companies", [{"name": "Bakery"}] * 2)
+    watch.trip("test", [])
+    watch.save()
+    assert not breaker.FILL_RATES_FILE.exists()
@@ -0,0 +1,34 @@
+from loguru import logger
+from yellowpages.catalog import Catalog
+
+CITIES = {"Montreal, QC": "15240", "Toronto, ON": "22986"}
+
+
+def test_labels_resolve_without_case_and_accents(tmp_path):
+    catalog = Catalog("cities", seed=CITIES, directory=tmp_path)
+    assert catalog.resolve("Toronto, ON") == "22986"
+    assert catalog.resolve("montréal") == "15240"
+    assert catalog.resolve("Winnipeg", fuzzy=False) is None
+
+
+def test_near_misses_are_reported(tmp_path):
+    catalog = Catalog("cities", seed=CITIES, directory=tmp_path)
+    messages = []
+    sink = logger.add(messages.append, level="WARNING")
+    try:
+        assert catalog.resolve("Torotno, ON") == "22986"
+        assert catalog.resolve("toronto, on") == "22986"
+    finally:
+        logger.remove(sink)
+    assert len(messages) == 1
+    assert "'Toronto, ON'" in messages[0]
+
+
+def test_added_entries_are_saved(tmp_path):
+    catalog = Catalog("cities", seed=CITIES, directory=tmp_path)
+    catalog.add({"Winnipeg, MB": "26102", "": "1"})
+    assert catalog.resolve("Winnipeg") == "26102"
+    catalog.save()
+
+    reloaded = Catalog("cities", directory=tmp_path)
+    assert reloaded.labels() == [*CITIES, "Winnipeg, MB"]
@@ -0,0 +1,51 @@
+import asyncio
+
+import aiohttp
+from aiohttp import web
+from yellowpages import connections
+
+
+def test_host_limit_leaves_room_for_the_hedges():
+    assert connections.host_limit(5) == (connections.CONNECTIONS_PER_HOST or 10)
+
+
+async def answer(request: web.Request) -> web.Response:
+    return web.Response(text="ok")
+
+
+def test_prewarmed_connections_are_reused():
+    async def main():
+        app = web.Application()
+        app.router.add_get("/robots.txt", answer)
+        app.router.add_get("/search", answer)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        await web.TCPSite(runner, "127.0.0.1", 0).start()
+        host = f"127.0.0.1:{runner.addresses[0][1]}"
+        stats = connections.ConnectionStats()
+        try:
+            async with aiohttp.ClientSession(
+                connector=connections.make_connector(4),
+                trace_configs=[stats.trace_config()],
+            ) as session:
+                # The test server doesn't speak TLS
+                get = session.get
+                session.get = lambda url, **kwargs: get(
+                    url.replace("https://", "http://"), **kwargs
+                )
+                opened = await connections.prewarm(session, host, 2)
+
+                async def search():
+                    async with session.get(f"http://{host}/search") as response:
+                        return await response.text()
+
+                await asyncio.gather(*[search() for _ in range(2)])
+                return opened, stats
+        finally:
+            await runner.cleanup()
+
+    opened, stats = asyncio.run(main())
+    assert opened == 2
+    assert stats.opened == 2
+    assert stats.reused == 2
+    assert stats.reuse_ratio == 0.5
@@ -0,0 +1,117 @@
+import asyncio
+import threading
+
+import aiohttp
+import pytest
+from yellowpages import deadletter, utils
+from yellowpages.benchmarks import load_fixture
+from yellowpages.benchmarks.server import MockDirectoryServer, MockSession
+from yellowpages.proxy import Proxy
+from yellowpages.scrapers import italy
+
+
+@pytest.fixture
+def queue(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return deadletter.DeadLetterQueue(tmp_path / "dead-letters.jsonl")
+
+
+def record(queue, url: str, job: str = "job") -> None:
+    token = deadletter.search_context.set(
+        deadletter.search_of(job, "italy", "pizza", "Roma", ["name"])
+    )
+    try:
+        queue.record("GET", url, {"params": {"page": 2}}, None, "status 503", "")
+    finally:
+        deadletter.search_context.reset(token)
+
+
+def test_requests_are_only_kept_with_their_search(queue):
+    queue.record("GET", "https://example.com/", {}, None, "timeout", "")
+    assert queue.load() == []
+
+    record(queue, "https://example.com/")
+    (letter,) = queue.load()
+    assert letter["scraper"] == "italy"
+    assert letter["query"] == "pizza"
+    assert letter["fields"] == ["name"]
+    assert letter["params"] == {"page": 2}
+    assert letter["json"] is None
+    assert letter["error"] == "status 503"
+    assert letter["passes"] == 0
+
+
+def test_discarded_requests_are_removed(queue):
+    for index in range(3):
+        record(queue, f"https://example.com/{index}")
+    letters = queue.load()
+    queue.discard({letters[0]["id"], letters[2]["id"]})
+    assert [letter["url"] for letter in queue.load()] == ["https://example.com/1"]
+
+
+def test_lines_cut_short_are_skipped(queue):
+    record(queue, "https://example.com/")
+    with open(queue.path, "a", encoding="utf-8") as file:
+        file.write('{"id": "cut')
+    assert len(queue.load()) == 1
+
+
+def test_retry_recovers_the_companies(queue):
+    url = italy.search_url("pizza", "Roma", 2)
+    record(queue, url, job="job")
+    record(queue, url, job="other job")
+
+    async def main():
+        server = MockDirectoryServer()
+        progress = threading.Event()
+        progress.set()
+        try:
+            async with aiohttp.ClientSession() as client:
+                session = MockSession(client, await server.start())
+                return await deadletter.retry(
+                    queue, italy, session, Proxy(), progress, job="job"
+                )
+        finally:
+            await server.stop()
+
+    companies = asyncio.run(main())
+    assert companies == italy.parse_companies(load_fixture("italy", "search"))
+    assert [letter["job"] for letter in queue.load()] == ["other job"]
+
+
+def test_retries_avoid_the_proxy_that_failed(queue, tmp_path, monkeypatch):
+    token = deadletter.search_context.set(
+        deadletter.search_of("job", "italy", "pizza", "Roma", ["name"])
+    )
+    try:
+        queue.record("GET", "https://example.com/", {}, None, "timeout", "", "http://a")
+    finally:
+        deadletter.search_context.reset(token)
+    (letter,) = queue.load()
+    assert letter["proxy"] == "http://a"
+
+    avoided = []
+
+    async def make_request(session, url, avoid=None, **kwargs):
+        avoided.append(avoid)
+        return ""
+
+    monkeypatch.setattr(utils, "make_request", make_request)
+    progress = threading.Event()
+    progress.set()
+    options = {"session": None, "semaphore": None, "proxy": None, "progress": progress}
+    assert asyncio.run(deadletter.resend(italy, letter, **options)) == []
+    assert avoided == ["http://a"]
+
+    path = tmp_path / ".proxies"
+    path.write_text("http://a\nhttp://b\n")
+    proxy = Proxy(str(path))
+
+    async def attempt(proxy_url):
+        return proxy_url
+
+    for _ in range(4):
+        assert (
+            asyncio.run(utils.hedge(attempt, proxy, "x", None, "http://a"))
+            == "http://b"
+        )
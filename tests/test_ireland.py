@@ -0,0 +1,43 @@
+import asyncio
+import threading
+
+import aiohttp
+from yellowpages.benchmarks import load_fixture
+from yellowpages.benchmarks.server import MockDirectoryServer, MockSession
+from yellowpages.scrapers import ireland
+
+
+def search(server: MockDirectoryServer) -> list:
+    """Run a search of the ireland scraper against the mock server."""
+
+    async def run() -> list:
+        url = await server.start()
+        progress = threading.Event()
+        progress.set()
+        try:
+            async with aiohttp.ClientSession() as client:
+                return await ireland.search(
+                    "Bakery",
+                    location="Dublin",
+                    session=MockSession(client, url),
+                    semaphore=asyncio.Semaphore(4),
+                    progress=progress,
+                    fields=["name"],
+                )
+        finally:
+            await server.stop()
+
+    return asyncio.run(run())
+
+
+def test_search_scrapes_every_page(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    listings = ireland.parse_search(load_fixture("ireland", "search"))
+    companies = search(MockDirectoryServer(pages=3))
+    assert len(companies) > len(listings)
+    assert len({company["phone"] for company in companies}) > len(listings)
+
+
+def test_parse_total_is_an_int():
+    assert ireland.parse_total(load_fixture("ireland", "search")) > 0
+    assert ireland.parse_total("<html></html>") == 0
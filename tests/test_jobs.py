@@ -0,0 +1,43 @@
+import asyncio
+import types
+
+from yellowpages import jobs
+from yellowpages.pagination import PageSize
+
+
+def make_module(totals: dict) -> types.ModuleType:
+    """Scraper with detail pages, its first pages being their total."""
+    module = types.ModuleType("yellowpages.scrapers.example")
+
+    async def fetch_first_page(query, location, **kwargs):
+        return str(totals.get((query, location), 0))
+
+    module.fetch_first_page = fetch_first_page
+    module.parse_total = int
+    module.parse_search = list
+    module.page_size = PageSize("example", 10)
+    return module
+
+
+def test_expand_drops_blanks_and_duplicates():
+    assert jobs.expand(["Bakery", " ", "Bakery ", "Pizza"], ["Berlin", "Berlin"]) == [
+        ("Bakery", "Berlin"),
+        ("Pizza", "Berlin"),
+    ]
+
+
+def test_plan_jobs_orders_and_caps_the_searches():
+    module = make_module({("Bakery", "Berlin"): 25, ("Pizza", "Berlin"): 500})
+    estimates = asyncio.run(
+        jobs.plan_jobs(
+            module,
+            [("Bakery", "Berlin"), ("Pizza", "Berlin"), ("Tea", "Berlin")],
+            max_requests=100,
+        )
+    )
+    assert [item["keyword"] for item in estimates] == ["Pizza", "Bakery", "Tea"]
+    assert [item["skipped"] for item in estimates] == [True, False, False]
+    bakery = estimates[1]
+    assert bakery["pages"] == 3
+    assert bakery["requests"] == 3 + 25  # Search pages and company pages
+    assert bakery["page"] == "25"  # Handed to the search
@@ -0,0 +1,43 @@
+from yellowpages.latency import AdaptiveTimeout, Hedging, HostLatency
+
+
+def make_latency(samples: list) -> HostLatency:
+    latency = HostLatency(min_samples=10)
+    for seconds in samples:
+        latency.add("example.com", seconds)
+    return latency
+
+
+def test_no_quantile_before_enough_samples():
+    assert make_latency([0.1] * 9).quantile("example.com", 0.95) is None
+    assert make_latency([0.1] * 10).quantile("example.com", 0.95) == 0.1
+
+
+def test_censored_samples_raise_the_tail():
+    latency = make_latency([0.1] * 95)
+    assert latency.quantile("example.com", 0.95) == 0.1
+    for _ in range(5):
+        latency.add_censored("example.com", 4.0)  # Timed out after 4 seconds
+    assert latency.quantile("example.com", 0.95) == 4.0
+
+
+def test_censored_samples_under_the_median_are_dropped():
+    latency = make_latency([1.0] * 20)
+    latency.add_censored("example.com", 0.2)  # Lost hedge cancelled early
+    assert latency.quantile("example.com", 0.0) == 1.0
+
+
+def test_hedges_stay_within_the_budget():
+    hedging = Hedging(make_latency([0.1] * 20), ratio=0.1)
+    assert hedging.delay("example.com") == 0.1
+    hedging.hedges += 1
+    assert hedging.delay("example.com") is None
+
+
+def test_timeouts_are_bounded():
+    slow = make_latency([10.0] * 20)
+    timeouts = AdaptiveTimeout(slow, slow, factor=3, floor=5, ceiling=20)
+    assert timeouts.get("example.com")["total"] == 20
+    assert timeouts.get("unknown.com")["sock_read"] == 20
+    fast = make_latency([0.1] * 20)
+    assert AdaptiveTimeout(fast, fast, floor=5).get("example.com")["total"] == 5
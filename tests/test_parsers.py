@@ -0,0 +1,50 @@
+import importlib
+
+import pytest
+from yellowpages.benchmarks import load_fixture
+from yellowpages.scrapers import ireland
+
+# Fields of the search results parsed like the company pages, the fixtures
+# of each scraper listing the company of its detail page first
+LISTED_FIELDS = {
+    "usa": ["name", "phone", "location", "city", "state", "zip_code"],
+    "ireland": ["name", "phone", "location", "city", "state"],
+    "germany": ["name", "phone", "location", "city", "state", "zip_code"],
+}
+
+
+@pytest.mark.parametrize("name", sorted(LISTED_FIELDS))
+def test_listings_match_the_company_pages(name):
+    module = importlib.import_module(f"yellowpages.scrapers.{name}")
+    company = module.parse_company(load_fixture(name, "detail"))
+    listed = module.parse_search(load_fixture(name, "search"))[0]["company"]
+    for field in LISTED_FIELDS[name]:
+        assert listed[field] == company[field], field
+
+
+@pytest.mark.parametrize(
+    "address, parsed",
+    [
+        (
+            "1 Main Street Dublin D01 X2Y3 Co. Dublin",
+            ("1 Main Street Dublin", "D01", "Dublin", "D01 X2Y3"),
+        ),
+        ("Unit 4 Cork", ("", "", "", "")),
+    ],
+)
+def test_ireland_addresses(address, parsed):
+    assert ireland.parse_address(address) == parsed
+
+
+@pytest.mark.parametrize(
+    "address, parsed",
+    [
+        (
+            "1 Main Street Dublin D01 Co. Dublin",
+            ("1 Main Street Dublin", "D01", "Dublin", "D01"),
+        ),
+        ("Unit 4 Cork", ("", "", "", "")),
+    ],
+)
+def test_ireland_listed_addresses(address, parsed):
+    assert ireland.parse_listed_address(address) == parsed
@@ -0,0 +1,61 @@
+import asyncio
+import types
+
+from yellowpages import sharding
+
+
+def make_module(totals: dict, districts: dict) -> types.SimpleNamespace:
+    """Scraper with a result cap of 100, its first pages being their total."""
+
+    async def fetch_first_page(query, location, **kwargs):
+        return str(totals.get(location, 0))
+
+    async def split_location(query, location, **kwargs):
+        return districts.get(location, [])
+
+    return types.SimpleNamespace(
+        RESULT_CAP=100,
+        fetch_first_page=fetch_first_page,
+        parse_total=int,
+        split_location=split_location,
+    )
+
+
+def plan(module, location: str) -> list:
+    return asyncio.run(sharding.plan(module, "Bakery", location))
+
+
+def test_searches_under_the_cap_are_kept():
+    module = make_module({"Berlin": 80}, {"Berlin": ["Berlin-Mitte"]})
+    assert plan(module, "Berlin") == ["Berlin"]
+
+
+def test_covering_shards_replace_the_search():
+    module = make_module(
+        {"Berlin": 150, "Berlin-Mitte": 90, "Berlin-Nord": 70},
+        {"Berlin": ["Berlin", "Berlin-Mitte", "Berlin-Nord"]},
+    )
+    assert plan(module, "Berlin") == ["Berlin-Mitte", "Berlin-Nord"]
+
+
+def test_search_is_kept_when_its_shards_miss_results():
+    module = make_module(
+        {"Berlin": 300, "Berlin-Mitte": 90, "Berlin-Nord": 70},
+        {"Berlin": ["Berlin-Mitte", "Berlin-Nord"]},
+    )
+    assert plan(module, "Berlin") == ["Berlin", "Berlin-Mitte", "Berlin-Nord"]
+
+
+def test_shards_over_the_cap_are_split_again():
+    module = make_module(
+        {"Berlin": 250, "Berlin-Mitte": 180, "Berlin-Nord": 70, "Mitte-1": 100},
+        {"Berlin": ["Berlin-Mitte", "Berlin-Nord"], "Berlin-Mitte": ["Mitte-1"]},
+    )
+    assert plan(module, "Berlin") == ["Berlin-Mitte", "Mitte-1", "Berlin-Nord"]
+
+
+def test_duplicates_of_overlapping_shards_are_dropped():
+    deduplicator = sharding.Deduplicator()
+    company = {"name": "Bäckerei Schmidt", "phone": "030 2000000", "location": ""}
+    assert deduplicator([company]) == [company]
+    assert deduplicator([{**company, "phone": "0302000000"}]) == []
@@ -1,41 +1,95 @@
 import asyncio
+import collections
+import contextlib
 import csv
 import os
 import pathlib
 import sys
 import threading
 import time
-from tkinter import filedialog, messagebox
+from tkinter import filedialog, messagebox, ttk
 
-import aiohttp
 import customtkinter as ctk
 from loguru import logger as log
+from yellowpages.breaker import FillRateBreaker, observer
+from yellowpages.connections import host_limit, make_connector, prewarm
+from yellowpages.deadletter import RETRY_PASS, retry, search_context, search_of
+from yellowpages.index import SearchIndex
+from yellowpages.jobs import JOB_DEADLINE, Site, expand, plan_jobs, summary
+from yellowpages.profiler import SamplingProfiler
 from yellowpages.proxy import Proxy
 from yellowpages.scrapers import Mapper
-from yellowpages.utils import LoadingAnimation
+from yellowpages.sharding import Deduplicator, plan
+from yellowpages.utils import (
+    ColumnarBuffer,
+    EventManager,
+    LoadingAnimation,
+    archive,
+    blocks,
+    connections,
+    dead_letters,
+    hedging,
+)
 
 PROXY_FILE = ".proxies"
 
 
 class Redirect:
-    def __init__(self, widget):
+    def __init__(self, widget, fps: int = 20, max_lines: int = 1000):
+        """
+        File-like object rendering what is written to it in a textbox.
+        Writes only append to a bounded buffer, whatever thread they come
+        from; the Tk thread drains it `fps` times per second, so the cost
+        of the UI doesn't depend on how much gets logged.
+
+        Args:
+            widget (CTkTextbox): Textbox to render the text in.
+            fps (int): Number of times per second the textbox is updated.
+            max_lines (int): Number of lines kept in the textbox.
+
+        Returns:
+            None
+        """
         self.widget = widget
+        self.interval = 1000 // fps
+        self.max_lines = max_lines
+        # Appending to and popping from a deque are atomic, no lock is needed
+        self.buffer = collections.deque(maxlen=max_lines * 10)
+        self.widget.after(self.interval, self.render)
 
     def write(self, text):
-        if text.startswith("\r"):
-            self.widget.delete("end-1c linestart", "end-1c lineend")
-        self.widget.insert(ctk.END, text)
-        self.widget.see(ctk.END)
+        self.buffer.append(text)
 
     def flush(self):
         pass
 
+    def render(self):
+        pieces = []
+        while self.buffer:
+            pieces.append(self.buffer.popleft())
+
+        if pieces:
+            lines = "".join(pieces).split("\n")
+            # A carriage return starts the line over, keep what was written last
+            if "\r" in lines[0]:
+                self.widget.delete("end-1c linestart", "end-1c lineend")
+            text = "\n".join(line.rsplit("\r", 1)[-1] for line in lines)
+            self.widget.insert(ctk.END, text)
+
+            # Cap the scrollback
+            excess = int(self.widget.index("end-1c").split(".")[0]) - self.max_lines
+            if excess > 0:
+                self.widget.delete("1.0", f"{excess + 1}.0")
+            self.widget.see(ctk.END)
+
+        self.widget.after(self.interval, self.render)
+
 
 ctk.set_appearance_mode("light")  # Set appearance mode to system theme
 
 
 class DropdownMultiSelect(ctk.CTkFrame):
-    def __init__(self, master, items, **kwargs):
+    def __init__(self, master, items, rows: int = 6, **kwargs):
         super().__init__(master, **kwargs)
 
         # Toggle button to open/close the dropdown
@@ -44,18 +98,51 @@ def __init__(self, master, items, **kwargs):
         )
         self.toggle_button.pack(fill="x")
 
-        # Scrollable frame to hold the checkboxes
-        self.scrollable_frame = ctk.CTkScrollableFrame(self, height=50)
-        self.content_frame = ctk.CTkFrame(
-            self.scrollable_frame, height=50
-        )  # Create a frame inside the scrollable frame
-        self.content_frame.pack(pady=(0, 15), padx=0, fill="x")
-        self.scrollable_frame.pack(pady=(0, 15), padx=0, fill="x")
-        # self.location_dropdown.
-        self.scrollable_frame.pack_forget()  # Start hidden
-
-        self.vars = {}
+        # Frame holding the search entry and the visible checkboxes
+        self.dropdown_frame = ctk.CTkFrame(self)
+        self.search_entry = ctk.CTkEntry(
+            self.dropdown_frame, placeholder_text="Search locations"
+        )
+        self.search_entry.pack(pady=(5, 0), padx=10, fill="x")
+        self.search_entry.bind("<KeyRelease>", self.on_search)
+
+        self.content_frame = ctk.CTkFrame(self.dropdown_frame, fg_color="transparent")
+        self.content_frame.pack(side="left", pady=(0, 5), padx=0, fill="x", expand=True)
+        self.scrollbar = ctk.CTkScrollbar(self.dropdown_frame, command=self.on_scroll)
+        self.scrollbar.pack(side="right", fill="y")
+        self.dropdown_frame.pack(pady=(0, 15), padx=0, fill="x")
+        self.dropdown_frame.pack_forget()  # Start hidden
+
+        # Only the visible rows get widgets, whatever the number of items
+        self.rows = rows
+        self.max_cols = 5  # Max columns in a row
+        self.offset = 0  # First visible row of the matches
+        self.index = SearchIndex()
+        self.matches = []  # Positions of the items matching the search
+        self.selected = set()
+        self.vars = []
         self.checkboxes = []
+        for index in range(rows * self.max_cols):
+            var = ctk.IntVar()
+            cb = ctk.CTkCheckBox(
+                self.content_frame,
+                text="",
+                variable=var,
+                command=lambda index=index: self.on_check(index),
+            )
+            cb.grid(
+                row=index // self.max_cols,
+                column=index % self.max_cols,
+                sticky="w",
+                padx=10,
+                pady=2,
+            )
+            self.vars.append(var)
+            self.checkboxes.append(cb)
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            self.content_frame.bind(sequence, self.on_wheel, add="+")
+            for cb in self.checkboxes:
+                cb.bind(sequence, self.on_wheel, add="+")
 
         # Populate with initial items
         self.set_items(items)
@@ -64,43 +151,217 @@ def __init__(self, master, items, **kwargs):
 
     def toggle(self):
         if self.currently_visible:
-            self.scrollable_frame.pack_forget()
+            self.dropdown_frame.pack_forget()
         else:
-            self.scrollable_frame.pack(pady=(0, 15), padx=0, fill="x")
+            self.dropdown_frame.pack(pady=(0, 15), padx=0, fill="x")
         self.currently_visible = not self.currently_visible
 
     def get_selected_items(self):
-        return [item for item, var in self.vars.items() if var.get() == 1]
+        return [item for item in self.index.items if item in self.selected]
 
     def set_items(self, items):
-        # Clear the existing checkboxes
-        for cb in self.checkboxes:
-            cb.destroy()
-        self.checkboxes.clear()
-        self.vars.clear()
-
-        # Add new checkboxes based on the new items list
-        row = 0
-        col = 0
-        max_cols = 5  # Max columns in a row
-
-        for index, item in enumerate(items):
-            var = ctk.IntVar()
-            cb = ctk.CTkCheckBox(self.content_frame, text=item, variable=var)
-            cb.grid(row=row, column=col, sticky="w", padx=10, pady=2)
-            if col == max_cols - 1:
-                row += 1
-                col = 0
+        self.index = SearchIndex(items)
+        self.selected.clear()
+        self.search_entry.delete(0, "end")
+        self.matches = list(range(len(self.index)))
+        self.offset = 0
+        self.render()
+
+    def on_search(self, _event=None):
+        self.matches = self.index.search(self.search_entry.get())
+        self.offset = 0
+        self.render()
+
+    def on_check(self, index):
+        position = self.offset * self.max_cols + index
+        if position >= len(self.matches):
+            return
+        item = self.index.items[self.matches[position]]
+        if self.vars[index].get() == 1:
+            self.selected.add(item)
+        else:
+            self.selected.discard(item)
+
+    def on_scroll(self, action, value, unit=None):
+        total_rows = -(-len(self.matches) // self.max_cols)
+        if action == "moveto":
+            self.offset = int(float(value) * total_rows)
+        elif action == "scroll":
+            self.offset += int(value) * (self.rows if unit == "pages" else 1)
+        self.render()
+
+    def on_wheel(self, event):
+        self.offset += -1 if event.num == 4 or event.delta > 0 else 1
+        self.render()
+
+    def render(self):
+        """Show the matches of the visible rows on the existing checkboxes."""
+        total_rows = -(-len(self.matches) // self.max_cols)
+        self.offset = max(0, min(self.offset, total_rows - self.rows))
+        first = self.offset * self.max_cols
+        for index, (cb, var) in enumerate(zip(self.checkboxes, self.vars)):
+            position = first + index
+            if position < len(self.matches):
+                item = self.index.items[self.matches[position]]
+                cb.configure(text=item, state="normal")
+                var.set(1 if item in self.selected else 0)
+                cb.grid()
             else:
-                col += 1
-
-            self.vars[item] = var
-            self.checkboxes.append(cb)
+                cb.grid_remove()
+        if total_rows:
+            self.scrollbar.set(
+                self.offset / total_rows,
+                min(1, (self.offset + self.rows) / total_rows),
+            )
+        else:
+            self.scrollbar.set(0, 1)
 
     def get(self):
         return ",".join(self.get_selected_items())
 
 
+class ResultsTable(ctk.CTkFrame):
+    def __init__(self, master, buffer: ColumnarBuffer, rows: int = 8, **kwargs):
+        """
+        Live view of a `ColumnarBuffer`. Only `rows` Treeview items exist,
+        scrolling changes which rows of the buffer they display, so the
+        cost of the widget is the same for 10 or 100k results.
+
+        Args:
+            master (Widget): Parent widget.
+            buffer (ColumnarBuffer): Table to display.
+            rows (int): Number of visible rows.
+
+        Returns:
+            None
+        """
+        super().__init__(master, **kwargs)
+        self.buffer = buffer
+        self.rows = rows
+        self.view = []  # Indices of the displayed rows of the buffer, in order
+        self.offset = 0  # Position of the first visible row in the view
+        self.sort_column = None
+        self.sort_reverse = False
+        self.filter_text = ""
+        self._filter_job = None
+        self._derived_size = 0  # Size of the buffer when the view was built
+        self._updated_at = 0.0
+
+        self.filter_entry = ctk.CTkEntry(
+            self, placeholder_text="Filter results", corner_radius=3, height=30
+        )
+        self.filter_entry.pack(fill="x", pady=(0, 5))
+        self.filter_entry.bind("<KeyRelease>", self.on_filter)
+
+        columns = list(buffer.columns)
+        self.tree = ttk.Treeview(
+            self, columns=columns, show="headings", height=rows, selectmode="none"
+        )
+        for column in columns:
+            self.tree.heading(
+                column,
+                text=column.replace("_", " ").capitalize(),
+                command=lambda column=column: self.sort_by(column),
+            )
+            self.tree.column(column, width=100, stretch=True)
+        for index in range(rows):
+            self.tree.insert("", "end", iid=str(index), values=())
+        self.tree.pack(side="left", fill="both", expand=True)
+
+        self.scrollbar = ctk.CTkScrollbar(self, command=self.on_scroll)
+        self.scrollbar.pack(side="right", fill="y")
+
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            self.tree.bind(sequence, self.on_wheel)
+
+        self.after(250, self.poll)
+
+    def reset(self):
+        self.offset = 0
+        self.update_view()
+
+    def poll(self):
+        """Show the rows added to the buffer since the last poll."""
+        size = len(self.buffer)
+        if not self.is_derived:
+            if size != len(self.view):
+                # Plain view: the new rows only have to be appended
+                del self.view[size:]
+                self.view.extend(range(len(self.view), size))
+                self.refresh()
+        elif size != self._derived_size and time.monotonic() - self._updated_at > 1:
+            # Sorted or filtered view: rebuild it at most once per second
+            self.update_view()
+        self.after(250, self.poll)
+
+    @property
+    def is_derived(self):
+        return self.sort_column is not None or bool(self.filter_text)
+
+    def update_view(self):
+        self._updated_at = time.monotonic()
+        self._derived_size = len(self.buffer)
+        view = (
+            self.buffer.search(self.filter_text)
+            if self.filter_text
+            else list(range(self._derived_size))
+        )
+        if self.sort_column:
+            view = self.buffer.sort(view, self.sort_column, self.sort_reverse)
+        self.view = view
+        self.refresh()
+
+    def sort_by(self, column):
+        if self.sort_column == column:
+            self.sort_reverse = not self.sort_reverse
+        else:
+            self.sort_column, self.sort_reverse = column, False
+        self.update_view()
+
+    def on_filter(self, _event=None):
+        # Wait until the user stops typing before scanning the buffer
+        if self._filter_job is not None:
+            self.after_cancel(self._filter_job)
+
+        def apply():
+            self._filter_job = None
+            self.filter_text = self.filter_entry.get().strip()
+            self.offset = 0
+            self.update_view()
+
+        self._filter_job = self.after(300, apply)
+
+    def on_scroll(self, action, value, unit=None):
+        if action == "moveto":
+            self.offset = int(float(value) * len(self.view))
+        elif action == "scroll":
+            self.offset += int(value) * (self.rows if unit == "pages" else 1)
+        self.refresh()
+
+    def on_wheel(self, event):
+        if event.num == 4 or event.delta > 0:
+            self.offset -= 3
+        else:
+            self.offset += 3
+        self.refresh()
+        return "break"
+
+    def refresh(self):
+        """Display the rows of the view starting at `offset`."""
+        total = len(self.view)
+        self.offset = max(0, min(self.offset, total - self.rows))
+        visible = self.view[self.offset : self.offset + self.rows]  # noqa: E203
+        for index in range(self.rows):
+            values = self.buffer.row(visible[index]) if index < len(visible) else ()
+            self.tree.item(str(index), values=values)
+        if total:
+            self.scrollbar.set(
+                self.offset / total, (self.offset + len(visible)) / total
+            )
+        else:
+            self.scrollbar.set(0, 1)
+
+
 class ProxyConfigPopup(ctk.CTkToplevel):
     def __init__(self, *args, **kwargs):
         super().__init__(fg_color="#ddd", *args, **kwargs)
@@ -151,18 +412,35 @@ class YellowPagesScraperUI(ctk.CTk):
     Yellow Pages Scraper UI Application
     """
 
-    def __init__(self):
+    def __init__(self, profile: bool = False):
         self.fg_color = "#f9c852"
+        self.profile = profile  # Sample the scraping jobs with a profiler
 
         super().__init__(fg_color=self.fg_color)
 
         self.progress = threading.Event()
         self.loading_animation = LoadingAnimation(progress=self.progress)
+        # Results of the running job, filled as the companies are scraped
+        self.results = ColumnarBuffer(
+            [
+                "name",
+                "categories",
+                "phone",
+                "email",
+                "location",
+                "city",
+                "state",
+                "zip_code",
+            ]
+        )
+        # Searches split in shards overlap, keep each company once
+        self.deduplicator = Deduplicator()
+        EventManager().subscribe("companies", self.on_companies)
         self.mapper = Mapper()
         # self.iconbitmap(resource_path("icon.ico"))
 
         self.title("Yellow Pages Scraper v1.0")
-        self.geometry("900x610")  # Set a fixed window size
+        self.geometry("900x800")  # Set a fixed window size
         self.resizable(False, False)  # Disable window resizing
 
         self.websites = self.mapper.get_options()
@@ -207,6 +485,23 @@ def __init__(self):
         self.scraping_website_dropdown.set(self.websites[0])
         self.website = self.websites[0]
 
+        # Websites searched by a job, side by side
+        self.sites_container = ctk.CTkFrame(
+            self, corner_radius=0, fg_color="transparent"
+        )
+        self.sites_container.pack(padx=30, pady=(0, 15), fill="x")
+        self.site_checkboxes = {}
+        for index, website in enumerate(self.websites):
+            checkbox = ctk.CTkCheckBox(
+                self.sites_container,
+                text=website,
+                font=("Segoe UI Variable Text", 14),
+                width=90,
+            )
+            checkbox.grid(row=index // 5, column=index % 5, sticky="w")
+            self.site_checkboxes[website] = checkbox
+        self.site_checkboxes[self.website].select()
+
         # Create a container for the form elements
         self.search_container = ctk.CTkFrame(
             self, corner_radius=8, fg_color="transparent"
@@ -247,6 +542,23 @@ def __init__(self):
         self.location_widget = None
         self.set_dropdown()
 
+        # Fields to scrape, company pages are only fetched for the missing ones
+        self.fields_container = ctk.CTkFrame(
+            self, corner_radius=0, fg_color="transparent"
+        )
+        self.fields_container.pack(padx=30, pady=(0, 15), fill="x")
+        self.field_checkboxes = {}
+        for column in self.results.columns:
+            checkbox = ctk.CTkCheckBox(
+                self.fields_container,
+                text=column.replace("_", " ").capitalize(),
+                font=("Segoe UI Variable Text", 14),
+                width=90,
+            )
+            checkbox.select()
+            checkbox.pack(side="left")
+            self.field_checkboxes[column] = checkbox
+
         self.container = ctk.CTkFrame(self, corner_radius=8, fg_color="transparent")
         self.container.pack(padx=30, pady=0, fill="both")
 
@@ -286,6 +598,11 @@ def __init__(self):
         )
         self.start_button.pack(pady=0, padx=0, side="right")
 
+        self.results_table = ResultsTable(
+            self, self.results, corner_radius=0, fg_color="transparent"
+        )
+        self.results_table.pack(padx=30, pady=(15, 0), fill="x")
+
         self.log_text = ctk.CTkTextbox(
             self,
             corner_radius=3,
@@ -320,7 +637,12 @@ def set_dropdown(self):
 
     def set_scraping_website(self, selected):
         self.website = selected
+        self.site_checkboxes[selected].select()
         self.set_dropdown()
+        # Import the scraper in the background so that START doesn't wait for it
+        threading.Thread(
+            target=self.mapper.get_module, args=(selected,), daemon=True
+        ).start()
 
     def select_proxy_file(self):
         if not self.toplevel_window or not self.toplevel_window.winfo_exists():
@@ -354,14 +676,30 @@ def on_search(self):
             messagebox.showerror("Error", "Please enter locations.")
             return
 
-        keywords = keywords.split(",")
-        locations = locations.split(",")
+        fields = [
+            column
+            for column, checkbox in self.field_checkboxes.items()
+            if checkbox.get()
+        ]
+        if not fields:
+            messagebox.showerror("Error", "Please select the fields to scrape.")
+            return
+        if len(fields) == len(self.field_checkboxes):
+            fields = None  # Every field, from the company pages
+
+        websites = [
+            website
+            for website, checkbox in self.site_checkboxes.items()
+            if checkbox.get()
+        ]
+        if not websites:
+            messagebox.showerror("Error", "Please select the websites to scrape.")
+            return
 
-        if len(keywords) != len(locations):
-            messagebox.showerror(
-                "Error",
-                "The number of business names should match the number of locations.",
-            )
+        # Every business name in every location
+        queries = expand(keywords.split(","), locations.split(","))
+        if not queries:
+            messagebox.showerror("Error", "Please enter business names and locations.")
             return
 
         if not self.file_path:
@@ -380,20 +718,96 @@ def on_search(self):
         # create empty file
         pathlib.Path(self.file_path).touch()
 
+        self.results.clear()
+        self.deduplicator.clear()
+        self.results_table.reset()
+
         self.progress.set()
         self.start_button.configure(state="disabled")
         self.stop_button.configure(state="normal", fg_color="red")
         self.update()
 
-        queries = list(zip(keywords, locations))
-
         scrape_thread = threading.Thread(
             target=self.run_scraping,
-            args=(queries, self.file_path),
+            args=(queries, websites, self.file_path, fields),
         )
         scrape_thread.start()
 
-    async def run(self, query, progress, semaphore, proxy=None):
+    def on_deadline(self):
+        print(f"Deadline of {JOB_DEADLINE:g} seconds reached, stopping the job.")
+        self.stop_button.invoke()
+
+    def on_companies(self, companies):
+        self.results.extend(self.deduplicator(companies))
+
+    async def run_site(self, site, estimates, options, fields=None, job=None):
+        """Run the searches of a site, its errors don't stop the other sites."""
+        # Stops the site alone if its pages stop yielding companies
+        breaker = FillRateBreaker(
+            site.name,
+            options["progress"],
+            selectors=getattr(site.module, "SELECTORS", None),
+            fields=fields,
+        )
+        # The counts of the shards and the searches without results are
+        # expected to find no company
+        observer.set(breaker.quiet)
+        site.breaker = breaker
+        options = {**options, "progress": breaker}
+
+        async def search(item, location):
+            observer.set(breaker if item["total"] else breaker.quiet)
+            # The requests failing for good are recorded with their search
+            search_context.set(
+                search_of(job, site.name, item["keyword"], location, fields)
+            )
+            return await site.module.search(
+                item["keyword"],
+                location=location,
+                fields=fields,
+                # The first page probed by the estimate, unless it was split
+                first_page=item["page"] if location == item["location"] else None,
+                **options,
+            )
+
+        rows = []
+        try:
+            # Split the searches the website would truncate
+            shards = await asyncio.gather(
+                *[
+                    plan(
+                        site.module,
+                        item["keyword"],
+                        item["location"],
+                        total=item["total"],
+                        **options,
+                    )
+                    for item in estimates
+                ]
+            )
+            search_result = await asyncio.gather(
+                *[
+                    search(item, shard)
+                    for item, locations in zip(estimates, shards)
+                    for shard in locations
+                    if options["progress"].is_set()
+                ],
+            )
+            for result in search_result:
+                if isinstance(result, list):
+                    rows.extend(row for row in result if isinstance(row, dict))
+        except Exception as e:
+            log.error(f"{site.name}: {e}")
+
+        breaker.save()
+        if breaker.tripped:
+            print(breaker.tripped)
+        print(f"{site.name}: {len(rows)} companies")
+        return rows
+
+    async def run(self, sites, query, progress, fields=None):
+        import aiohttp  # Only needed once a job starts
+
         BASE_HEADERS = {
             "accept-language": "en-US,en;q=0.9",
             "user-agent": "Mozilla/5.0 (Linux; Android 6.0; Nexus 5 Build/MRA5"
@@ -404,48 +818,140 @@ async def run(self, query, progress, semaphore, proxy=None):
         }
 
         result_searchs = []
-        async with aiohttp.ClientSession(
-            headers=BASE_HEADERS,
-            connector=aiohttp.TCPConnector(ssl=False),
-        ) as session:
+        job = time.strftime("%Y%m%d-%H%M%S")
+        async with contextlib.AsyncExitStack() as stack:
             try:
-                search = self.mapper.get_search(self.website)
+                # Each site has its own session, concurrency and proxies
+                options = [
+                    {
+                        "session": await stack.enter_async_context(
+                            aiohttp.ClientSession(
+                                headers=BASE_HEADERS,
+                                connector=make_connector(host_limit(site.concurrency)),
+                                trace_configs=[connections.trace_config()],
+                            )
+                        ),
+                        "proxy": site.proxy,
+                        "progress": progress,
+                        "semaphore": site.throttle,
+                    }
+                    for site in sites
+                ]
+
+                # Connect to the websites reached directly before the first pages
+                await asyncio.gather(
+                    *[
+                        prewarm(
+                            site_options["session"],
+                            site.module.HOST,
+                            site.concurrency,
+                        )
+                        for site, site_options in zip(sites, options)
+                        # Replayed jobs don't touch the network
+                        if not site.proxy.total and not archive.replaying
+                    ]
+                )
 
-                if not search:
-                    log.error(f"`search` method not implemented for {self.website}.")
+                # Estimate the job from the first pages before committing to it
+                estimates = await asyncio.gather(
+                    *[
+                        plan_jobs(site.module, query, **site_options)
+                        for site, site_options in zip(sites, options)
+                    ]
+                )
+                message = summary(
+                    [item for items in estimates for item in items], sites
+                )
+                print(message)
+                if not messagebox.askyesno("Confirm Job", f"{message}\n\nStart?"):
                     self.stop_button.invoke()
-                    sys.exit(1)
+                    return None
+
+                if JOB_DEADLINE:
+                    # Stop like the STOP button, what was scraped is still saved
+                    deadline = asyncio.get_running_loop().call_later(
+                        JOB_DEADLINE, self.on_deadline
+                    )
+                    stack.callback(deadline.cancel)
 
-                search_result = await asyncio.gather(
+                # The sites run side by side, the job takes as long as the slowest
+                results = await asyncio.gather(
                     *[
-                        search(
-                            keyword,
-                            location=location,
-                            session=session,
-                            proxy=proxy,
-                            progress=progress,
-                            semaphore=semaphore,
+                        self.run_site(
+                            site,
+                            [item for item in items if not item["skipped"]],
+                            site_options,
+                            fields=fields,
+                            job=job,
                         )
-                        for keyword, location in query
-                        if progress.is_set()
-                    ],
+                        for site, items, site_options in zip(sites, estimates, options)
+                    ]
                 )
 
-                for result in search_result:
-                    if isinstance(result, list):
-                        result_searchs.extend(result)
+                async def retry_site(site, site_options):
+                    if site.breaker is not None and site.breaker.tripped:
+                        return []  # Its pages changed, they would fail again
+                    companies = await retry(
+                        dead_letters,
+                        site.module,
+                        site_options["session"],
+                        Proxy(PROXY_FILE),
+                        progress,
+                        job=job,
+                    )
+                    if companies:
+                        print(f"{site.name}: {len(companies)} companies recovered")
+                    return companies
+
+                if RETRY_PASS and progress.is_set():
+                    # Send the requests that failed again, through other proxies
+                    # and fewer at a time
+                    recovered = await asyncio.gather(
+                        *[
+                            retry_site(site, site_options)
+                            for site, site_options in zip(sites, options)
+                        ]
+                    )
+                    results = [rows + more for rows, more in zip(results, recovered)]
+
+                deduplicator = Deduplicator()
+                for rows in results:
+                    result_searchs.extend(deduplicator(rows))
             except Exception as e:
                 log.error(e)
 
         return result_searchs
 
-    def run_scraping(self, queries, file_location):
+    def run_scraping(self, queries, websites, file_location, fields=None):
+        profiler = SamplingProfiler() if self.profile else None
+        if profiler:
+            profiler.start()
+
         self.loading_animation.start()
 
         proxy = Proxy(PROXY_FILE)
+        modules = []
+        for website in websites:
+            module = self.mapper.get_module(website)
+            if getattr(module, "search", None) is None:
+                log.error(f"`search` method not implemented for {website}.")
+                continue
+            modules.append(module)
+        sites = [
+            Site(module, proxy, index, len(modules))
+            for index, module in enumerate(modules)
+        ]
+
         start_time = time.perf_counter()
-        semaphore = asyncio.Semaphore(10)  # Limit the number of concurrent requests
-        result = asyncio.run(self.run(queries, self.progress, semaphore, proxy=proxy))
+        hedges, wins = hedging.hedges, hedging.wins
+        blocked, checked = blocks.blocks.copy(), blocks.responses.copy()
+        opened, reused = connections.opened, connections.reused
+        result = asyncio.run(self.run(sites, queries, self.progress, fields=fields))
+        if result is None:
+            # Job declined after its estimate
+            if profiler:
+                profiler.stop()
+            return
 
         scraped_data = [row for row in result if isinstance(row, dict)]
 
@@ -453,7 +959,7 @@ def run_scraping(self, queries, file_location):
             self.stop_button.invoke()
 
         if scraped_data:
-            self.save_to_csv(scraped_data, file_location)
+            self.save_to_csv(scraped_data, file_location, fields)
             messagebox.showinfo(
                 "Data Scraped!",
                 f"Total of {len(scraped_data)} data is saved to {file_location}",
@@ -467,9 +973,37 @@ def run_scraping(self, queries, file_location):
             f"\n---Finished in: {total_time:02f} seconds---\n"
             f"Total of {len(scraped_data)} business companies information gathered."
         )
+        if hedging.hedges > hedges:
+            print(
+                f"{hedging.hedges - hedges} slow requests sent again through another "
+                f"proxy, {hedging.wins - wins} of them answered first."
+            )
+        opened, reused = connections.opened - opened, connections.reused - reused
+        if opened or reused:
+            print(
+                f"{opened} connections opened, {reused} reused "
+                f"({reused / (opened + reused):.0%} reuse)."
+            )
+        for host, count in (blocks.blocks - blocked).items():
+            responses = blocks.responses[host] - checked[host]
+            print(f"Blocked by {host}: {count} of {responses} responses.")
+
+        if profiler:
+            profiler.stop()
+            folded, summary = profiler.write(
+                pathlib.Path(file_location).with_suffix(
+                    time.strftime(".%Y%m%d-%H%M%S.profile")
+                )
+            )
+            print(f"Profile saved to {folded} and {summary}")
 
-    def save_to_csv(self, data, file_location):
+    def save_to_csv(self, data, file_location, fields=None):
         with open(file_location, "w", encoding="utf-8") as f:
-            cw = csv.DictWriter(f, fieldnames=data[0].keys(), lineterminator="\n")
+            cw = csv.DictWriter(
+                f,
+                fieldnames=fields or data[0].keys(),
+                lineterminator="\n",
+                extrasaction="ignore",
+            )
             cw.writeheader()
             cw.writerows(data)
@@ -1,7 +1,9 @@
 import asyncio
 import itertools
+import json
 import os
 import pathlib
+import queue
 import random
 import sys
 import threading
@@ -9,10 +11,51 @@
 import typing
 from collections import defaultdict
 
-import aiohttp
 from loguru import logger as log
+from yarl import URL
+from yellowpages.archive import Archive, request_key
+from yellowpages.blocks import BlockDetector
+from yellowpages.breaker import observer
+from yellowpages.connections import ConnectionStats
+from yellowpages.deadletter import DeadLetterQueue
+from yellowpages.latency import AdaptiveTimeout, Hedging, HostLatency
 from yellowpages.proxy import Proxy
 
+if typing.TYPE_CHECKING:
+    import aiohttp
+
+# Records the responses to WARC files or answers the requests from them
+archive = Archive()
+
+# Response times of the hosts, the requests sent twice because of them and
+# the timeouts they give
+latency = HostLatency()
+first_byte = HostLatency()
+hedging = Hedging(latency)
+timeouts = AdaptiveTimeout(first_byte, latency)
+
+# Block pages served by the hosts and the proxies they blocked
+blocks = BlockDetector()
+
+# Connections opened and reused by the sessions of the jobs
+connections = ConnectionStats()
+
+# Requests given up on, sent again at the end of the job or later
+dead_letters = DeadLetterQueue()
+
+# Statuses of the resources that don't exist (anymore), e.g. an API path
+# embedding an expired build ID, given up on at once and not kept
+FINAL_STATUSES = {404, 410}
+
+
+class _NotFound(str):
+    """Empty response of a request that ended with one of `FINAL_STATUSES`"""
+
+
+# Returned by `make_request` instead of "" when the resource doesn't exist,
+# empty like any failure but told apart with `is`
+NOT_FOUND = _NotFound()
+
 
 def resource_path(*relative_path):
     """Get absolute path to resource, works for dev and for PyInstaller"""
@@ -26,13 +69,14 @@ def resource_path(*relative_path):
 
 
 async def make_request(
-    async_session: aiohttp.ClientSession,
+    async_session: "aiohttp.ClientSession",
     url: str,
     semaphore: asyncio.Semaphore = asyncio.Semaphore(10),
     proxy: Proxy | None = None,
     progress: threading.Event = None,
     headers: dict = None,
     is_post: bool = False,
+    avoid: str | None = None,
     **kwargs: typing.Any,
 ) -> str:
     """
@@ -42,31 +86,182 @@ async def make_request(
         async_session (aiohttp.ClientSession): Async session to make the request
         url (str): URL to make the request to
         proxy (Proxy): Proxy object to get the proxy from
+        avoid (str): Proxy not to use, e.g. the one the request already failed through
 
     Returns:
         str: Response text from the URL
     """
+    method = "POST" if is_post else "GET"
+    payload = kwargs.get("json", kwargs.get("data"))
+    key = archive.mode and request_key(method, url, kwargs.get("params"), payload)
+    if archive.replaying:
+        if progress is None or not progress.is_set():
+            return ""
+        return archive.lookup(key) or ""
+
+    import aiohttp  # Imported by the scrapers already
+
     async_session.headers.update(headers or {})
     proxy = proxy or Proxy()
+    host = URL(url).host
+    request_method = async_session.post if is_post else async_session.get
+    # Last attempt, kept if they all fail
+    failure = {"status": None, "error": "", "body": "", "proxy": None}
+
+    async def attempt(proxy_url: str | None) -> str | None:
+        """Send the request once, None if the response isn't ok."""
+        failure["proxy"] = proxy_url
+        start = time.perf_counter()
+        headers_at = None
+        timeout = kwargs.get("timeout") or aiohttp.ClientTimeout(**timeouts.get(host))
+        options = {**kwargs, "timeout": timeout}
+        try:
+            async with request_method(url=url, proxy=proxy_url, **options) as response:
+                headers_at = time.perf_counter()
+                if key and archive.recording:
+                    archive.write(
+                        key,
+                        method,
+                        str(response.url),
+                        json.dumps(payload, default=str).encode() if payload else b"",
+                        response.status,
+                        response.reason or "",
+                        list(response.headers.items()),
+                        await response.read(),
+                    )
+                if response.ok:
+                    text = await response.text()
+                else:
+                    text = await response.text(errors="replace")
+        except (asyncio.CancelledError, asyncio.TimeoutError):
+            # Lost to a hedge or timed out, it would have taken at least this long
+            elapsed = time.perf_counter() - start
+            latency.add_censored(host, elapsed)
+            if headers_at is None:
+                first_byte.add_censored(host, elapsed)
+            raise
+        blocked = blocks.check(host, proxy_url, response.status, text, URL(url).path)
+        if blocked or not response.ok:
+            failure.update(
+                status=None if blocked else response.status,
+                error=f"status {response.status}",
+                body=text,
+            )
+            return None  # Retried, through another proxy if it was a block
+        first_byte.add(host, headers_at - start)
+        latency.add(host, time.perf_counter() - start)
+        watch = observer.get()
+        if watch is not None:
+            # Called inline unlike the events, the breaker only counts it
+            watch("response", host)
+        return text
+
     async with semaphore:
         for _tries in range(3):
             if progress is None or not progress.is_set():
                 return ""
             try:
-                request_method = async_session.post if is_post else async_session.get
-                async with request_method(
-                    url=url, proxy=proxy.get(), **kwargs
-                ) as response:
-                    if response.ok:
-                        return await response.text()
+                text = await hedge(
+                    attempt, proxy, host, hedging.delay(host), avoid=avoid
+                )
+                if text is not None:
+                    return text
+                if failure["status"] in FINAL_STATUSES:
+                    log.debug(f"{url} not found ({failure['error']})")
+                    return NOT_FOUND
                 await asyncio.sleep(random.random() * 2)
+            except asyncio.TimeoutError:
+                log.error(f"Timeout making request to {host}")
+                failure.update(status=None, error="timeout", body="")
+                continue
             except Exception as err:
                 log.error(f"Error making request: {err}")
+                failure.update(status=None, error=repr(err), body="")
                 continue
 
+        if progress.is_set():
+            dead_letters.record(
+                method,
+                url,
+                kwargs,
+                headers,
+                failure["error"],
+                failure["body"],
+                proxy=failure["proxy"],
+            )
         return ""
 
 
+async def hedge(
+    attempt: typing.Callable[[str | None], typing.Awaitable[str | None]],
+    proxy: Proxy,
+    host: str,
+    delay: float | None,
+    avoid: str | None = None,
+) -> str | None:
+    """
+    Send a request and, if it is still running after `delay` seconds, send
+    it again through another proxy. The first response wins, the other
+    request is cancelled.
+
+    Args:
+        attempt (Callable): Coroutine function sending the request through
+                            the given proxy, None if the response isn't ok.
+        proxy (Proxy): Proxies of the request.
+        host (str): Host of the request, its quarantined proxies aren't used.
+        delay (float): Seconds before hedging, None to never hedge.
+        avoid (str): Proxy not to send the first request through, e.g. the
+                     one a failed request was last sent through.
+
+    Returns:
+        str | None: The response text, None if the response isn't ok.
+    """
+    first_proxy = blocks.pick(proxy, host, avoid=avoid)
+    primary = asyncio.ensure_future(attempt(first_proxy))
+    pending = {primary}
+    try:
+        if delay is None or proxy.total < 2:
+            return await primary
+
+        done, _ = await asyncio.wait(pending, timeout=delay)
+        if done:
+            return primary.result()
+
+        backup = asyncio.ensure_future(
+            attempt(blocks.pick(proxy, host, avoid=first_proxy))
+        )
+        pending.add(backup)
+        hedging.hedges += 1
+
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                if not task.exception() and task.result() is not None:
+                    hedging.wins += task is backup
+                    return task.result()
+        return primary.result()  # Both failed, raise the error of the first
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+def has_fields(company: dict, fields: list | None) -> bool:
+    """
+    Check whether a company found in the search results already has every
+    field requested by the job, so that its page doesn't need to be fetched.
+
+    Args:
+        company (dict): The company information found in the search results.
+        fields (list): The fields requested by the job, None for all of them.
+
+    Returns:
+        bool: True if every requested field is filled.
+    """
+    return fields is not None and all(company.get(field) for field in fields)
+
+
 class SingletonMeta(type):
     """
     This is a metaclass for creating singleton classes.
@@ -89,12 +284,24 @@ class EventManager(metaclass=SingletonMeta):
     """
     This class is a singleton class that manages events and listeners.
     It allows subscribing to events, emitting events, and unsubscribing from events.
+    Listeners are never called by the code emitting the event: events are queued
+    and delivered in batches by a dispatcher thread, woken up by the first event
+    of a batch and stopped after `idle` seconds without any.
     """
 
-    def __init__(self):
+    def __init__(self, interval: float = 0.1, idle: float = 60.0):
         self.listeners = defaultdict(
             list
         )  # Dictionary to store listeners for each event type
+        self.interval = interval  # Seconds the events of a batch are gathered
+        self.idle = idle  # Seconds without events before the dispatcher stops
+        self.counters = defaultdict(int)  # Running totals of the counted events
+        self._pending_counts = defaultdict(int)  # Counts not delivered yet
+        self._queue = queue.SimpleQueue()  # Events not delivered yet
+        self._lock = threading.Lock()  # Guards the counters
+        self._delivery_lock = threading.Lock()  # Listeners run one batch at a time
+        self._wakeup = threading.Event()  # Set when events are waiting
+        self._dispatcher: threading.Thread | None = None
 
     def subscribe(self, event_type: str, listener: callable) -> None:
         """
@@ -107,11 +314,14 @@ def subscribe(self, event_type: str, listener: callable) -> None:
         Returns:
             None
         """
-        self.listeners[event_type].append(listener)
+        with self._lock:
+            # Copy on write so that a delivery in progress is not affected
+            self.listeners[event_type] = [*self.listeners[event_type], listener]
 
     def emit(self, event_type: str, *args: typing.Any, **kwargs: typing.Any) -> None:
         """
-        Emit an event.
+        Emit an event. The listeners, and the observer of the emitting task,
+        are called from the dispatcher thread.
 
         Args:
             event_type (str): Type of event to emit
@@ -120,9 +330,48 @@ def emit(self, event_type: str, *args: typing.Any, **kwargs: typing.Any) -> None
         Returns:
             None
         """
-        if event_type in self.listeners:
-            for listener in self.listeners[event_type]:
-                listener(*args, **kwargs)
+        # The breaker of the site emitting the event, read in the emitting task
+        self._queue.put((event_type, args, kwargs, observer.get()))
+        self._wake_dispatcher()
+
+    def add(self, event_type: str, value: int = 1) -> None:
+        """
+        Increment a counter. The listeners receive the sum of the increments
+        made since the previous delivery instead of one call per increment.
+
+        Args:
+            event_type (str): Type of event to count
+            value (int): Increment of the counter
+
+        Returns:
+            None
+        """
+        with self._lock:
+            self.counters[event_type] += value
+            self._pending_counts[event_type] += value
+        self._wake_dispatcher()
+
+    def flush(self) -> None:
+        """
+        Deliver the pending events and counts right away.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        with self._delivery_lock:
+            with self._lock:
+                counts, self._pending_counts = self._pending_counts, defaultdict(int)
+            for event_type, value in counts.items():
+                self._deliver(event_type, (value,), {})
+
+            while not self._queue.empty():
+                event_type, args, kwargs, watch = self._queue.get_nowait()
+                if watch is not None:
+                    self._call(watch, event_type, (event_type, *args), kwargs)
+                self._deliver(event_type, args, kwargs)
 
     def unsubscribe(self, event_type: str, listener: callable) -> None:
         """
@@ -135,8 +384,49 @@ def unsubscribe(self, event_type: str, listener: callable) -> None:
         Returns:
             None
         """
-        if event_type in self.listeners:
-            self.listeners[event_type].remove(listener)
+        with self._lock:
+            if event_type in self.listeners:
+                self.listeners[event_type] = [
+                    _listener
+                    for _listener in self.listeners[event_type]
+                    if _listener != listener
+                ]
+
+    def _deliver(self, event_type: str, args: tuple, kwargs: dict) -> None:
+        for listener in self.listeners.get(event_type, []):
+            self._call(listener, event_type, args, kwargs)
+
+    @staticmethod
+    def _call(listener: callable, event_type: str, args: tuple, kwargs: dict) -> None:
+        try:
+            listener(*args, **kwargs)
+        except Exception as err:
+            log.error(f"Error in {event_type} listener: {err}")
+
+    def _wake_dispatcher(self) -> None:
+        self._wakeup.set()
+        if self._dispatcher is not None:
+            return
+
+        def dispatch() -> None:
+            while True:
+                if not self._wakeup.wait(self.idle):
+                    with self._lock:
+                        # An event emitted since is delivered by a new dispatcher
+                        if not self._wakeup.is_set():
+                            self._dispatcher = None
+                            return
+                    continue
+                time.sleep(self.interval)  # Gather the rest of the batch
+                self._wakeup.clear()
+                self.flush()
+
+        with self._lock:
+            if self._dispatcher is None:
+                self._dispatcher = threading.Thread(
+                    target=dispatch, name="EventManager", daemon=True
+                )
+                self._dispatcher.start()
 
 
 class LoadingAnimation:
@@ -189,6 +479,7 @@ def _stop(self):
             None
         """
         self.progress.clear()  # Set the event to stop the animation
+        EventManager().flush()  # Count the items scraped since the last delivery
         sys.stdout.write(
             "\r🔘 Scraping stoped. Total scraped: %(total)d%(spaces)s"
             % {
@@ -210,3 +501,79 @@ def update(self, value: int):
             None
         """
         self.total_scraped += value
+
+
+class ColumnarBuffer:
+    def __init__(self, columns: list) -> None:
+        """
+        Append only table storing every column in its own list. Sorting and
+        filtering produce lists of row indices, the values are never copied.
+        A single thread appends while any thread can read the first `size` rows.
+
+        Args:
+            columns (list): Names of the columns.
+
+        Returns:
+            None
+        """
+        self.columns = {column: [] for column in columns}
+        self.size = 0  # Rows fully written, updated after every column
+
+    def __len__(self) -> int:
+        return self.size
+
+    def extend(self, rows: list) -> None:
+        """
+        Append rows to the table.
+
+        Args:
+            rows (list): Dictionaries keyed by column name, missing keys are
+                         stored as empty strings.
+
+        Returns:
+            None
+        """
+        for column, values in self.columns.items():
+            values.extend(str(row.get(column) or "") for row in rows)
+        self.size += len(rows)
+
+    def clear(self) -> None:
+        self.size = 0
+        for values in self.columns.values():
+            values.clear()
+
+    def row(self, index: int) -> tuple:
+        return tuple(values[index] for values in self.columns.values())
+
+    def sort(self, indices: list, column: str, reverse: bool = False) -> list:
+        """
+        Sort row indices by the values of a column.
+
+        Args:
+            indices (list): Row indices to sort.
+            column (str): Column to sort by, case insensitive.
+            reverse (bool): Sort in descending order.
+
+        Returns:
+            list: The sorted row indices.
+        """
+        values = self.columns[column]
+        return sorted(indices, key=lambda index: values[index].lower(), reverse=reverse)
+
+    def search(self, text: str) -> list:
+        """
+        Find the rows containing a text in any column.
+
+        Args:
+            text (str): Text to look for, case insensitive.
+
+        Returns:
+            list: Indices of the matching rows.
+        """
+        text = text.lower()
+        columns = list(self.columns.values())
+        return [
+            index
+            for index in range(self.size)
+            if any(text in values[index].lower() for values in columns)
+        ]